@@ -0,0 +1,43 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, Format
+
+from time import perf_counter
+
+
+def fluent(users):
+    builder = ImposterBuilder(port=3000, protocol=Protocol.HTTP, name="MyImposter")
+    for user in users:
+        builder.with_stub().with_predicate(method=Method.GET, path=f"/user/{user['id']}")\
+            .with_response(body=f"{user['name']} <{user['email']}>", headers={'Content-Type': 'text/plain'})\
+            .add_stub()
+    return builder.create()
+
+
+def bulk(users):
+    return ImposterBuilder(port=3000, protocol=Protocol.HTTP, name="MyImposter")\
+        .with_stubs(users,
+                    {'method': Method.GET, 'path': Format('/user/{id}')},
+                    {'body': Format('{name} <{email}>'), 'headers': {'Content-Type': 'text/plain'}})\
+        .create()
+
+
+def timed(function, users, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        function(users)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(count=50_000):
+    users = [{'id': f'{i}', 'name': f'Tester_{i}', 'email': f'tester{i}@testing.com'} for i in range(1, count + 1)]
+
+    fluent_time = timed(fluent, users)
+    bulk_time = timed(bulk, users)
+    print(f"{count} stubs: fluent {fluent_time:.3f}s, with_stubs {bulk_time:.3f}s, "
+          f"speedup {fluent_time / bulk_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+from base64 import b64decode
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from random import Random
+from re import IGNORECASE, search
+from threading import RLock, Thread
+from time import perf_counter, sleep
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from mbtest.server import MountebankServer
+import requests
+
+from imposter_builder.profiles import ResponseProfile
+
+_POLL_INTERVAL = 0.05
+
+
+class StandInMountebank(MountebankServer):
+    """A minimal, in-process stand-in for a `mountebank` server, for benchmarks and tests run where `mb`
+    is not installed. Use as a context manager, or call :py:meth:`start` and :py:meth:`close`.
+
+    It implements the parts of the `admin API <http://www.mbtest.org/docs/api/overview>`_ used by this
+    package, for HTTP imposters only: imposters are created, replaced, queried and deleted, stubs can be added,
+    replaced and deleted and recorded requests cleared. Predicates support all the operators plus `and`, `or` and
+    `not`; responses support `is` with the `wait` (in milliseconds) and `repeat` behaviors, the `wait` and
+    `decorate` behaviors generated by the :py:class:`ResponseProfile` objects given as `profiles`, which are run
+    without JavaScript, and text `proxy` responses, recording stubs with
+    `deepEquals` predicates generated from the path and query. Imposters are queried with the `replayable` and
+    `removeProxies` options. Injection and the other behaviors are not supported.
+
+    :param port: admin port, `0` to use any free port
+    :param host: host to listen on
+    :param profiles: profiles whose behaviors are run, recognised by their JavaScript
+    """
+
+    def __init__(self, port: int = 0, host: str = 'localhost', profiles: Iterable[ResponseProfile] = ()):
+        self._admin = ThreadingHTTPServer((host, port), _AdminHandler)
+        self._admin.daemon_threads = True
+        self._admin.standin = self
+        super().__init__(self._admin.server_address[1], host=host)
+        self.profiles: Dict[str, ResponseProfile] = {}
+        for profile in profiles:
+            self.add_profile(profile)
+        self._lock = RLock()
+        self._imposters = {}
+        self._thread = None
+        self._entered = []
+
+    def start(self) -> "StandInMountebank":
+        """Start serving the admin API"""
+        if self._thread is None:
+            self._thread = Thread(target=self._admin.serve_forever, args=(_POLL_INTERVAL,), daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """Stop all imposters and the admin API"""
+        self.delete_all()
+        self._admin.shutdown()
+        self._admin.server_close()
+        self._thread = None
+
+    def __enter__(self) -> "StandInMountebank":
+        self._entered.append(self._thread is None)
+        self.start()
+        if getattr(self, 'imposters', None) is not None:
+            self.add_imposters(self.imposters)
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        if getattr(self, 'imposters', None) is not None:
+            self.delete_imposters()
+            self.imposters = None
+        if self._entered.pop():
+            self.close()
+
+    def add_profile(self, profile: ResponseProfile):
+        """Run the `wait` and `decorate` behaviors generated by a profile"""
+        for javascript in (profile.wait, profile.decorate):
+            if javascript is not None:
+                self.profiles[javascript] = profile
+
+    def create(self, definition: dict) -> dict:
+        imposter = _Imposter(definition, self.host, self.profiles)
+        with self._lock:
+            if imposter.port in self._imposters:
+                imposter.close()
+                raise ValueError(f"Port {imposter.port} is already in use")
+            self._imposters[imposter.port] = imposter
+        return imposter.as_structure()
+
+    def get(self, port: int) -> Optional["_Imposter"]:
+        with self._lock:
+            return self._imposters.get(port)
+
+    def all(self):
+        with self._lock:
+            return list(self._imposters.values())
+
+    def delete(self, port: int) -> Optional[dict]:
+        with self._lock:
+            imposter = self._imposters.pop(port, None)
+        if imposter is None:
+            return None
+        imposter.close()
+        return imposter.as_structure()
+
+    def delete_all(self):
+        return [self.delete(port) for port in list(self._imposters)]
+
+
+class _Imposter:
+    def __init__(self, definition: dict, host: str, profiles: Dict[str, ResponseProfile]):
+        self.definition = dict(definition)
+        self.profiles = profiles
+        self.stubs = [_Stub(stub) for stub in definition.get('stubs', [])]
+        self.requests = []
+        self.state = {}
+        self.random = Random()
+        self.lock = RLock()
+        self.server = ThreadingHTTPServer((host, definition.get('port') or 0), _ImposterHandler)
+        self.server.daemon_threads = True
+        self.server.imposter = self
+        self.port = self.server.server_address[1]
+        self.definition['port'] = self.port
+        Thread(target=self.server.serve_forever, args=(_POLL_INTERVAL,), daemon=True).start()
+
+    @property
+    def record_requests(self):
+        return self.definition.get('recordRequests', False)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def as_structure(self, replayable: bool = False, remove_proxies: bool = False) -> dict:
+        with self.lock:
+            structure = dict(self.definition)
+            structure['stubs'] = [stub.definition for stub in self.stubs]
+            if not replayable:
+                structure['numberOfRequests'] = len(self.requests)
+                structure['requests'] = list(self.requests)
+        if remove_proxies:
+            stubs = [dict(stub, responses=[response for response in stub.get('responses') or []
+                                           if 'proxy' not in response]) for stub in structure['stubs']]
+            structure['stubs'] = [stub for stub in stubs if stub['responses']]
+        return structure
+
+    def respond(self, request: dict) -> dict:
+        with self.lock:
+            if self.record_requests:
+                self.requests.append(request)
+            for stub in self.stubs:
+                if all(_matches(predicate, request) for predicate in stub.definition.get('predicates', [])):
+                    response = stub.next_response()
+                    break
+            else:
+                return {'is': self.definition.get('defaultResponse', {})}
+        if 'proxy' in response:
+            return self.proxy(request, response['proxy'], stub)
+        return response
+
+    def proxy(self, request: dict, proxy: dict, proxy_stub: "_Stub") -> dict:
+        start = perf_counter()
+        forwarded = requests.request(request['method'], proxy['to'].rstrip('/') + request['path'],
+                                     params=request['query'], data=request['body'].encode('utf-8'),
+                                     headers={name: value for name, value in request['headers'].items()
+                                              if name.lower() not in ('host', 'content-length')})
+        recorded = {'is': {'statusCode': forwarded.status_code, 'headers': dict(forwarded.headers),
+                           'body': forwarded.text, '_mode': 'text',
+                           '_proxyResponseTime': round(1000 * (perf_counter() - start))}}
+        predicates = [_generated_predicate(generator, request) for generator in proxy.get('predicateGenerators', [])]
+        with self.lock:
+            # Like mountebank, proxyAlways records after the proxy, so that it keeps forwarding every request.
+            if proxy.get('mode') == 'proxyAlways':
+                for stub in self.stubs:
+                    if stub is not proxy_stub and stub.definition.get('predicates', []) == predicates:
+                        stub.definition['responses'].append(recorded)
+                        stub.responses.append(recorded)
+                        return recorded
+                self.stubs.append(_Stub({'predicates': predicates, 'responses': [recorded]}))
+            else:
+                index = next((index for index, stub in enumerate(self.stubs) if stub is proxy_stub), len(self.stubs))
+                self.stubs.insert(index, _Stub({'predicates': predicates, 'responses': [recorded]}))
+        return recorded
+
+
+class _Stub:
+    def __init__(self, definition: dict):
+        self.definition = definition
+        self.responses = []
+        for response in definition.get('responses') or [{'is': {}}]:
+            self.responses.extend([response] * max(1, response.get('_behaviors', {}).get('repeat') or 1))
+        self.next = 0
+
+    def next_response(self) -> dict:
+        response = self.responses[self.next % len(self.responses)]
+        self.next += 1
+        return response
+
+
+def _generated_predicate(generator: dict, request: dict) -> dict:
+    fields = {}
+    for field, selected in generator.get('matches', {}).items():
+        if isinstance(selected, dict):
+            fields[field] = {key: value for key, value in (request.get(field) or {}).items() if selected.get(key)}
+        elif selected:
+            fields[field] = request.get(field)
+    predicate = {generator.get('predicateOperator', 'deepEquals'): fields}
+    if 'caseSensitive' in generator:
+        predicate['caseSensitive'] = generator['caseSensitive']
+    return predicate
+
+
+def _fold(value, case_sensitive):
+    if isinstance(value, str):
+        return value if case_sensitive else value.lower()
+    if isinstance(value, dict):
+        return {_fold(key, case_sensitive): _fold(inner, case_sensitive) for key, inner in value.items()}
+    if isinstance(value, list):
+        return [_fold(inner, case_sensitive) for inner in value]
+    return value
+
+
+def _compare(operator, expected, actual):
+    if operator == 'exists':
+        if isinstance(expected, dict):
+            actual = actual if isinstance(actual, dict) else {}
+            return all(_compare(operator, value, actual.get(key)) for key, value in expected.items())
+        return bool(expected) == (actual not in (None, ''))
+    if operator == 'deepEquals':
+        if isinstance(expected, dict) and isinstance(actual, str):
+            actual = _parse(actual)
+        return expected == actual or (not isinstance(expected, (dict, list)) and str(expected) == actual)
+    if isinstance(expected, dict):
+        if isinstance(actual, str):
+            actual = _parse(actual)
+        if not isinstance(actual, dict):
+            return False
+        return all(key in actual and _compare(operator, value, actual[key]) for key, value in expected.items())
+    if actual is None:
+        return False
+    expected = expected if isinstance(expected, str) else dumps(expected) if isinstance(expected, list) \
+        else str(expected)
+    actual = actual if isinstance(actual, str) else dumps(actual)
+    if operator == 'equals':
+        return actual == expected
+    if operator == 'contains':
+        return expected in actual
+    if operator == 'startsWith':
+        return actual.startswith(expected)
+    if operator == 'endsWith':
+        return actual.endswith(expected)
+    if operator == 'matches':
+        return search(expected, actual) is not None
+    return False
+
+
+def _parse(text):
+    try:
+        return loads(text)
+    except ValueError:
+        return text
+
+
+def _matches(predicate: dict, request: dict) -> bool:
+    if 'and' in predicate:
+        return all(_matches(inner, request) for inner in predicate['and'])
+    if 'or' in predicate:
+        return any(_matches(inner, request) for inner in predicate['or'])
+    if 'not' in predicate:
+        return not _matches(predicate['not'], request)
+    case_sensitive = predicate.get('caseSensitive', False)
+    for operator in ('equals', 'deepEquals', 'contains', 'startsWith', 'endsWith', 'matches', 'exists'):
+        if operator in predicate:
+            fields = predicate[operator]
+            break
+    else:
+        raise ValueError(f"Unsupported predicate {predicate}")
+    for field, expected in fields.items():
+        actual = request.get(field)
+        if field == 'headers' and isinstance(actual, dict):
+            actual = {key.lower(): value for key, value in actual.items()}
+            expected = {key.lower(): value for key, value in expected.items()}
+        if operator == 'matches' and not case_sensitive:
+            if not _compare_matches_ignoring_case(expected, actual):
+                return False
+        elif not _compare(operator, _fold(expected, case_sensitive), _fold(actual, case_sensitive)):
+            return False
+    return True
+
+
+def _compare_matches_ignoring_case(expected, actual):
+    if isinstance(expected, dict):
+        actual = _parse(actual) if isinstance(actual, str) else actual
+        if not isinstance(actual, dict):
+            return False
+        return all(key in actual and _compare_matches_ignoring_case(value, actual[key])
+                   for key, value in expected.items())
+    return actual is not None and search(expected, actual if isinstance(actual, str) else dumps(actual),
+                                          IGNORECASE) is not None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def send(self, status: int, body: bytes = b'', headers: Optional[dict] = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            if name.lower() not in ('content-length', 'transfer-encoding'):
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_json(self, status: int, structure):
+        self.send(status, dumps(structure).encode('utf-8'), {'Content-Type': 'application/json'})
+
+
+class _AdminHandler(_Handler):
+    def do_GET(self):
+        standin, parts = self.server.standin, self.parts()
+        if parts == ['imposters']:
+            self.send_json(200, {'imposters': [self.summary(imposter) for imposter in standin.all()]})
+        elif len(parts) == 2 and standin.get(int(parts[1])):
+            options = dict(parse_qsl(urlsplit(self.path).query))
+            self.send_json(200, standin.get(int(parts[1])).as_structure(
+                replayable=options.get('replayable') == 'true', remove_proxies=options.get('removeProxies') == 'true'))
+        else:
+            self.send_json(404, {'errors': [{'code': 'no such resource'}]})
+
+    def do_POST(self):
+        standin, parts, body = self.server.standin, self.parts(), self.read_body()
+        if parts == ['imposters']:
+            try:
+                self.send_json(201, standin.create(loads(body)))
+            except (OSError, ValueError) as error:
+                self.send_json(400, {'errors': [{'code': 'bad data', 'message': str(error)}]})
+        elif len(parts) == 3 and parts[2] == 'stubs' and standin.get(int(parts[1])):
+            imposter, add = standin.get(int(parts[1])), loads(body)
+            with imposter.lock:
+                index = add.get('index', len(imposter.stubs))
+                imposter.stubs.insert(index, _Stub(add['stub']))
+            self.send_json(200, imposter.as_structure())
+        else:
+            self.send_json(404, {'errors': [{'code': 'no such resource'}]})
+
+    def do_PUT(self):
+        standin, parts, body = self.server.standin, self.parts(), self.read_body()
+        if parts == ['imposters']:
+            standin.delete_all()
+            self.send_json(200, {'imposters': [standin.create(definition)
+                                               for definition in loads(body).get('imposters', [])]})
+        elif len(parts) >= 3 and parts[2] == 'stubs' and standin.get(int(parts[1])):
+            imposter = standin.get(int(parts[1]))
+            with imposter.lock:
+                if len(parts) == 3:
+                    imposter.stubs = [_Stub(stub) for stub in loads(body).get('stubs', [])]
+                else:
+                    imposter.stubs[int(parts[3])] = _Stub(loads(body))
+            self.send_json(200, imposter.as_structure())
+        else:
+            self.send_json(404, {'errors': [{'code': 'no such resource'}]})
+
+    def do_DELETE(self):
+        standin, parts = self.server.standin, self.parts()
+        self.read_body()
+        if parts == ['imposters']:
+            self.send_json(200, {'imposters': standin.delete_all()})
+        elif len(parts) == 2:
+            self.send_json(200, standin.delete(int(parts[1])) or {})
+        elif len(parts) == 3 and parts[2] == 'savedRequests' and standin.get(int(parts[1])):
+            imposter = standin.get(int(parts[1]))
+            with imposter.lock:
+                imposter.requests = []
+            self.send_json(200, imposter.as_structure())
+        elif len(parts) == 4 and parts[2] == 'stubs' and standin.get(int(parts[1])):
+            imposter = standin.get(int(parts[1]))
+            with imposter.lock:
+                del imposter.stubs[int(parts[3])]
+            self.send_json(200, imposter.as_structure())
+        else:
+            self.send_json(404, {'errors': [{'code': 'no such resource'}]})
+
+    def parts(self):
+        return [part for part in urlsplit(self.path).path.split('/') if part]
+
+    def summary(self, imposter):
+        return {'protocol': 'http', 'port': imposter.port, 'numberOfRequests': len(imposter.requests),
+                '_links': {'self': {'href': f"http://{self.headers.get('Host')}/imposters/{imposter.port}"}}}
+
+
+class _ImposterHandler(_Handler):
+    def handle_request(self):
+        url = urlsplit(self.path)
+        request = {'requestFrom': f'{self.client_address[0]}:{self.client_address[1]}',
+                   'method': self.command, 'path': url.path, 'query': dict(parse_qsl(url.query)),
+                   'headers': dict(self.headers.items()), 'body': self.read_body().decode('utf-8', 'replace'),
+                   'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds')}
+        response = self.server.imposter.respond(request)
+        fields, behaviors = response.get('is', {}), response.get('_behaviors') or {}
+        imposter = self.server.imposter
+        wait = behaviors.get('wait')
+        latency = imposter.profiles.get(wait) if isinstance(wait, str) else None
+        if latency is not None:
+            wait = latency.sample_wait(imposter.random)
+        if isinstance(wait, (int, float)) and wait > 0:
+            sleep(wait / 1000)
+        decorator = imposter.profiles.get(behaviors.get('decorate'))
+        if decorator is not None:
+            with imposter.lock:
+                fields = decorator.apply(fields, imposter.state, imposter.random)
+        body = fields.get('body', '')
+        if fields.get('_mode') == 'binary':
+            body = b64decode(body)
+        elif not isinstance(body, str):
+            body = dumps(body)
+        self.send(int(fields.get('statusCode', 200)), body if isinstance(body, bytes) else body.encode('utf-8'),
+                  fields.get('headers') or {})
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = do_HEAD = do_OPTIONS = handle_request
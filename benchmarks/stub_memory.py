@@ -0,0 +1,51 @@
+from imposter_builder import ImposterBuilder, Protocol, Method
+from imposter_builder.stub_builder import StubBuilder
+
+from gc import collect
+from tracemalloc import get_traced_memory, start, stop
+
+
+class UnslottedStubBuilder(StubBuilder):
+    """The previous representation of a stub builder: an instance dictionary and lists of predicates and
+    responses, which the stub keeps"""
+
+    def __init__(self, imposter):
+        super().__init__(imposter)
+        self._predicates = []
+        self._responses = []
+
+
+def build(users, stub_builder):
+    builder = ImposterBuilder(port=3000, protocol=Protocol.HTTP, name="MyImposter")
+    for user in users:
+        stub_builder(builder).with_predicate(method=Method.GET, path=f"/user/{user['id']}")\
+            .with_response(body=f"{user['name']} <{user['email']}>", headers={'Content-Type': 'text/plain'})\
+            .add_stub()
+    return builder
+
+
+def traced(function, *args):
+    """Memory retained by the result of `function` and peak memory while it runs, in bytes"""
+    collect()
+    start()
+    try:
+        result = function(*args)
+        current, peak = get_traced_memory()
+    finally:
+        stop()
+    del result
+    return current, peak
+
+
+def main(count=100_000):
+    users = [{'id': f'{i}', 'name': f'Tester_{i}', 'email': f'tester{i}@testing.com'} for i in range(1, count + 1)]
+
+    before, before_peak = traced(build, users, UnslottedStubBuilder)
+    after, after_peak = traced(build, users, StubBuilder)
+    print(f"{count} stubs: lists {before / 2 ** 20:.1f}MiB (peak {before_peak / 2 ** 20:.1f}MiB), "
+          f"slotted tuples {after / 2 ** 20:.1f}MiB (peak {after_peak / 2 ** 20:.1f}MiB), "
+          f"saving {(before - after) / before:.0%}")
+
+
+if __name__ == '__main__':
+    main()
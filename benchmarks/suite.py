@@ -0,0 +1,246 @@
+"""Throughput of building and installing imposters, compared between runs.
+
+Each benchmark is timed over several rounds and its best round is kept, as stubs (or imposters) per second.
+Results are written to `benchmarks/results/`, and compared with the median of the last saved results: the run
+fails when the throughput of a benchmark dropped by more than the threshold.
+
+    python -m benchmarks.suite                         # run, save and compare with the previous runs
+    python -m benchmarks.suite --compare baseline.json --threshold 0.1
+    python -m benchmarks.suite -k from_structure --no-save
+"""
+from imposter_builder import ImposterBuilder, Method, install_imposter, uninstall_imposter
+from imposter_builder.bulk import gc_paused
+from imposter_builder.install import pooled_session
+from imposter_builder.template_registry import template_registry
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from functools import partial
+from gc import collect
+from json import dump, load
+from pathlib import Path
+from platform import machine, python_version
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Dict, List, NamedTuple, Optional
+from uuid import uuid4
+import sys
+
+from mbtest.imposters import Stub
+
+from .bulk_stubs import fluent
+from .standin import StandInMountebank
+
+RESULTS = Path(__file__).parent / 'results'
+BASELINE_RUNS = 5
+MIN_TIME = 0.2
+TEMPLATE = '''{"protocol": "http", "port": 3000, "stubs": [
+{% for user in users %}{% if not loop.first %},{% endif %}
+{"predicates": [{"equals": {"method": "GET", "path": "/user/{{ user.id }}"}}],
+ "responses": [{"is": {"body": "{{ user.name }} <{{ user.email }}>", "headers": {"Content-Type": "text/plain"}}}]}
+{% endfor %}]}'''
+
+
+class Benchmark(NamedTuple):
+    """A function timed by the suite, processing `items` stubs or imposters per call. `setup` and `cleanup` run
+    before and after each call without being timed."""
+    name: str
+    items: int
+    function: Callable[[], object]
+    rounds: Optional[int] = None
+    setup: Callable[[], object] = lambda: None
+    cleanup: Callable[[], object] = lambda: None
+
+
+class Result(NamedTuple):
+    seconds: float
+    items: int
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.seconds if self.seconds else float('inf')
+
+
+def users(count: int) -> List[dict]:
+    return [{'id': f'{i}', 'name': f'Tester_{i}', 'email': f'tester{i}@testing.com'} for i in range(1, count + 1)]
+
+
+def stub_structures(count: int) -> List[dict]:
+    return [{'predicates': [{'equals': {'method': 'GET', 'path': f"/user/{user['id']}"}}],
+             'responses': [{'is': {'body': f"{user['name']} <{user['email']}>",
+                                   'headers': {'Content-Type': 'text/plain'}}}]} for user in users(count)]
+
+
+def benchmarks(templates: Path, server: StandInMountebank, session) -> Dict[str, Callable[[], Benchmark]]:
+    """Functions building the benchmarks of the suite by name, using a directory for template files and a stand-in
+    server. The data of a benchmark is only built when the benchmark is run."""
+
+    def from_template_string():
+        thousand_users = users(1_000)
+        return Benchmark('from_template.string[1000]', 1_000,
+                         lambda: ImposterBuilder(templates=None).from_template(TEMPLATE, {'users': thousand_users}))
+
+    def from_template_file():
+        thousand_users = users(1_000)
+        (templates / 'users.json.j2').write_text(TEMPLATE)
+        return Benchmark('from_template.file[1000]', 1_000,
+                         lambda: ImposterBuilder(templates=str(templates)).from_template('users.json.j2',
+                                                                                          {'users': thousand_users}))
+
+    def from_structure(count):
+        structures = stub_structures(count)
+        return Benchmark(f'from_structure[{count}]', count, lambda: [Stub.from_structure(stub) for stub in structures],
+                         rounds=2 if count > 10_000 else None)
+
+    def one_stub():
+        return ImposterBuilder().with_stub().with_predicate(method=Method.GET, path='/test')\
+            .with_response(body='test').add_stub().create()
+
+    def install(name, imposter):
+        return Benchmark(name, len(imposter.stubs), lambda: install_imposter(server, imposter, session),
+                         cleanup=lambda: uninstall_imposter(imposter, session))
+
+    def hundred_stubs():
+        imposter = fluent(users(100))
+        imposter.port = None
+        return imposter
+
+    # Deleting an imposter from the stand-in waits for its server thread to stop, so it is timed on its own.
+    def teardown():
+        imposter = one_stub()
+        return Benchmark('teardown[1 stub]', 1, lambda: uninstall_imposter(imposter, session),
+                         setup=lambda: install_imposter(server, imposter, session))
+
+    suite = {
+        'fluent[1000]': lambda: Benchmark('fluent[1000]', 1_000, partial(fluent, users(1_000))),
+        'from_template.string[1000]': from_template_string,
+        'from_template.file[1000]': from_template_file,
+    }
+    for count in (10, 1_000, 100_000):
+        suite[f'from_structure[{count}]'] = partial(from_structure, count)
+    suite['install[1 stub]'] = lambda: install('install[1 stub]', one_stub())
+    suite['install[100 stubs]'] = lambda: install('install[100 stubs]', hundred_stubs())
+    suite['teardown[1 stub]'] = teardown
+    return suite
+
+
+def timed(benchmark: Benchmark, rounds: int, min_time: float = MIN_TIME) -> Result:
+    """Best time of a call to the benchmark function, each round calling it until it took `min_time` seconds.
+    Like `timeit`, the garbage collector is paused during the rounds, as its pauses depend on the garbage
+    left by earlier benchmarks."""
+    best = None
+    # The first round warms up caches, e.g. compiled templates and connections, and is not kept.
+    for round in range(1 + min(rounds, benchmark.rounds or rounds)):
+        calls, elapsed = 0, 0.0
+        collect()
+        with gc_paused():
+            while calls == 0 or elapsed < min_time:
+                benchmark.setup()
+                start = perf_counter()
+                benchmark.function()
+                elapsed += perf_counter() - start
+                benchmark.cleanup()
+                calls += 1
+        if round:
+            best = elapsed / calls if best is None else min(best, elapsed / calls)
+    return Result(best, benchmark.items)
+
+
+def run(rounds: int = 5, keyword: Optional[str] = None, min_time: float = MIN_TIME) -> Dict[str, Result]:
+    """Time the benchmarks whose name contains `keyword`"""
+    template_registry.clear()
+    with TemporaryDirectory() as templates, StandInMountebank() as server, pooled_session() as session:
+        return {name: timed(build(), rounds, min_time)
+                for name, build in benchmarks(Path(templates), server, session).items()
+                if keyword is None or keyword in name}
+
+
+def as_structure(results: Dict[str, Result]) -> dict:
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': python_version(),
+        'machine': machine(),
+        'benchmarks': {name: {'seconds': result.seconds, 'items': result.items, 'throughput': result.throughput}
+                       for name, result in results.items()},
+    }
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> Dict[str, float]:
+    """Benchmarks whose throughput dropped by more than `threshold`, a fraction, with their change"""
+    changes = {}
+    for name, result in results['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if previous is None:
+            continue
+        change = result['throughput'] / previous['throughput'] - 1
+        if change < -threshold:
+            changes[name] = change
+    return changes
+
+
+def report(results: dict, baseline: Optional[dict]) -> str:
+    lines = [f"{'benchmark':<30} {'best ms':>10} {'items/s':>12} {'change':>8}"]
+    for name, result in results['benchmarks'].items():
+        previous = (baseline or {}).get('benchmarks', {}).get(name)
+        change = f"{result['throughput'] / previous['throughput'] - 1:>+8.1%}" if previous else f"{'':>8}"
+        lines.append(f"{name:<30} {1000 * result['seconds']:>10.2f} {result['throughput']:>12.0f} {change}")
+    return '\n'.join(lines)
+
+
+def saved_baseline(directory: Path, runs: int = BASELINE_RUNS) -> Optional[dict]:
+    """Median throughput of each benchmark over the last `runs` saved results, less sensitive to a run slowed
+    down by other processes than the last results alone"""
+    saved = sorted(directory.glob('*.json'))[-runs:]
+    if not saved:
+        return None
+    throughputs: Dict[str, List[float]] = {}
+    for path in saved:
+        with open(path) as file:
+            for name, result in load(file)['benchmarks'].items():
+                throughputs.setdefault(name, []).append(result['throughput'])
+    return {'benchmarks': {name: {'throughput': median(values)} for name, values in throughputs.items()}}
+
+
+def main(arguments=None) -> int:
+    parser = ArgumentParser(description="Benchmarks of imposter_builder")
+    parser.add_argument('--rounds', type=int, default=5, help="rounds timed per benchmark, the best is kept")
+    parser.add_argument('--min-time', type=float, default=MIN_TIME,
+                        help="seconds each round calls a benchmark for, at least once")
+    parser.add_argument('-k', dest='keyword', help="only run the benchmarks whose name contains this")
+    parser.add_argument('--compare', type=Path,
+                        help=f"results to compare with, by default the median of the last {BASELINE_RUNS} saved")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="fail when the throughput of a benchmark drops by more than this fraction")
+    parser.add_argument('--results', type=Path, default=RESULTS, help="directory the results are saved in")
+    parser.add_argument('--no-save', dest='save', action='store_false', help="do not save the results")
+    options = parser.parse_args(arguments)
+
+    if options.compare is not None:
+        with open(options.compare) as file:
+            baseline, compared_with = load(file), options.compare
+    else:
+        baseline, compared_with = saved_baseline(options.results), f"the last saved results in {options.results}"
+
+    results = as_structure(run(options.rounds, options.keyword, options.min_time))
+    print(report(results, baseline))
+    if options.save:
+        options.results.mkdir(parents=True, exist_ok=True)
+        # Sorted by time, and unique even for runs saved within the same second.
+        path = options.results / f"{datetime.now(timezone.utc):%Y-%m-%dT%H%M%S.%f}-{uuid4().hex[:8]}.json"
+        with open(path, 'w') as file:
+            dump(results, file, indent=2)
+        print(f"Results saved to {path}")
+
+    if baseline is not None:
+        dropped = regressions(results, baseline, options.threshold)
+        if dropped:
+            print(f"Throughput dropped by more than {options.threshold:.0%} compared with {compared_with}:")
+            for name, change in dropped.items():
+                print(f"  {name}: {change:+.1%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
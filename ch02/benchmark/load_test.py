@@ -0,0 +1,163 @@
+"""Load test of the ch02 web facade against the products and content imposters.
+
+The imposters run on an in-process stand-in for mountebank, so `mb` does not need to be running,
+and the facade is served by a threaded development server. Run from the root of the repository:
+
+    python -m ch02.benchmark.load_test --concurrency 1 8 32 --requests 500 --latency 0,0 --latency 50,20
+
+Each `--latency` is the `wait`, in milliseconds, of the products and content imposters, so the effect of
+slow downstream services on the facade can be compared. A latency written `median/p99`, e.g. `20/250`, is
+log-normally distributed with that median and 99th percentile, like the response times of production services.
+`--mode sync pooled` compares calling the downstream services with a new connection per call against the shared,
+coalescing client.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from threading import Lock, Thread
+from time import perf_counter
+from typing import List, NamedTuple, Sequence, Tuple
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from ch02.examples.main import app, configure
+from ch02.test.imposters import create_content_imposter, create_product_imposter
+from imposter_builder import LogNormal, ResponseProfile, install_imposters
+from benchmarks.standin import StandInMountebank
+from imposter_builder.install import pooled_session
+
+facade_host = '127.0.0.1'
+facade_port = 5000
+products_end_point = '/products'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class LoadResult(NamedTuple):
+    """Latency and throughput of one load test run"""
+    mode: str
+    latency: str
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    p50: float
+    p95: float
+    p99: float
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+
+def percentile(ordered: Sequence[float], percent: float) -> float:
+    """Nearest rank percentile of ordered values"""
+    if not ordered:
+        return 0.0
+    rank = max(1, round(percent / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def drive(url: str, concurrency: int, total: int) -> Tuple[List[float], int, float]:
+    """Send `total` GET requests to `url` from `concurrency` threads, each keeping its connection alive.
+    Returns the latency of each successful request in milliseconds, the number of errors and the elapsed time."""
+    latencies = []
+    errors = 0
+    lock = Lock()
+    issued = count()
+
+    def worker():
+        nonlocal errors
+        with requests.Session() as session:
+            while next(issued) < total:
+                start = perf_counter()
+                try:
+                    ok = session.get(url, timeout=30).status_code == 200
+                except requests.RequestException:
+                    ok = False
+                elapsed = (perf_counter() - start) * 1000
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors += 1
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    return latencies, errors, perf_counter() - start
+
+
+def downstream(latency: str) -> dict:
+    """Behavior of an imposter from a latency: a `wait` in milliseconds, or the `median/p99` of a log-normal
+    latency profile"""
+    if '/' in latency:
+        median, p99 = latency.split('/')
+        return {'profile': ResponseProfile(LogNormal(float(median), float(p99)))}
+    return {'wait': int(latency) or None}
+
+
+def run(concurrency_levels: Sequence[int], total: int, latencies: Sequence[str], modes: Sequence[str] = ('sync',),
+        application=app, warmup: int = 20) -> List[LoadResult]:
+    """Run the load test for each latency profile, facade mode and level of concurrency"""
+    results = []
+    server = make_server(facade_host, facade_port, application, threaded=True,
+                         request_handler=QuietRequestHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://{facade_host}:{facade_port}{products_end_point}'
+    try:
+        with StandInMountebank() as mb, pooled_session() as session:
+            for latency in latencies:
+                product, content = (downstream(spec) for spec in latency.split(','))
+                for behavior in (product, content):
+                    if 'profile' in behavior:
+                        mb.add_profile(behavior['profile'])
+                imposters = [create_product_imposter(**product), create_content_imposter(**content)]
+                install_imposters(mb, imposters, session=session)
+                try:
+                    for mode in modes:
+                        configure(pooled=mode == 'pooled')
+                        drive(url, 1, warmup)
+                        for concurrency in concurrency_levels:
+                            times, errors, seconds = drive(url, concurrency, total)
+                            times.sort()
+                            results.append(LoadResult(mode, latency, concurrency, total, errors, seconds,
+                                                      percentile(times, 50), percentile(times, 95),
+                                                      percentile(times, 99)))
+                finally:
+                    mb.delete_all()
+    finally:
+        configure()
+        server.shutdown()
+    return results
+
+
+def report(results: Sequence[LoadResult]):
+    print(f"{'mode':>7} {'latency':>10} {'conc':>5} {'reqs':>6} {'errors':>6} {'req/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        print(f"{result.mode:>7} {result.latency:>10} {result.concurrency:>5} {result.requests:>6} {result.errors:>6} "
+              f"{result.throughput:>9.1f} {result.p50:>8.1f} {result.p95:>8.1f} {result.p99:>8.1f}")
+
+
+def main():
+    parser = ArgumentParser(description='Load test the ch02 web facade against local imposters')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16],
+                        help='numbers of concurrent clients')
+    parser.add_argument('--requests', type=int, default=200, help='requests sent at each level of concurrency')
+    parser.add_argument('--latency', action='append',
+                        help="'products,content' wait of the imposters in ms, or 'median/p99' of a log-normal latency, "
+                             "may be repeated (default 0,0)")
+    parser.add_argument('--mode', nargs='+', choices=['sync', 'pooled'], default=['sync'],
+                        help='how the facade calls the downstream services')
+    arguments = parser.parse_args()
+    report(run(arguments.concurrency, arguments.requests, arguments.latency or ['0,0'], arguments.mode))
+
+
+if __name__ == '__main__':
+    main()
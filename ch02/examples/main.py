@@ -1,30 +1,237 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from flask import abort, Flask, jsonify
+from logging import getLogger
+from os import environ
+from requests.adapters import HTTPAdapter
+from threading import Event, Lock
+from time import monotonic
 import requests
 
 
 app = Flask(__name__)
+logger = getLogger(__name__)
 
 products_url = 'http://localhost:3000/products'
 content_url = 'http://localhost:4000/content'
 
 
+class PooledClient:
+    """Client for the downstream services sharing keep-alive connections between requests to the facade.
+    Identical requests made at the same time are coalesced, so only one is sent downstream and its
+    response, or the error it raised, is shared by all the callers.
+
+    :param connections: maximum number of connections kept open to each downstream service
+    :param timeout: connect and read timeouts of each downstream call, in seconds
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self, connections=32, timeout=(1.0, 5.0)):
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=connections)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._timeout = timeout
+        self._lock = Lock()
+        self._in_flight = {}
+
+    def get(self, url, params=None):
+        """GET a downstream resource, returns the status code and the JSON body of successful responses"""
+        key = (url, tuple(sorted((params or {}).items())))
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = PooledClient._Call()
+        if leader:
+            try:
+                response = self._session.get(url, params=params, timeout=self._timeout)
+                call.result = (response.status_code,
+                               response.json() if response.status_code == requests.codes.ok else None)
+            except Exception as error:
+                call.error = error
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+def get(url, params=None):
+    """GET a downstream resource with a new connection, returns the status code and the JSON body"""
+    response = requests.get(url, params=params)
+    return response.status_code, response.json() if response.status_code == requests.codes.ok else None
+
+
+class TTLCache:
+    """In-process cache of downstream data with a time to live and a bounded size.
+
+    Values older than `ttl` are stale: for up to another `stale_ttl` seconds they are still returned, while they
+    are refreshed in the background by `executor` (stale-while-revalidate), after which they are loaded again before
+    returning. When a refresh fails the error is logged, counted in `refresh_errors` and the stale values are kept.
+    The least recently used values are evicted when more than `maxsize` are cached.
+
+    Any object with the same `get` and `get_many` methods can be used as the facade's cache. :py:meth:`close` the
+    cache, or use it as a context manager, to stop its own refresh threads.
+
+    :param ttl: seconds a value is fresh
+    :param maxsize: maximum number of values cached
+    :param stale_ttl: seconds a stale value is returned while it is refreshed, defaults to `ttl`
+    :param clock: source of the current time, in seconds
+    :param executor: executor refreshing stale values, a thread pool of its own by default, which is shut down
+        by :py:meth:`close`. A given executor is left running.
+    """
+
+    def __init__(self, ttl=60.0, maxsize=1024, stale_ttl=None, clock=monotonic, executor=None):
+        self._ttl = ttl
+        self._stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self._maxsize = maxsize
+        self._clock = clock
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix='ttl-cache-refresh')
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / lookups if lookups else 0.0
+
+    def get(self, key, load):
+        """Value of `key`, calling `load()` if it is not cached"""
+        return self.get_many([key], lambda keys: {key: load()})[key]
+
+    def get_many(self, keys, load):
+        """Values of `keys`, calling `load(missing_keys)` once for all the keys not cached.
+        `load` returns a dictionary of the loaded values."""
+        now = self._clock()
+        values, missing, stale = {}, [], []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or now - entry[1] > self._ttl + self._stale_ttl:
+                    self.misses += 1
+                    missing.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                values[key] = entry[0]
+                if now - entry[1] <= self._ttl:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        stale.append(key)
+        if stale:
+            self._executor.submit(self._refresh, stale, load)
+        if missing:
+            loaded = load(missing)
+            self._store(loaded)
+            values.update(loaded)
+        return values
+
+    def _refresh(self, keys, load):
+        try:
+            self._store(load(keys))
+        except Exception:
+            # Keep serving the stale values, they will be loaded again once they expire.
+            with self._lock:
+                self.refresh_errors += 1
+            logger.exception("Refreshing %d stale values failed, keeping them until they expire", len(keys))
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(keys)
+
+    def close(self):
+        """Stop refreshing stale values, shutting down the thread pool of the cache once running refreshes end"""
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        self.close()
+
+    def _store(self, values):
+        now = self._clock()
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+
+downstream = None
+cache = None
+
+
+def configure(pooled=False, connections=32, timeout=(1.0, 5.0), response_cache=None):
+    """Choose how the facade calls the downstream services, with a new connection per call (the default)
+    or with a shared :py:class:`PooledClient`, and whether downstream responses are cached, e.g. in a
+    :py:class:`TTLCache`. Set the environment variable `FACADE_MODE=pooled` to start the facade in pooled mode
+    and `FACADE_CACHE_TTL` to the time to live in seconds to cache responses."""
+    global downstream, cache
+    downstream = PooledClient(connections, timeout) if pooled else None
+    cache = response_cache
+
+
+configure(pooled=environ.get('FACADE_MODE') == 'pooled',
+          response_cache=TTLCache(float(environ['FACADE_CACHE_TTL'])) if environ.get('FACADE_CACHE_TTL') else None)
+
+
 def add_content_to_product(product, content):
-    product['copy'] = content['copy']
-    product['image'] = content['image']
-    return product
+    # Responses may be shared between coalesced requests, so the product is copied rather than updated.
+    return dict(product, copy=content['copy'], image=content['image'])
 
 
-@app.route('/products')
-def get_products_with_content():
-    products_response = requests.get(products_url)
-    if products_response.status_code != requests.codes.ok:
+def fetch(url, params=None):
+    return downstream.get(url, params) if downstream else get(url, params)
+
+
+def load_products():
+    products_status, products_body = fetch(products_url)
+    if products_status != requests.codes.ok:
         abort(404)
-    products = products_response.json()['products']
+    return products_body['products']
+
 
-    content_response = requests.get(content_url, params={'ids': ','.join([str(product['id']) for product in products])})
-    if content_response.status_code != requests.codes.ok:
+def load_content(ids):
+    content_status, content_body = fetch(content_url, params={'ids': ','.join([str(id) for id in ids])})
+    if content_status != requests.codes.ok:
         abort(400)
-    content = {content['id']: content for content in content_response.json()['content']}
+    return {content['id']: content for content in content_body['content']}
+
+
+@app.route('/products')
+def get_products_with_content():
+    try:
+        if cache is None:
+            products = load_products()
+            content = load_content([product['id'] for product in products])
+        else:
+            products = cache.get('products', load_products)
+            cached = cache.get_many([('content', product['id']) for product in products],
+                                    lambda keys: {('content', id): content
+                                                  for id, content in load_content([id for _, id in keys]).items()})
+            content = {id: value for (_, id), value in cached.items()}
+    except requests.Timeout:
+        abort(504)
 
     return jsonify([add_content_to_product(product, content[product['id']]) for product in products])
 
@@ -1,7 +1,16 @@
 import pytest
 from mbtest import server
 
+from imposter_builder import ImposterPool
+
 
 @pytest.fixture(scope="session")
 def mock_server(request):
     return server.mock_server(request)
+
+
+@pytest.fixture(scope="session")
+def imposter_pool(mock_server):
+    pool = ImposterPool(mock_server)
+    yield pool
+    pool.close()
@@ -4,10 +4,10 @@ product_port = 3000
 content_port = 4000
 
 
-def create_product_imposter():
+def create_product_imposter(wait=None, profile=None):
     return ImposterBuilder(port=product_port, protocol=Protocol.HTTP,
                            name='Product Service').with_stub().with_predicate(path='/products').with_response(
-                           status_code=200, headers={"Content-Type": "application/json"},
+                           status_code=200, headers={"Content-Type": "application/json"}, wait=wait, profile=profile,
                            body={"products": [
                                 {
                                     "id": "2599b7f4",
@@ -21,11 +21,11 @@ def create_product_imposter():
                                 }]}).add_stub().create()
 
 
-def create_content_imposter():
+def create_content_imposter(wait=None, profile=None):
     return ImposterBuilder(port=content_port, protocol=Protocol.HTTP,
                            name='Content Service').with_stub().with_predicate(
                            path='/content', query={"ids": "2599b7f4,e1977c9e"}).with_response(
-                           status_code=200, headers={"Content-Type": "application/json"},
+                           status_code=200, headers={"Content-Type": "application/json"}, wait=wait, profile=profile,
                            body={"content": [{"id": "2599b7f4",
                                                "copy": "Treat your dog like the king he is",
                                                "image": "/content/c5b221e2"},
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
+from ch02.examples.main import PooledClient, content_url
+from .imposters import create_content_imposter
+from hamcrest import assert_that, calling, equal_to, has_length, raises
+from benchmarks.standin import StandInMountebank
+from mbtest.matchers import had_request
+
+ids = {'ids': '2599b7f4,e1977c9e'}
+
+
+def test_identical_concurrent_lookups_are_coalesced():
+    client = PooledClient()
+    content_imposter = create_content_imposter(wait=200)
+    with StandInMountebank()([content_imposter]):
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: client.get(content_url, params=ids), range(5)))
+
+        assert_that(content_imposter, had_request().with_path('/content').and_times(1))
+    for status, body in results:
+        assert_that(status, equal_to(200))
+        assert_that(body['content'], has_length(2))
+
+
+def test_error_of_a_coalesced_lookup_is_raised_in_every_caller(monkeypatch):
+    client = PooledClient()
+    calls = []
+
+    def failing_get(*args, **kwargs):
+        calls.append(args)
+        sleep(0.2)
+        raise RuntimeError("not JSON")
+
+    monkeypatch.setattr(client._session, 'get', failing_get)
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(client.get, content_url, ids) for _ in range(5)]
+
+    assert_that(calls, has_length(1))
+    for future in futures:
+        assert_that(calling(future.result), raises(RuntimeError, "not JSON"))
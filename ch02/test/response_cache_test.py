@@ -0,0 +1,90 @@
+from ch02.examples.main import app, configure, TTLCache
+from .imposters import create_content_imposter, create_product_imposter
+from hamcrest import assert_that, calling, contains_string, equal_to, has_length, raises
+from benchmarks.standin import StandInMountebank
+from concurrent.futures import ThreadPoolExecutor
+from flask import abort
+from mbtest.matchers import had_request
+
+import pytest
+
+products_end_point = '/products'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def client():
+    yield app.test_client()
+    configure()
+
+
+def test_cached_responses_skip_upstream_calls(client):
+    cache = TTLCache(ttl=60)
+    configure(response_cache=cache)
+    products_imposter = create_product_imposter()
+    content_imposter = create_content_imposter()
+    with cache, StandInMountebank()([products_imposter, content_imposter]):
+        for _ in range(5):
+            response = client.get(products_end_point)
+            assert_that(response.status_code, equal_to(200))
+            assert_that(response.get_json(), has_length(2))
+
+        assert_that(products_imposter, had_request().with_path("/products").and_method("GET").and_times(1))
+        assert_that(content_imposter, had_request().with_path("/content").and_method("GET").and_times(1))
+    assert_that(cache.hit_rate, equal_to(12 / 15))
+
+
+def test_stale_responses_are_refreshed_in_background(client):
+    clock = FakeClock()
+    executor = ThreadPoolExecutor(max_workers=1)
+    configure(response_cache=TTLCache(ttl=10, stale_ttl=10, clock=clock, executor=executor))
+    products_imposter = create_product_imposter()
+    content_imposter = create_content_imposter()
+    with StandInMountebank()([products_imposter, content_imposter]):
+        client.get(products_end_point)
+        clock.now = 15
+        assert_that(client.get(products_end_point).status_code, equal_to(200))
+        executor.shutdown(wait=True)
+
+        assert_that(products_imposter, had_request().with_path("/products").and_times(2))
+        assert_that(content_imposter, had_request().with_path("/content").and_times(2))
+
+        clock.now = 40
+        client.get(products_end_point)
+
+        assert_that(products_imposter, had_request().with_path("/products").and_times(3))
+
+
+def test_failed_refresh_is_logged_and_stale_value_kept(caplog):
+    clock = FakeClock()
+    executor = ThreadPoolExecutor(max_workers=1)
+    cache = TTLCache(ttl=10, stale_ttl=10, clock=clock, executor=executor)
+    cache.get('products', lambda: ['stale'])
+
+    def unavailable():
+        abort(404)
+
+    clock.now = 15
+    assert_that(cache.get('products', unavailable), equal_to(['stale']))
+    executor.shutdown(wait=True)
+
+    assert_that(cache.refresh_errors, equal_to(1))
+    assert_that(caplog.text, contains_string('Refreshing 1 stale values failed'))
+
+
+def test_close_stops_the_refresh_threads_of_the_cache():
+    with TTLCache(ttl=10) as cache:
+        executor = cache._executor
+    given = ThreadPoolExecutor(max_workers=1)
+    TTLCache(ttl=10, executor=given).close()
+
+    assert_that(calling(executor.submit).with_args(print), raises(RuntimeError))
+    assert_that(given.submit(lambda: 'running').result(), equal_to('running'))
+    given.shutdown()
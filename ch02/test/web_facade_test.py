@@ -28,3 +28,15 @@ def test_product_with_content(mock_server):
             check_product(product)
         assert_that(products_imposter, had_request().with_path("/products").and_method("GET"))
         assert_that(content_imposter, had_request().with_path("/content").and_method("GET"))
+
+
+def test_product_with_content_on_pooled_imposters(imposter_pool):
+    for _ in range(2):
+        products_imposter = create_product_imposter()
+        content_imposter = create_content_imposter()
+        with imposter_pool([products_imposter, content_imposter]):
+            response = requests.get(f'{web_facade_url}{products_end_point}')
+            assert_that(response, is_response().with_status_code(200))
+            assert_that(response.json(), has_length(2))
+            assert_that(products_imposter, had_request().with_path("/products").and_method("GET").and_times(1))
+            assert_that(content_imposter, had_request().with_path("/content").and_method("GET").and_times(1))
@@ -1,7 +1,12 @@
-from imposter_builder import ImposterBuilder, Protocol
+from imposter_builder import ImposterBuilder, Protocol, load_imposters
+from os import path
 
 
 def create_inventory_imposter():
     return ImposterBuilder(port=3000, protocol=Protocol.HTTPS, name="Inventory Service")\
         .from_template('configfiles', 'inventory.json')\
         .create()
+
+
+def create_imposters():
+    return load_imposters('imposters.ejs', templates=path.dirname(__file__))
@@ -0,0 +1 @@
+pytest_plugins = ['imposter_builder.pytest_plugin']
@@ -1,2 +1,19 @@
 from .imposter_builder import ImposterBuilder, Protocol
 from .stub_builder import Method, Operator, ResponseMode, ProxyMode, Copy, UsingRegex
+from .template_registry import TemplateRegistry, template_registry, RenderCache, render_cache
+from .streaming import iter_array
+from .frozen import FrozenImposter
+from .install import (install_imposter, uninstall_imposter, install_imposters, uninstall_imposters, installed,
+                      InstallTiming)
+from .optimizer import optimize_stubs, OptimizationReport
+from .replay import compile_capture, read_capture
+from .config_loader import load_imposters, translate_ejs
+from .lazy import LazyImposter
+from .patch import diff_stubs, patch_stubs, replace_stubs, StubChange
+from .journal import RequestJournal, had_indexed_request
+from .pool import ImposterPool
+from .profiles import ResponseProfile, Fixed, Uniform, LogNormal, Spikes
+from .profiling import Profiler, profiler, profiling
+from .bodies import file_body, FileBody, body_store
+from .bulk import Format
+from .recording import ProxyRecording, compact_stubs, load_recording, CompactionStats
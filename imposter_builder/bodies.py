@@ -0,0 +1,169 @@
+from base64 import b64encode
+from collections import OrderedDict
+from hashlib import blake2b
+from mmap import ACCESS_READ, mmap
+from os import fspath, PathLike, stat
+from os.path import realpath
+from re import compile
+from threading import Lock
+from typing import Dict, Iterator, List, Tuple, Union
+from weakref import WeakValueDictionary
+
+_TOKEN = 'imposter_builder:file:'
+_TOKENS = compile(rb'"imposter_builder:file:([0-9a-f]{32})"')
+_HASH_CHUNK = 1 << 22
+CHUNK_SIZE = 3 << 18  # a multiple of 3, so each chunk is base64 encoded without padding
+
+
+class FileBody:
+    """The content of a file used as the body of responses. The file is memory-mapped when the body is sent, and
+    base64 encoded in chunks, so it is never held in memory as a whole.
+
+    :param path: path of the file
+    :param digest: hex digest of the content of the file
+    """
+
+    def __init__(self, path: str, digest: str):
+        self.path = path
+        self.digest = digest
+        status = stat(path)
+        self.size = status.st_size
+        self._signature = (status.st_size, status.st_mtime_ns)
+
+    @property
+    def token(self) -> str:
+        """Placeholder of the body in the definitions of responses, replaced by the content when installed"""
+        return _TOKEN + self.digest
+
+    @property
+    def encoded_size(self) -> int:
+        """Size of the base64 encoded content"""
+        return 4 * ((self.size + 2) // 3)
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """The base64 encoded content, in chunks encoded from `chunk_size` bytes of the file"""
+        status = stat(self.path)
+        if (status.st_size, status.st_mtime_ns) != self._signature:
+            raise ValueError(f"{self.path} has changed since it was used as a response body")
+        if not self.size:
+            return
+        with open(self.path, 'rb') as file, mmap(file.fileno(), 0, access=ACCESS_READ) as content:
+            for start in range(0, self.size, chunk_size):
+                yield b64encode(content[start:start + chunk_size])
+
+
+class BodyStore:
+    """File bodies by content: files with the same content share one :py:class:`FileBody`, which is hashed once
+    while the file is unchanged. Bodies are held by the responses using them, and forgotten once no response does;
+    the digests of the `maxsize` most recently added files are remembered, so they are not hashed again.
+
+    :param maxsize: maximum number of file digests remembered
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self._lock = Lock()
+        self._maxsize = maxsize
+        self._bodies: Dict[str, FileBody] = WeakValueDictionary()
+        self._digests: Dict[Tuple[str, int, int], str] = OrderedDict()
+
+    def add(self, path: Union[str, PathLike]) -> FileBody:
+        """The body with the content of a file
+
+        :param path: path of the file
+        """
+        path = realpath(fspath(path))
+        status = stat(path)
+        key = (path, status.st_size, status.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            digest = _digest(path, status.st_size)
+        with self._lock:
+            self._digests[key] = digest
+            self._digests.move_to_end(key)
+            while len(self._digests) > self._maxsize:
+                self._digests.popitem(last=False)
+            body = self._bodies.get(digest)
+            if body is None:
+                body = self._bodies[digest] = FileBody(path, digest)
+            return body
+
+    def get(self, digest: str) -> FileBody:
+        with self._lock:
+            body = self._bodies.get(digest)
+        if body is None:
+            raise ValueError(f"No file body with digest {digest}, no response uses it any more")
+        return body
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+            self._digests.clear()
+
+
+def _digest(path: str, size: int) -> str:
+    digest = blake2b(digest_size=16)
+    if size:
+        with open(path, 'rb') as file, mmap(file.fileno(), 0, access=ACCESS_READ) as content:
+            view = memoryview(content)
+            try:
+                for start in range(0, size, _HASH_CHUNK):
+                    digest.update(view[start:start + _HASH_CHUNK])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+body_store = BodyStore()
+
+
+def file_body(path: Union[str, PathLike]) -> FileBody:
+    """Body of a response sending the content of a file, see :py:meth:`StubBuilder.with_response`. It is encoded
+    as a placeholder by :py:func:`imposter_builder.encoding.encode`, and cannot be converted to JSON otherwise.
+
+    :param path: path of the file
+    """
+    return body_store.add(path)
+
+
+class StreamedPayload:
+    """A JSON payload whose file bodies are read while it is sent. Its length is known, so it is sent with a
+    `Content-Length` header rather than in HTTP chunks."""
+
+    def __init__(self, parts: List[Union[bytes, FileBody]], chunk_size: int = CHUNK_SIZE):
+        self._parts = parts
+        self._chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return sum(len(part) if isinstance(part, bytes) else part.encoded_size for part in self._parts)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part.chunks(self._chunk_size)
+
+    def __bytes__(self) -> bytes:
+        return b''.join(self)
+
+
+def streamed_payload(payload: bytes, store: BodyStore = body_store) -> Union[bytes, StreamedPayload]:
+    """The payload, with the placeholders of file bodies replaced by their base64 encoded content while it is sent
+
+    :param payload: JSON definition of imposters or stubs
+    :param store: store of the file bodies
+    """
+    if _TOKEN.encode('ascii') not in payload:
+        return payload
+    parts: List[Union[bytes, FileBody]] = []
+    position = 0
+    for match in _TOKENS.finditer(payload):
+        parts.append(payload[position:match.start() + 1])
+        parts.append(store.get(match.group(1).decode('ascii')))
+        position = match.end() - 1
+    parts.append(payload[position:])
+    return StreamedPayload(parts)
@@ -0,0 +1,111 @@
+from collections.abc import Mapping as MappingABC
+from contextlib import contextmanager
+from gc import disable, enable, isenabled
+from typing import Any, Callable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+from mbtest.imposters import Stub, Predicate
+
+from .stub_builder import build_response
+
+Row = Mapping[str, Any]
+Spec = Mapping[str, Any]
+Specs = Optional[Union[Spec, Sequence[Spec]]]
+
+
+def iter_rows(rows: Union[Iterable[Row], Mapping[str, Sequence[Any]]]) -> Iterator[Row]:
+    """Iterate over rows given either as an iterable of mappings or as columns, i.e. a mapping of
+    column name to a sequence of values.
+
+    :param rows: tabular rows or columnar arrays
+    """
+    if isinstance(rows, MappingABC):
+        names = list(rows.keys())
+        for values in zip(*(rows[name] for name in names)):
+            yield dict(zip(names, values))
+    else:
+        yield from rows
+
+
+class Format:
+    """A string formatted with each row using :py:meth:`str.format_map`, e.g. `Format('/user/{id}')`, as a value
+    of the specs of :py:func:`build_stubs`. Use `{{` and `}}` for literal braces.
+
+    :param template: format string
+    """
+    __slots__ = ('template',)
+
+    def __init__(self, template: str):
+        self.template = template
+
+    def __call__(self, row: Row) -> str:
+        return self.template.format_map(row)
+
+
+class _CompiledSpec:
+    """Keyword arguments for :py:class:`Predicate` or :py:func:`build_response`, split into values which are
+    the same for every row and values computed from each row.
+
+    Callables, including :py:class:`Format` strings, are called with the row and any other value, including
+    strings, is used as is.
+    """
+
+    def __init__(self, factory: Callable, spec: Spec):
+        self._factory = factory
+        self._static = {}
+        self._dynamic: List[Tuple[str, Callable[[Row], Any]]] = []
+        for key, value in spec.items():
+            if callable(value) and not isinstance(value, type):
+                self._dynamic.append((key, value))
+            else:
+                self._static[key] = value
+        self._prototype = factory(**self._static)
+
+    def build(self, row: Row):
+        if not self._dynamic:
+            return self._prototype
+        kwargs = dict(self._static)
+        for key, value in self._dynamic:
+            kwargs[key] = value(row)
+        return self._factory(**kwargs)
+
+
+def _compile(factory: Callable, specs: Specs) -> List[_CompiledSpec]:
+    if specs is None:
+        return []
+    if isinstance(specs, MappingABC):
+        specs = [specs]
+    return [_CompiledSpec(factory, spec) for spec in specs]
+
+
+@contextmanager
+def gc_paused():
+    """Pause the cyclic garbage collector while very many objects, none of them garbage, are created."""
+    was_enabled = isenabled()
+    disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            enable()
+
+
+def build_stubs(rows: Union[Iterable[Row], Mapping[str, Sequence[Any]]],
+                predicate_spec: Specs = None, response_spec: Specs = None,
+                predicate_factory: Callable[..., Predicate] = Predicate) -> Iterator[Stub]:
+    """Build one :py:class:`Stub` per row in a single pass, without a :py:class:`StubBuilder` per stub.
+
+    Predicates and responses which do not depend on the row are built once and shared by all stubs; the others
+    are built by the :py:class:`Predicate` constructor and :py:func:`build_response`, which validate them.
+
+    :param rows: tabular rows (an iterable of mappings) or columnar arrays (a mapping of sequences)
+    :param predicate_spec: keyword arguments of :py:meth:`StubBuilder.with_predicate`, or a sequence of them
+        for several predicates
+    :param response_spec: keyword arguments of :py:meth:`StubBuilder.with_response`, including `profile` and
+        `body_file`, or a sequence of them for several responses
+    :param predicate_factory: :py:class:`Predicate` or a subclass, called with the predicate keyword arguments
+    """
+    predicates = _compile(predicate_factory, predicate_spec) or [_CompiledSpec(predicate_factory, {})]
+    responses = _compile(build_response, response_spec) or [_CompiledSpec(build_response, {})]
+    for row in iter_rows(rows):
+        yield Stub(predicates=tuple([predicate.build(row) for predicate in predicates]),
+                   responses=tuple([response.build(row) for response in responses]))
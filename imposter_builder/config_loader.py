@@ -0,0 +1,146 @@
+from concurrent.futures import ProcessPoolExecutor
+from json import dumps, loads
+from os import cpu_count, getcwd
+from pathlib import Path
+from posixpath import dirname, join, normpath
+from re import compile, DOTALL
+from typing import List, Mapping, Optional
+
+from jinja2 import FileSystemLoader
+from mbtest.imposters import Imposter
+from mbtest.imposters.base import JsonStructure
+
+from .template_registry import TemplateRegistry
+
+_EJS_INCLUDE = compile(r'<%[-=]?\s*include\s+([^\s%]+)\s*-?%>')
+_EJS_OUTPUT = compile(r'<%[-=]\s*(.*?)\s*;?\s*-?%>', DOTALL)
+_JINJA_INCLUDE = compile(r'{%-?\s*include\s+[\'"]([^\'"]+)[\'"]\s*-?%}')
+# JSON strings, Jinja2 tags and brackets, scanned to find the includes which are elements of the imposters array
+_TOKENS = compile(r'"(?:\\.|[^"\\])*"|{%.*?%}|{{.*?}}|{#.*?#}|[\[\]{}]', DOTALL)
+# Jinja2 tags opening and closing blocks, within which an include may use the variables of the block
+_BLOCK_START = compile(r'{%-?\s*(?:(?:for|if|with|macro|call|filter|block)\b|set\s+[\w,\s]+?\s*-?%})')
+_BLOCK_END = compile(r'{%-?\s*end(?:for|if|with|macro|call|filter|block|set)\b')
+_FRAGMENT = '__include__ '
+
+
+def translate_ejs(source: str, directory: str = '') -> str:
+    """Translate the EJS tags used in `mountebank` config files into Jinja2: `<% include file %>` becomes
+    `{% include 'file' %}` and `<%- expression %>` becomes `{{ expression }}`.
+
+    :param source: EJS source
+    :param directory: folder of the file, relative to the root folder of the templates, which the paths of EJS
+        includes are relative to
+    """
+    source = _EJS_INCLUDE.sub(lambda match: "{% include '" + normpath(join(directory, match.group(1))) + "' %}",
+                              source)
+    return _EJS_OUTPUT.sub(lambda match: '{{ ' + match.group(1) + ' }}', source)
+
+
+def stringify(filename: str, path: str) -> str:
+    """Contents of a file, relative to the folder of `filename`, escaped to be included in a JSON string,
+    as the `stringify` function of `mountebank` config files.
+
+    :param filename: path of the file being rendered
+    :param path: path of the file to include
+    """
+    return dumps(Path(filename).parent.joinpath(path).read_text())[1:-1]
+
+
+def _fragment_includes(source: str) -> str:
+    """Replace the includes which are elements of the list of imposters, or of a top level list, with placeholders.
+    Other includes, e.g. of stubs within an imposter or within a `for` loop, are rendered with the file."""
+    parts, position, stack, key, blocks = [], 0, [], None, 0
+    for match in _TOKENS.finditer(source):
+        token = match.group()
+        if _BLOCK_START.match(token):
+            blocks += 1
+        elif _BLOCK_END.match(token):
+            blocks = max(0, blocks - 1)
+        elif token in ('{', '['):
+            imposters = token == '[' and (stack == [] or (stack == ['{'] and key == '"imposters"'))
+            stack.append('imposters' if imposters else token)
+        elif token in ('}', ']'):
+            if stack:
+                stack.pop()
+        elif token.startswith('"'):
+            if stack == ['{']:
+                key = token
+        elif stack and stack[-1] == 'imposters' and not blocks:
+            include = _JINJA_INCLUDE.fullmatch(token)
+            if include:
+                parts.append(source[position:match.start()])
+                parts.append(dumps(_FRAGMENT + include.group(1)))
+                position = match.end()
+    parts.append(source[position:])
+    return ''.join(parts)
+
+
+class ConfigLoader(FileSystemLoader):
+    """Jinja2 loader of config files written with Jinja2 or with EJS, as used by `mbtest --configfile`.
+    EJS is translated to Jinja2 when a file is loaded, so it is translated once per compiled template.
+
+    :param searchpath: path to root folder of config files
+    :param fragments: replace the includes of imposters in the loaded file with placeholders for
+        :py:func:`load_imposters` to render separately
+    """
+
+    def __init__(self, searchpath, fragments: bool = False):
+        super().__init__(searchpath)
+        self._fragments = fragments
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        if '<%' in source:
+            source = translate_ejs(source, dirname(template))
+        if self._fragments:
+            source = _fragment_includes(source)
+        return source, filename, uptodate
+
+
+config_registry = TemplateRegistry(loader=lambda templates: ConfigLoader(templates, fragments=True))
+fragment_registry = TemplateRegistry(loader=ConfigLoader)
+
+
+def _render(registry: TemplateRegistry, templates: str, config: str, values: Mapping) -> JsonStructure:
+    filename = str(Path(templates).joinpath(config))
+    rendered = registry.get_template(templates, config).render(dict(values, filename=filename, stringify=stringify))
+    return loads(rendered)
+
+
+def _render_fragment(templates: str, fragment: str, values: Mapping) -> JsonStructure:
+    return _render(fragment_registry, templates, fragment, values)
+
+
+def load_imposters(config: str, values: Optional[Mapping] = None, templates: Optional[str] = None,
+                   processes: Optional[int] = None, parallel_threshold: int = 16) -> List[Imposter]:
+    """Load the imposters of a `mountebank` config file, written either as a Jinja2 template or with the EJS
+    syntax of `mb --configfile` (`<% include file %>` and `<%- stringify(filename, 'file') %>`).
+
+    The file is either a single imposter definition or an object with a list of `imposters`. Imposter definitions
+    included directly in the list, outside any `for`, `if`, `set` or `with` block, are rendered independently, in a
+    pool of processes when there are at least `parallel_threshold` of them; other includes are rendered in place.
+    EJS includes are relative to the including file, as with `mb --configfile`.
+
+    :param config: path of the config file, relative to `templates`
+    :param values: dictionary containing values used in the templates
+    :param templates: path to root folder of config files, defaults to the current working directory
+    :param processes: number of processes rendering included imposters, `1` to render them in this process
+    :param parallel_threshold: minimum number of included imposters rendered in a pool of processes
+    """
+    templates = str(templates or getcwd())
+    values = dict(values or {})
+    definition = _render(config_registry, templates, config, values)
+    definitions = definition.get('imposters', [definition]) if isinstance(definition, dict) else definition
+
+    fragments = [item[len(_FRAGMENT):] for item in definitions if isinstance(item, str) and item.startswith(_FRAGMENT)]
+    workers = processes if processes is not None else min(len(fragments), cpu_count() or 1)
+    if workers > 1 and len(fragments) >= parallel_threshold:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rendered = list(executor.map(_render_fragment, [templates] * len(fragments), fragments,
+                                         [values] * len(fragments), chunksize=max(1, len(fragments) // (4 * workers))))
+    else:
+        rendered = [_render_fragment(templates, fragment, values) for fragment in fragments]
+
+    rendered = iter(rendered)
+    return [Imposter.from_structure(next(rendered) if isinstance(item, str) and item.startswith(_FRAGMENT)
+                                    else item) for item in definitions]
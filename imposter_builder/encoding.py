@@ -0,0 +1,38 @@
+from json import dumps, loads
+from typing import Union
+
+from mbtest.imposters.base import JsonStructure
+
+try:
+    from orjson import dumps as _orjson_dumps
+except ImportError:  # pragma: no cover
+    _orjson_dumps = None
+
+from .bodies import FileBody
+from .profiling import profiler
+
+
+def _placeholder(value) -> str:
+    if isinstance(value, FileBody):
+        return value.token
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode(structure: JsonStructure) -> bytes:
+    """Encode a JSON structure as compact UTF-8 bytes, using `orjson` when it is installed.
+    File bodies are encoded as placeholders, replaced by their content when the payload is sent."""
+    with profiler.timer('json.encode') as timer:
+        if _orjson_dumps is not None:
+            payload = _orjson_dumps(structure, default=_placeholder)
+        else:
+            payload = dumps(structure, separators=(',', ':'), ensure_ascii=False, default=_placeholder)\
+                .encode('utf-8')
+        timer.add_bytes(len(payload))
+        return payload
+
+
+def decode(text: Union[str, bytes]) -> JsonStructure:
+    """Decode JSON text, such as a rendered template"""
+    with profiler.timer('json.decode') as timer:
+        timer.add_bytes(len(text))
+        return loads(text)
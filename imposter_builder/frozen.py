@@ -0,0 +1,39 @@
+from mbtest.imposters import Imposter
+from mbtest.imposters.base import JsonStructure
+
+from .encoding import encode
+from .profiling import profiler
+
+
+class FrozenImposter(Imposter):
+    """An :py:class:`Imposter` whose definition is converted to JSON once, when it is frozen.
+    Created by :py:meth:`ImposterBuilder.create` with `frozen=True`.
+
+    :py:meth:`as_structure` returns the structure built when the imposter was frozen, without walking the stubs,
+    and :py:attr:`payload` holds the encoded definition, which is posted as is by
+    :py:func:`imposter_builder.install.install_imposter`. The stubs are copied into a tuple when the imposter is
+    frozen, so stubs added to the builder afterwards are not included.
+
+    :param imposter: imposter to freeze
+    """
+
+    def __init__(self, imposter: Imposter):
+        super().__init__(stubs=imposter.stubs, port=imposter.port, protocol=imposter.protocol, name=imposter.name,
+                         default_response=imposter.default_response, record_requests=imposter.record_requests,
+                         mutual_auth=imposter.mutual_auth, key=imposter.key, cert=imposter.cert)
+        # A tuple, so the stubs cannot be changed after freezing, like the structure and the payload.
+        self.stubs = tuple(self.stubs)
+        with profiler.timer('freeze'):
+            self._structure = imposter.as_structure()
+        self._payload = None
+
+    def as_structure(self) -> JsonStructure:
+        """The structure built when the imposter was frozen. It is shared, so must not be modified."""
+        return self._structure
+
+    @property
+    def payload(self) -> bytes:
+        """The imposter definition encoded as JSON, encoded on first use and then reused"""
+        if self._payload is None:
+            self._payload = encode(self._structure)
+        return self._payload
@@ -1,15 +1,23 @@
-from typing import Mapping, Optional, Union
+from typing import List, Mapping, Optional, Union
 
 from mbtest.imposters.base import JsonStructure
-from mbtest.imposters import Imposter, Response
+from mbtest.imposters import Imposter, Response, Stub
 from mbtest.imposters.responses import HttpResponse
-
-from jinja2 import Environment, FileSystemLoader
-from json import loads
-from os import getcwd
-from pathlib import Path
-
+from requests import Session
+
+from os import getcwd, PathLike
+
+from .bodies import file_body
+from .bulk import build_stubs, gc_paused
+from .frozen import FrozenImposter
+from .install import imposter_payload, install_imposter, ServerUrl
+from .lazy import LazyImposter
+from .optimizer import optimize_stubs
+from .profiling import profiler
+from .patch import diff_stubs, patch_stubs, replace_stubs, stub_digest, stub_payloads, StubChange
+from .streaming import iter_array
 from .stub_builder import StubBuilder
+from .template_registry import render_cache, template_registry
 
 Protocol = Imposter.Protocol
 
@@ -23,7 +31,8 @@ class ImposterBuilder:
     :param name: Imposter name - useful for interactive exploration of imposters on http://localhost:2525/imposters
     :param templates: Path to root folder containing Jinja2 templates for creating complex imposters
     """
-    _templates = Path(getcwd())
+    __slots__ = ('_port', '_protocol', '_name', '_stubs', '_default_response', '_templates', '_optimization_report',
+                 '_installed_stubs')
 
     def __init__(self, port: Optional[int] = None, protocol: Imposter.Protocol = Imposter.Protocol.HTTP,
                  name: Optional[str] = None, templates: Optional[str] = getcwd()):
@@ -33,6 +42,8 @@ class ImposterBuilder:
         self._stubs = []
         self._default_response = None
         self._templates = templates
+        self._optimization_report = None
+        self._installed_stubs = None
 
     @property
     def port(self):
@@ -70,41 +81,152 @@ class ImposterBuilder:
         """Start a new stub"""
         return StubBuilder(self)
 
+    def with_stubs(self, rows, predicate_spec=None, response_spec=None):
+        """Add one stub per row of data in a single pass, e.g. for data driven imposters with very many stubs.
+        Specs are the keyword arguments of :py:meth:`StubBuilder.with_predicate` and
+        :py:meth:`StubBuilder.with_response`; callables and :py:class:`Format` strings are called with the row,
+        other values are used as is.
+
+        :param rows: tabular rows (an iterable of mappings) or columnar arrays (a mapping of sequences)
+        :param predicate_spec: predicate keyword arguments, or a sequence of them for several predicates
+        :param response_spec: response keyword arguments, or a sequence of them for several responses
+        """
+        with gc_paused(), profiler.timer('stubs.bulk') as timer:
+            count = len(self._stubs)
+            self._stubs.extend(build_stubs(rows, predicate_spec, response_spec))
+            timer.add_count(len(self._stubs) - count)
+        return self
+
     def with_default(self,
                      body: Union[str, JsonStructure] = "",
                      status_code: Union[int, str] = 200,
                      headers: Optional[Mapping[str, str]] = None,
-                     mode: Optional[Response.Mode] = None):
+                     mode: Optional[Response.Mode] = None,
+                     body_file: Optional[Union[str, PathLike]] = None):
         """Define a default stub returned if no other stub matches
 
         :param body: Body text for response. Can be a string, or a JSON serialisable data structure.
         :param status_code:  HTTP status code
         :param headers: Response HTTP headers
         :param mode: Mode - text or binary
+        :param body_file: file whose content is sent as a binary body, see :py:meth:`StubBuilder.with_response`
         """
+        if body_file is not None:
+            if body:
+                raise ValueError("A response has either a body or a body file")
+            if mode not in (None, Response.Mode.BINARY):
+                raise ValueError("A body file is sent in binary mode")
+            body, mode = file_body(body_file), Response.Mode.BINARY
         self._default_response = HttpResponse(body=body, status_code=status_code, headers=headers, mode=mode)
         return self
 
-    def from_template(self, template: Optional[str], values: Optional[dict]):
+    def from_template(self, template: Optional[str], values: Optional[dict], stream: bool = False,
+                      lazy: bool = False, memoize: Optional[bool] = None):
         """Create an imposter from a Jinja2 template
 
         :param template: template as string or a path to a template file, relative to :py:property:`templates`
         :param values: dictionary containing values used in template
+        :param stream: parse the stubs one at a time while the template is rendered, rather than rendering
+            and parsing the whole template at once. Use for templates generating very many stubs.
+        :param lazy: return a :py:class:`LazyImposter`, which only renders the template when the imposter is
+            used and only builds its stubs when they are used
+        :param memoize: reuse the definition rendered for the same template and values, see :py:class:`RenderCache`.
+            Defaults to whether :py:data:`render_cache` is enabled. Ignored with `stream`.
         """
-        template_path = Path(template)
-        if Path(self.templates).joinpath(template_path).is_file():
-            environment = Environment(loader=FileSystemLoader(self.templates))
-            j2_template = environment.get_template(template)
-        else:
-            environment = Environment()
-            j2_template = environment.from_string(template)
+        if lazy:
+            if stream:
+                return LazyImposter(lambda: self.from_template(template, values, stream=True))
+            return LazyImposter(definition=lambda: render_cache.definition(self.templates, template, values, memoize))
+
+        if stream:
+            j2_template = template_registry.get_template(self.templates, template)
+            imposter_definition = {}
+            with profiler.timer('template.stream') as timer:
+                stubs = [Stub.from_structure(stub) for stub in
+                         iter_array(j2_template.generate(values), 'stubs', imposter_definition)]
+                timer.add_count(len(stubs))
+            imposter_definition['stubs'] = []
+            imposter = Imposter.from_structure(imposter_definition)
+            imposter.stubs = stubs
+            return imposter
+
+        imposter_definition = render_cache.definition(self.templates, template, values, memoize)
+
+        with profiler.timer('stubs.from_structure') as timer:
+            timer.add_count(len(imposter_definition.get('stubs') or ()))
+            return Imposter(port=self.port, protocol=self.protocol, name=self.name, stubs=self.stubs,
+                            default_response=self._default_response).from_structure(imposter_definition)
 
-        imposter_definition = loads(j2_template.render(values))
-
-        return Imposter(port=self.port, protocol=self.protocol, name=self.name, stubs=self.stubs,
-                        default_response=self._default_response).from_structure(imposter_definition)
-
-    def create(self):
-        """Create an :py:class:`Imposter` object"""
-        return Imposter(port=self.port, protocol=self.protocol, name=self.name, stubs=self.stubs,
-                        default_response=self._default_response)
+    @property
+    def optimization_report(self):
+        """Expected matching cost before and after the last :py:meth:`create` with `optimize`"""
+        return self._optimization_report
+
+    def create(self, frozen: bool = False, optimize: bool = False, lazy: bool = False):
+        """Create an :py:class:`Imposter` object
+
+        :param frozen: create a :py:class:`FrozenImposter`, whose JSON definition is built once and reused
+            every time it is installed. Stubs added to the builder afterwards are not included.
+        :param optimize: collapse runs of stubs matching only `equals` on path and/or method into single stubs
+            dispatching from a table, see :py:func:`optimize_stubs`. The report of the expected matching cost is
+            available from :py:attr:`optimization_report`. Requires `mountebank` to allow injection.
+        :param lazy: return a :py:class:`LazyImposter`, which only creates the imposter when it is used.
+            The imposter is created from the stubs of the builder at that time.
+        """
+        if lazy:
+            return LazyImposter(lambda: self.create(frozen=frozen, optimize=optimize), port=self.port,
+                                protocol=self.protocol, name=self.name)
+        with profiler.timer('build') as timer:
+            stubs = self.stubs
+            if optimize:
+                with profiler.timer('optimize') as optimize_timer:
+                    stubs, self._optimization_report = optimize_stubs(stubs)
+                    optimize_timer.add_count(len(stubs))
+            imposter = Imposter(port=self.port, protocol=self.protocol, name=self.name, stubs=stubs,
+                                default_response=self._default_response)
+            timer.add_count(len(stubs))
+            return FrozenImposter(imposter) if frozen else imposter
+
+    def install(self, server: ServerUrl, session: Optional[Session] = None, timeout: float = 10) -> Imposter:
+        """Create the imposter and install it on a `mountebank` server, remembering the stubs installed so that
+        :py:meth:`update` can later change only the stubs which differ.
+
+        :param server: a :py:class:`MountebankServer` or the URL of its imposters resource
+        :param session: session used to reuse connections to the server
+        :param timeout: request timeout, in seconds
+        """
+        imposter = self.create()
+        payloads = stub_payloads(imposter.stubs)
+        self._installed_stubs = None
+        install_imposter(server, imposter, session, timeout, imposter_payload(imposter, payloads))
+        self._installed_stubs = [stub_digest(payload) for payload in payloads]
+        return imposter
+
+    def update(self, imposter: Imposter, session: Optional[Session] = None, timeout: float = 10,
+               max_changes: int = 64) -> Optional[List[StubChange]]:
+        """Change the stubs of an imposter installed by :py:meth:`install` to the current stubs of the builder,
+        adding, replacing and deleting only the stubs which differ from the stubs last installed, one request per
+        stub. Recorded requests are kept.
+
+        :param imposter: imposter returned by :py:meth:`install`
+        :param session: session used to reuse connections to the server
+        :param timeout: request timeout, in seconds
+        :param max_changes: when more stubs change, all the stubs are replaced with a single request instead
+        :returns: the changes made, or `None` if all the stubs were replaced
+        """
+        payloads = stub_payloads(self.stubs)
+        changes = None
+        if self._installed_stubs is not None:
+            changes, digests = diff_stubs(self._installed_stubs, payloads)
+        # Until the changes are all made the installed stubs are unknown, so a failed update is followed by a
+        # full replace.
+        self._installed_stubs = None
+        if changes is None or len(changes) > max_changes:
+            replace_stubs(imposter, payloads, session, timeout)
+            changes = None
+            digests = [stub_digest(payload) for payload in payloads]
+        else:
+            patch_stubs(imposter, changes, session, timeout)
+        self._installed_stubs = digests
+        imposter.stubs = list(self.stubs)
+        return changes
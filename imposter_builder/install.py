@@ -0,0 +1,188 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import copy
+from time import perf_counter
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Union
+
+from furl import furl
+from mbtest.imposters import Imposter
+from mbtest.server import MountebankServer
+import requests
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from .bodies import streamed_payload
+from .encoding import encode
+from .profiling import profiler
+
+ServerUrl = Union[MountebankServer, furl, str]
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def imposters_url(server: ServerUrl) -> furl:
+    """URL of the imposters resource of a `mountebank` server, e.g. `http://localhost:2525/imposters`
+
+    :param server: a :py:class:`MountebankServer` or the URL of its imposters resource
+    """
+    return furl(server.server_url if isinstance(server, MountebankServer) else server)
+
+
+def imposter_payload(imposter: Imposter, stub_payloads: Optional[Sequence[bytes]] = None) -> bytes:
+    """JSON definition of an imposter as bytes, reusing the payload of a :py:class:`FrozenImposter`
+
+    :param imposter: imposter to encode
+    :param stub_payloads: JSON definitions of the stubs of the imposter, reused rather than encoding its stubs
+    """
+    payload = getattr(imposter, 'payload', None)
+    if payload is not None:
+        return payload
+    if stub_payloads is None:
+        return encode(imposter.as_structure())
+    shell = copy(imposter)
+    shell.stubs = []
+    structure = shell.as_structure()
+    structure.pop('stubs', None)
+    return b''.join((encode(structure)[:-1], b',"stubs":[', b','.join(stub_payloads), b']}'))
+
+
+def install_imposter(server: ServerUrl, imposter: Imposter, session: Optional[Session] = None,
+                     timeout: float = 10, payload: Optional[bytes] = None) -> Imposter:
+    """Post an imposter to a `mountebank` server and attach it to the server.
+    The definition of a :py:class:`FrozenImposter` is posted without being converted to JSON again.
+
+    :param server: a :py:class:`MountebankServer` or the URL of its imposters resource
+    :param imposter: imposter to install
+    :param session: session used to reuse connections to the server
+    :param timeout: request timeout, in seconds
+    :param payload: JSON definition of the imposter, see :py:func:`imposter_payload`, encoded if not given
+    """
+    url = imposters_url(server)
+    payload = streamed_payload(payload if payload is not None else imposter_payload(imposter))
+    with profiler.timer('install.http') as timer:
+        timer.add_bytes(len(payload))
+        post = (session or requests).post(str(url), data=payload, headers=JSON_HEADERS, timeout=timeout)
+        post.raise_for_status()
+    imposter.attach(url.host, post.json()['port'], url)
+    return imposter
+
+
+def uninstall_imposter(imposter: Imposter, session: Optional[Session] = None, timeout: float = 10):
+    """Delete an attached imposter from its `mountebank` server
+
+    :param imposter: imposter to delete
+    :param session: session used to reuse connections to the server
+    :param timeout: request timeout, in seconds
+    """
+    with profiler.timer('uninstall.http'):
+        (session or requests).delete(str(imposter.configuration_url), timeout=timeout).raise_for_status()
+
+
+class InstallTiming(NamedTuple):
+    """Time taken to install an imposter"""
+    imposter: Imposter
+    port: int
+    seconds: float
+
+
+def pooled_session(connections: int = 10) -> Session:
+    """Session keeping up to `connections` keep-alive connections to a server open, for use from many threads
+
+    :param connections: maximum number of connections kept open
+    """
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def install_imposters(server: ServerUrl, imposters: Iterable[Imposter], workers: int = 8, bulk: bool = False,
+                      session: Optional[Session] = None, timeout: float = 10) -> List[InstallTiming]:
+    """Install imposters concurrently, each with its own request, over pooled keep-alive connections.
+
+    With `bulk` the imposters are installed using a single `PUT /imposters` request instead, which is
+    faster but **replaces all the imposters** on the server and only reports the time of the whole request.
+
+    :param server: a :py:class:`MountebankServer` or the URL of its imposters resource
+    :param imposters: imposters to install
+    :param workers: maximum number of imposters installed at the same time
+    :param bulk: install all the imposters with one request
+    :param session: session used to reuse connections to the server, a pooled session is used if not given
+    :param timeout: request timeout, in seconds
+    :returns: time taken to install each imposter, in the order given
+    """
+    imposters = list(imposters)
+    url = imposters_url(server)
+    own_session = session is None
+    session = session or pooled_session(workers)
+    try:
+        if bulk:
+            return _install_bulk(url, imposters, session, timeout)
+
+        def install(imposter: Imposter) -> InstallTiming:
+            start = perf_counter()
+            install_imposter(url, imposter, session, timeout)
+            return InstallTiming(imposter, imposter.port, perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(imposters)))) as executor:
+            return list(executor.map(install, imposters))
+    finally:
+        if own_session:
+            session.close()
+
+
+def _install_bulk(url: furl, imposters: List[Imposter], session: Session, timeout: float) -> List[InstallTiming]:
+    start = perf_counter()
+    payloads = b','.join(imposter_payload(imposter) for imposter in imposters)
+    payload = streamed_payload(b''.join((b'{"imposters":[', payloads, b']}')))
+    with profiler.timer('install.bulk') as timer:
+        timer.add_bytes(len(payload))
+        timer.add_count(len(imposters))
+        put = session.put(str(url), data=payload, headers=JSON_HEADERS, timeout=timeout)
+        put.raise_for_status()
+    seconds = perf_counter() - start
+    for imposter, installed in zip(imposters, put.json()['imposters']):
+        imposter.attach(url.host, installed['port'], url)
+    return [InstallTiming(imposter, imposter.port, seconds) for imposter in imposters]
+
+
+def uninstall_imposters(imposters: Iterable[Imposter], workers: int = 8, session: Optional[Session] = None,
+                        timeout: float = 10):
+    """Delete attached imposters concurrently
+
+    :param imposters: imposters to delete
+    :param workers: maximum number of imposters deleted at the same time
+    :param session: session used to reuse connections to the server, a pooled session is used if not given
+    :param timeout: request timeout, in seconds
+    """
+    imposters = list(imposters)
+    own_session = session is None
+    session = session or pooled_session(workers)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(imposters)))) as executor:
+            list(executor.map(lambda imposter: uninstall_imposter(imposter, session, timeout), imposters))
+    finally:
+        if own_session:
+            session.close()
+
+
+@contextmanager
+def installed(server: ServerUrl, imposters: Iterable[Imposter], workers: int = 8, bulk: bool = False):
+    """Context manager installing imposters concurrently on entry and deleting them on exit,
+    an alternative to `with mock_server(imposters)` for fixtures with many imposters. When an imposter cannot be
+    installed, the imposters which were installed are deleted before the error is raised.
+
+    :param server: a :py:class:`MountebankServer` or the URL of its imposters resource
+    :param imposters: imposters to install
+    :param workers: maximum number of imposters installed or deleted at the same time
+    :param bulk: install all the imposters with one request, replacing any other imposters on the server
+    :returns: time taken to install each imposter
+    """
+    imposters = list(imposters)
+    with pooled_session(workers) as session:
+        try:
+            yield install_imposters(server, imposters, workers, bulk, session)
+        finally:
+            # Only the imposters attached to the server were installed, if installing failed part way.
+            uninstall_imposters([imposter for imposter in imposters if imposter.host is not None], workers, session)
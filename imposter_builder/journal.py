@@ -0,0 +1,261 @@
+from array import array
+from bisect import bisect_left
+from itertools import product
+from json import dumps
+from threading import RLock
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from furl import furl
+from hamcrest.core.core.isanything import IsAnything
+from hamcrest.core.core.isequal import IsEqual
+from hamcrest.core.description import Description
+from mbtest.imposters import Imposter
+from mbtest.imposters.base import JsonStructure
+from mbtest.imposters.imposters import HttpRequest
+from mbtest.matchers import HadRequest
+import requests
+from requests import Session
+
+from .profiling import profiler
+from .streaming import iter_array
+
+_KEYED = tuple(product((True, False), repeat=3))
+_UNINDEXED = object()
+
+
+def _freeze(query: Mapping[str, Any]) -> Tuple:
+    """Hashable form of a query, repeated parameters being lists"""
+    return tuple(sorted((name, tuple(value) if isinstance(value, list) else value) for name, value in query.items()))
+
+
+class RequestJournal:
+    """Index of the requests recorded by an imposter, for checking requests without scanning them all.
+
+    :py:meth:`refresh` streams the recorded requests from the `mountebank` server, parsing one request at a time,
+    and indexes those it has not seen yet by every combination of method, path and query, so the number of
+    matching requests is found with a lookup. Use :py:func:`had_indexed_request` to check requests.
+
+    With `drain` the requests are deleted from the server once indexed, so each refresh only reads the requests
+    recorded since the last one, however many were recorded before. Requests recorded while a refresh reads them
+    and deletes them are lost, so refresh when the imposter is idle, as an assertion does. Otherwise every refresh
+    reads all the recorded requests; if they were deleted since the last refresh, e.g. by an
+    :py:class:`ImposterPool`, the journal is emptied and indexes the requests recorded since.
+
+    :param imposter: imposter installed on a `mountebank` server, with `record_requests`
+    :param session: session used to reuse connections to the server
+    :param timeout: request timeout, in seconds
+    :param keep_requests: keep the recorded requests, needed to check their headers or body or to use
+        matchers other than equality. Without them only the positions of the requests are indexed.
+    :param chunk_size: size of the chunks of the recorded requests read from the server, in bytes
+    :param drain: delete the recorded requests from the server once they are indexed
+    """
+
+    def __init__(self, imposter: Imposter, session: Optional[Session] = None, timeout: float = 10,
+                 keep_requests: bool = True, chunk_size: int = 65536, drain: bool = False):
+        self._imposter = imposter
+        self._drain = drain
+        self._session = session
+        self._timeout = timeout
+        self._keep_requests = keep_requests
+        self._chunk_size = chunk_size
+        self._lock = RLock()
+        self._reset()
+
+    def _reset(self):
+        self._count = 0
+        self._checkpoint = 0
+        self._last: Optional[str] = None
+        self._index: Dict[Tuple, array] = {}
+        self._requests: List[JsonStructure] = []
+
+    @property
+    def imposter(self) -> Imposter:
+        return self._imposter
+
+    @property
+    def keep_requests(self) -> bool:
+        return self._keep_requests
+
+    def __len__(self) -> int:
+        """Number of requests indexed"""
+        return self._count
+
+    @property
+    def checkpoint(self) -> int:
+        """Number of requests indexed at the last :py:meth:`mark`"""
+        return self._checkpoint
+
+    def mark(self) -> int:
+        """Set the :py:attr:`checkpoint` to the number of requests indexed, returns the previous checkpoint"""
+        with self._lock:
+            previous, self._checkpoint = self._checkpoint, self._count
+            return previous
+
+    def refresh(self) -> int:
+        """Read the requests recorded since the last refresh, returns the number of new requests"""
+        with self._lock, profiler.timer('journal.refresh') as timer:
+            if self._drain:
+                added = self._read(0)
+                self._delete_recorded()
+            else:
+                added = self._read(self._count)
+                if added is None:
+                    # The requests were deleted since the last refresh, the positions of the new ones start at 0.
+                    self._reset()
+                    added = self._read(0)
+            timer.add_count(added)
+            return added
+
+    def _read(self, seen: int) -> Optional[int]:
+        """Index the recorded requests after the first `seen`, which must be the requests last indexed, returns the
+        number of requests indexed or `None` if the first requests are not those indexed"""
+        response = (self._session or requests).get(str(self._imposter.configuration_url), stream=True,
+                                                   timeout=self._timeout)
+        with response:
+            response.raise_for_status()
+            response.encoding = response.encoding or 'utf-8'
+            chunks = response.iter_content(self._chunk_size, decode_unicode=True)
+            position, request = -1, None
+            for position, request in enumerate(iter_array(chunks, 'requests')):
+                if position >= seen:
+                    self._add(request)
+                elif position == seen - 1 and _fingerprint(request) != self._last:
+                    return None
+        if position < seen - 1:
+            return None
+        if position >= seen:
+            self._last = _fingerprint(request)
+        return position + 1 - seen
+
+    def _delete_recorded(self):
+        (self._session or requests).delete(f"{self._imposter.configuration_url}/savedRequests",
+                                           timeout=self._timeout).raise_for_status()
+
+    def _add(self, request: JsonStructure):
+        fields = (request.get('method'), request.get('path'), _freeze(request.get('query') or {}))
+        for keyed in _KEYED:
+            key = tuple(field if use else None for field, use in zip(fields, keyed))
+            positions = self._index.get(key)
+            if positions is None:
+                positions = self._index[key] = array('q')
+            positions.append(self._count)
+        if self._keep_requests:
+            self._requests.append(request)
+        self._count += 1
+
+    def _positions(self, method: Optional[str], path: Optional[str], query: Optional[Mapping[str, Any]],
+                   since: int) -> Tuple[array, int]:
+        key = (method, None if path is None else str(path), None if query is None else _freeze(query))
+        positions = self._index.get(key, array('q'))
+        return positions, bisect_left(positions, since) if since else 0
+
+    def count(self, method: Optional[str] = None, path: Optional[str] = None,
+              query: Optional[Mapping[str, Any]] = None, since: int = 0) -> int:
+        """Number of indexed requests with the given method, path and query (any value if `None`)
+
+        :param since: only count the requests indexed after this many, e.g. a :py:attr:`checkpoint`
+        """
+        with self._lock:
+            positions, start = self._positions(method, path, query, since)
+            return len(positions) - start
+
+    def requests(self, method: Optional[str] = None, path: Optional[str] = None,
+                 query: Optional[Mapping[str, Any]] = None, since: int = 0) -> List[HttpRequest]:
+        """Indexed requests with the given method, path and query (any value if `None`)
+
+        :param since: only return the requests indexed after this many, e.g. a :py:attr:`checkpoint`
+        """
+        if not self._keep_requests:
+            raise ValueError("The journal does not keep the requests, create it with keep_requests=True")
+        with self._lock:
+            positions, start = self._positions(method, path, query, since)
+            return [HttpRequest.from_json(self._requests[position]) for position in positions[start:]]
+
+    def get_actual_requests(self) -> List[HttpRequest]:
+        """All the recorded requests, so that the journal can also be checked with `mbtest`'s `had_request`"""
+        self.refresh()
+        return self.requests()
+
+    def clear(self):
+        """Delete the requests recorded by the imposter on the server and empty the journal"""
+        with self._lock:
+            self._delete_recorded()
+            self._reset()
+
+
+def _fingerprint(request: JsonStructure) -> str:
+    return dumps(request, sort_keys=True, separators=(',', ':'))
+
+
+def _indexed_value(matcher):
+    if isinstance(matcher, IsAnything):
+        return None
+    if isinstance(matcher, IsEqual) and isinstance(matcher.object, (str, furl, Mapping)):
+        return matcher.object
+    return _UNINDEXED
+
+
+class HadIndexedRequest(HadRequest):
+    """:py:class:`RequestJournal` has indexed a matching request, see :py:func:`had_indexed_request`"""
+
+    def __init__(self):
+        super().__init__()
+        self._since_last_check = False
+        self.matched = 0
+        self.recorded = 0
+        self.matching_requests = None
+
+    def since_last_check(self):
+        """Only match the requests indexed since the last check of the journal with this option"""
+        self._since_last_check = True
+        return self
+
+    def _matches(self, actual) -> bool:
+        if not isinstance(actual, RequestJournal):
+            return super()._matches(actual)
+
+        actual.refresh()
+        since = actual.checkpoint if self._since_last_check else 0
+        method, path, query = (_indexed_value(matcher) for matcher in (self.method, self.path, self.query))
+        unindexed = [matcher for matcher, value in ((self.method, method), (self.path, path), (self.query, query))
+                     if value is _UNINDEXED]
+        if unindexed or not isinstance(self.headers, IsAnything) or not isinstance(self.body, IsAnything):
+            candidates = actual.requests(*(None if value is _UNINDEXED else value for value in (method, path, query)),
+                                         since=since)
+            self.matching_requests = [request for request in candidates
+                                      if self.method.matches(request.method) and self.path.matches(request.path)
+                                      and self.query.matches(request.query)
+                                      and self.headers.matches(request.headers) and self.body.matches(request.body)]
+            self.matched = len(self.matching_requests)
+        else:
+            self.matching_requests = None
+            self.matched = actual.count(method, path, query, since)
+        self.recorded = len(actual) - since
+        if self._since_last_check:
+            actual.mark()
+
+        if isinstance(self.times, IsAnything):
+            return self.matched > 0
+        return self.times.matches(self.matched)
+
+    def describe_mismatch(self, actual, description: Description) -> None:
+        if not isinstance(actual, RequestJournal):
+            return super().describe_mismatch(actual, description)
+        description.append_text("found ").append_description_of(self.matched)
+        description.append_text(" matching requests of ").append_description_of(self.recorded)
+        description.append_text(" recorded requests")
+        if self._since_last_check:
+            description.append_text(" since the last check")
+        if self.matching_requests:
+            description.append_text(": ").append_description_of(self.matching_requests)
+
+
+def had_indexed_request() -> HadIndexedRequest:
+    """Matcher of a :py:class:`RequestJournal` which has indexed a matching request, used like `mbtest`'s
+    `had_request`: `assert_that(journal, had_indexed_request().with_path('/test').and_times(2))`.
+
+    Methods, paths and queries matched with equality are looked up in the index of the journal; other matchers
+    and matching headers or bodies scan the requests with the method, path and query looked up.
+    Imposters and servers are matched like `had_request` does.
+    """
+    return HadIndexedRequest()
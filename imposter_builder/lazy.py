@@ -0,0 +1,90 @@
+from typing import Callable, Optional
+
+from mbtest.imposters import Imposter
+from mbtest.imposters.base import JsonStructure
+
+from .encoding import encode
+
+
+class LazyImposter(Imposter):
+    """A handle to an imposter which is only built when it is needed. Created by :py:meth:`ImposterBuilder.create`
+    and :py:meth:`ImposterBuilder.from_template` with `lazy=True`.
+
+    The handle keeps a recipe: either a function building the :py:class:`Imposter`, or a function returning its
+    JSON definition, e.g. by rendering a template. Using the `url` of the imposter, installing it or checking its
+    recorded requests needs no more than the definition; the objects of the imposter, its stubs, predicates and
+    responses, are only built when they are used.
+
+    :param recipe: function building the imposter
+    :param definition: function returning the JSON definition of the imposter
+    :param port: port of the imposter, if known without following the recipe
+    :param protocol: protocol of the imposter, if known without following the recipe
+    :param name: name of the imposter, if known without following the recipe
+    """
+
+    def __init__(self, recipe: Optional[Callable[[], Imposter]] = None,
+                 definition: Optional[Callable[[], JsonStructure]] = None, port: Optional[int] = None,
+                 protocol: Optional[Imposter.Protocol] = None, name: Optional[str] = None):
+        if (recipe is None) == (definition is None):
+            raise ValueError("Either a recipe or a definition is required")
+        self._recipe = recipe
+        self._definition_recipe = definition
+        self._definition = None
+        self._imposter = None
+        self.host = None
+        self.server_url = None
+        if port is not None:
+            self.port = port
+        if protocol is not None:
+            self.protocol = protocol if isinstance(protocol, Imposter.Protocol) else Imposter.Protocol(protocol)
+        if name is not None:
+            self.name = name
+
+    @property
+    def materialized(self) -> bool:
+        """Whether the objects of the imposter have been built"""
+        return self._imposter is not None
+
+    def materialize(self) -> Imposter:
+        """Build the imposter, if it has not been built already"""
+        if self._imposter is None:
+            if self._recipe is not None:
+                self._imposter = self._recipe()
+            else:
+                self._imposter = Imposter.from_structure(self._structure())
+        return self._imposter
+
+    def _structure(self) -> JsonStructure:
+        if self._definition is None:
+            definition = dict(self._definition_recipe())
+            definition.setdefault('recordRequests', True)
+            self._definition = definition
+        return self._definition
+
+    def __getattr__(self, name):
+        # Only called for attributes not set on the handle itself.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._imposter is None and self._definition_recipe is not None and name in ('port', 'protocol', 'name'):
+            value = self._structure().get(name)
+            return Imposter.Protocol(value) if name == 'protocol' else value
+        return getattr(self.materialize(), name)
+
+    def as_structure(self) -> JsonStructure:
+        if self._imposter is None and self._definition_recipe is not None:
+            structure = dict(self._structure())
+        else:
+            structure = dict(self.materialize().as_structure())
+        if self.__dict__.get('port'):
+            structure['port'] = self.__dict__['port']
+        return structure
+
+    @property
+    def payload(self) -> bytes:
+        """The imposter definition encoded as JSON, reusing the payload of a :py:class:`FrozenImposter` recipe"""
+        if self._definition_recipe is None:
+            imposter = self.materialize()
+            frozen_payload = getattr(imposter, 'payload', None)
+            if frozen_payload is not None and self.__dict__.get('port') in (None, imposter.port):
+                return frozen_payload
+        return encode(self.as_structure())
@@ -0,0 +1,116 @@
+from json import dumps
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from mbtest.imposters import Stub, Predicate, Response, InjectionPredicate, InjectionResponse
+
+from .bodies import FileBody
+
+ANY = '*'
+
+_LOOKUP = """
+    var request = config.request || config;
+    var keys = %s;
+    var found = -1;
+    [request.method + ' ' + request.path, '* ' + request.path, request.method + ' *'].forEach(function (key) {
+        if (Object.prototype.hasOwnProperty.call(keys, key) && (found < 0 || keys[key] < found)) {
+            found = keys[key];
+        }
+    });"""
+
+_PREDICATE = "function (config) {%s\n    return found >= 0;\n}"
+
+_RESPONSE = "function (config) {%s\n    var responses = %s;\n    return responses[found];\n}"
+
+
+class OptimizationReport(NamedTuple):
+    """Expected matching cost of an imposter's stubs before and after optimization.
+    The cost is the mean number of stubs `mountebank` checks to find the matching stub,
+    assuming every stub is equally likely to match a request.
+    """
+    stubs_before: int
+    stubs_after: int
+    cost_before: float
+    cost_after: float
+
+    @property
+    def speedup(self) -> float:
+        return self.cost_before / self.cost_after if self.cost_after else 1.0
+
+
+def _dispatch_key(stub: Stub) -> Optional[str]:
+    """Key of a stub matching only `equals` on path and/or method and always sending the same plain response,
+    or `None` if the stub cannot be dispatched from a table"""
+    if len(stub.predicates) != 1 or len(stub.responses) != 1:
+        return None
+    predicate, response = stub.predicates[0], stub.responses[0]
+    if type(predicate) is not Predicate or type(response) is not Response:
+        return None
+    if predicate.operator != Predicate.Operator.EQUALS or not predicate.case_sensitive or predicate.xpath \
+            or predicate.query or predicate.body or predicate.headers or not (predicate.path or predicate.method):
+        return None
+    if response.wait or response.repeat or response.copy or response.decorate or response.lookup \
+            or response.shell_transform or isinstance(response.body, FileBody):
+        return None
+    method = predicate.method.value if predicate.method else ANY
+    path = str(predicate.path) if predicate.path else ANY
+    return f"{method} {path}"
+
+
+def dispatch_stub(run: Sequence[Tuple[str, Stub]]) -> Stub:
+    """A single stub, using injection, equivalent to a run of stubs matching on path and/or method.
+    The earliest stub matching a request is used, as `mountebank` would.
+
+    :param run: dispatch keys and stubs
+    """
+    keys = {}
+    responses = []
+    for key, stub in run:
+        if key not in keys:
+            keys[key] = len(responses)
+            responses.append(stub.responses[0].http_response.as_structure())
+    lookup = _LOOKUP % dumps(keys)
+    return Stub(predicates=[InjectionPredicate(_PREDICATE % lookup)],
+                responses=[InjectionResponse(_RESPONSE % (lookup, dumps(responses)))])
+
+
+def optimize_stubs(stubs: Sequence[Stub], min_run: int = 8) -> Tuple[List[Stub], OptimizationReport]:
+    """Collapse runs of consecutive stubs which only match `equals` on path and/or method, and always send the
+    same plain response, into a single stub dispatching from a table using injection. Responses with a file body
+    are not plain, their body is only sent when installed. Stubs are only collapsed with their neighbours, so the
+    first match between all the stubs is unchanged.
+
+    The imposter must be installed on a `mountebank` server started with `--allowInjection`.
+
+    :param stubs: stubs to optimize
+    :param min_run: minimum number of consecutive stubs to collapse
+    :returns: optimized stubs and a report of the expected matching cost
+    """
+    optimized = []
+    positions = []
+    run = []
+
+    def flush():
+        if len(run) >= min_run:
+            optimized.append(dispatch_stub(run))
+            positions.extend([len(optimized)] * len(run))
+        else:
+            for _, stub in run:
+                optimized.append(stub)
+                positions.append(len(optimized))
+        run.clear()
+
+    for stub in stubs:
+        key = _dispatch_key(stub)
+        if key is None:
+            flush()
+            optimized.append(stub)
+            positions.append(len(optimized))
+        else:
+            run.append((key, stub))
+    flush()
+
+    count = len(stubs)
+    report = OptimizationReport(stubs_before=count, stubs_after=len(optimized),
+                                cost_before=(count + 1) / 2 if count else 0.0,
+                                cost_after=sum(positions) / count if count else 0.0)
+    return optimized, report
@@ -0,0 +1,109 @@
+from difflib import SequenceMatcher
+from hashlib import blake2b
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from mbtest.imposters import Imposter, Stub
+import requests
+from requests import Session
+
+from .bodies import streamed_payload
+from .encoding import encode
+from .install import JSON_HEADERS
+from .profiling import profiler
+
+ADD = 'add'
+REPLACE = 'replace'
+DELETE = 'delete'
+
+
+class StubChange(NamedTuple):
+    """A change to the stubs of an installed imposter, made with one request to a per-stub endpoint of
+    `mountebank`. Changes are applied in order and `index` is the index of the stub when the change is applied."""
+    operation: str
+    index: int
+    stub: Optional[bytes] = None
+
+
+def stub_payloads(stubs: Iterable[Stub]) -> List[bytes]:
+    """JSON definitions of stubs as bytes"""
+    return [encode(stub.as_structure()) for stub in stubs]
+
+
+def stub_digest(payload: bytes) -> bytes:
+    """Digest of the JSON definition of a stub, remembered in place of the installed stub"""
+    return blake2b(payload, digest_size=16).digest()
+
+
+def diff_stubs(installed: Sequence[bytes], payloads: Sequence[bytes]) -> Tuple[List[StubChange], List[bytes]]:
+    """Compute the changes turning the installed stubs into new stubs, adding, replacing and deleting as few
+    stubs as possible.
+
+    :param installed: digests of the installed stubs, see :py:func:`stub_digest`
+    :param payloads: JSON definitions of the new stubs
+    :returns: the changes, in the order they are applied, and the digests of the new stubs
+    """
+    digests = [stub_digest(payload) for payload in payloads]
+    # Most updates change a few stubs of a long list: trim the common ends before matching the rest.
+    start, old_end, new_end = 0, len(installed), len(digests)
+    while start < old_end and start < new_end and installed[start] == digests[start]:
+        start += 1
+    while old_end > start and new_end > start and installed[old_end - 1] == digests[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+
+    changes = []
+    matcher = SequenceMatcher(None, installed[start:old_end], digests[start:new_end], autojunk=False)
+    # Applying the blocks from the end keeps the indices of the blocks before them valid.
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == 'equal':
+            continue
+        i1, i2, j1, j2 = i1 + start, i2 + start, j1 + start, j2 + start
+        common = min(i2 - i1, j2 - j1)
+        changes.extend(StubChange(REPLACE, i1 + offset, payloads[j1 + offset]) for offset in range(common))
+        changes.extend(StubChange(DELETE, index) for index in reversed(range(i1 + common, i2)))
+        changes.extend(StubChange(ADD, i1 + offset, payloads[j1 + offset]) for offset in range(common, j2 - j1))
+    return changes, digests
+
+
+def patch_stubs(imposter: Imposter, changes: Iterable[StubChange], session: Optional[Session] = None,
+                timeout: float = 10):
+    """Apply changes to the stubs of an attached imposter, one request per change
+
+    :param imposter: imposter installed on a `mountebank` server
+    :param changes: changes computed by :py:func:`diff_stubs`
+    :param session: session used to reuse connections to the server
+    :param timeout: request timeout, in seconds
+    """
+    http = session or requests
+    url = f"{imposter.configuration_url}/stubs"
+    for change in changes:
+        with profiler.timer('install.patch') as timer:
+            timer.add_bytes(len(change.stub or b''))
+            timer.add_count(1)
+            if change.operation == ADD:
+                response = http.post(url, data=streamed_payload(b'{"index":%d,"stub":%s}' % (change.index,
+                                                                                             change.stub)),
+                                     headers=JSON_HEADERS, timeout=timeout)
+            elif change.operation == REPLACE:
+                response = http.put(f"{url}/{change.index}", data=streamed_payload(change.stub),
+                                    headers=JSON_HEADERS, timeout=timeout)
+            else:
+                response = http.delete(f"{url}/{change.index}", timeout=timeout)
+            response.raise_for_status()
+
+
+def replace_stubs(imposter: Imposter, payloads: Sequence[bytes], session: Optional[Session] = None,
+                  timeout: float = 10):
+    """Replace all the stubs of an attached imposter with one request, keeping its recorded requests
+
+    :param imposter: imposter installed on a `mountebank` server
+    :param payloads: JSON definitions of the new stubs
+    :param session: session used to reuse connections to the server
+    :param timeout: request timeout, in seconds
+    """
+    payload = streamed_payload(b''.join((b'{"stubs":[', b','.join(payloads), b']}')))
+    with profiler.timer('install.replace') as timer:
+        timer.add_bytes(len(payload))
+        timer.add_count(len(payloads))
+        (session or requests).put(f"{imposter.configuration_url}/stubs", data=payload, headers=JSON_HEADERS,
+                                  timeout=timeout).raise_for_status()
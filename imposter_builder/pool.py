@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from mbtest.imposters import Imposter
+from mbtest.imposters.base import JsonStructure
+import requests
+from requests import Session
+
+from .bodies import streamed_payload
+from .encoding import encode
+from .install import imposters_url, JSON_HEADERS, ServerUrl
+from .profiling import profiler
+
+
+def _reusable(structure: JsonStructure) -> bool:
+    """Whether an imposter is reset by replacing its stubs and deleting its recorded requests. Injected predicates
+    and responses and the `decorate` and `shellTransform` behaviors can keep state, e.g. in the imposter state of
+    `mountebank`, which is only reset by installing the imposter again."""
+    for stub in structure.get('stubs') or ():
+        if any(_injected(predicate) for predicate in stub.get('predicates') or ()):
+            return False
+        for response in stub.get('responses') or ():
+            behaviors = response.get('_behaviors') or {}
+            if 'inject' in response or 'decorate' in behaviors or 'shellTransform' in behaviors \
+                    or 'decorate' in (response.get('proxy') or {}):
+                return False
+    return True
+
+
+def _injected(predicate: JsonStructure) -> bool:
+    if 'inject' in predicate:
+        return True
+    inner = predicate.get('and') or predicate.get('or') or ([predicate['not']] if 'not' in predicate else ())
+    return any(_injected(nested) for nested in inner)
+
+
+class _Pooled:
+    def __init__(self, key: Tuple, port: int, structure: JsonStructure):
+        self.key = key
+        self.port = port
+        self.stubs = encode({'stubs': structure.get('stubs') or []})
+        self.reusable = _reusable(structure)
+        self.in_use = False
+
+
+class ImposterPool:
+    """Keeps imposters running on a `mountebank` server between tests instead of installing and deleting them
+    for each test, used like the `mock_server` fixture: `with imposter_pool([imposter]):`.
+
+    Imposters are keyed by a digest of their definition. An imposter with the same definition as a running, idle
+    imposter is attached to it, after deleting its recorded requests and replacing its stubs, which undoes stubs
+    added while it ran and restarts cycling responses, rather than installed again. Imposters which can keep
+    state in `mountebank`, with injection or the `decorate` or `shellTransform` behaviors, are installed again.
+    Imposters without a port get one from `ports`; when all the ports are taken, the least recently used idle
+    imposter is deleted and its port recycled.
+
+    :param server: a :py:class:`MountebankServer` or the URL of its imposters resource
+    :param ports: ports given to imposters which do not define one
+    :param session: session used to reuse connections to the server
+    :param timeout: request timeout, in seconds
+    """
+
+    def __init__(self, server: ServerUrl, ports: Sequence[int] = range(4545, 4645), session: Optional[Session] = None,
+                 timeout: float = 10):
+        self._url = imposters_url(server)
+        self._ports = list(ports)
+        self._session = session or requests.Session()
+        self._own_session = session is None
+        self._timeout = timeout
+        self._lock = RLock()
+        self._by_key: Dict[Tuple, List[_Pooled]] = {}
+        self._by_port: Dict[int, _Pooled] = OrderedDict()
+        self._imposters: List[Imposter] = []
+        self.installs = 0
+        self.reuses = 0
+
+    def __call__(self, imposters: Iterable[Imposter]) -> "ImposterPool":
+        self._imposters = list(imposters)
+        return self
+
+    def __enter__(self) -> "ImposterPool":
+        acquired = []
+        try:
+            for imposter in self._imposters:
+                acquired.append(self.acquire(imposter))
+        except Exception:
+            self.release(acquired)
+            raise
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        self.release(self._imposters)
+
+    def acquire(self, imposter: Imposter) -> Imposter:
+        """Attach an imposter to a running imposter with the same definition, installing it if there is none
+
+        :param imposter: imposter to attach
+        """
+        structure = dict(imposter.as_structure())
+        fixed_port = structure.pop('port', None)
+        key = (fixed_port, blake2b(encode(structure), digest_size=16).digest())
+        with self._lock:
+            pooled = next((pooled for pooled in self._by_key.get(key, ()) if not pooled.in_use), None)
+            if pooled is not None and not pooled.reusable:
+                port = pooled.port
+                self._delete(port)
+                pooled = self._install(key, port, structure)
+            elif pooled is not None:
+                self._by_port.move_to_end(pooled.port)
+                self._reset(pooled)
+                self.reuses += 1
+            else:
+                port = fixed_port if fixed_port is not None else self._free_port()
+                self._evict(port)
+                pooled = self._install(key, port, structure)
+            pooled.in_use = True
+        imposter.attach(self._url.host, pooled.port, self._url)
+        return imposter
+
+    def release(self, imposters: Iterable[Imposter]):
+        """Mark imposters as no longer used by a test, keeping them running
+
+        :param imposters: imposters attached by :py:meth:`acquire`
+        """
+        with self._lock:
+            for imposter in imposters:
+                pooled = self._by_port.get(imposter.port)
+                if pooled is not None:
+                    pooled.in_use = False
+
+    def close(self):
+        """Delete all the imposters of the pool from the server"""
+        with self._lock:
+            for port in list(self._by_port):
+                self._delete(port)
+        if self._own_session:
+            self._session.close()
+
+    def _free_port(self) -> int:
+        free = [port for port in self._ports if port not in self._by_port]
+        if free:
+            return free[0]
+        for pooled in self._by_port.values():
+            if not pooled.in_use and pooled.port in self._ports:
+                return pooled.port
+        raise RuntimeError(f"All {len(self._ports)} ports of the imposter pool are in use")
+
+    def _evict(self, port: int):
+        pooled = self._by_port.get(port)
+        if pooled is not None:
+            if pooled.in_use:
+                raise RuntimeError(f"Port {port} is used by another imposter of the pool")
+            self._delete(port)
+
+    def _install(self, key: Tuple, port: int, structure: JsonStructure) -> _Pooled:
+        payload = streamed_payload(encode(dict(structure, port=port)))
+        with profiler.timer('pool.install') as timer:
+            timer.add_bytes(len(payload))
+            post = self._session.post(str(self._url), data=payload, headers=JSON_HEADERS, timeout=self._timeout)
+            post.raise_for_status()
+        pooled = _Pooled(key, post.json()['port'], structure)
+        self._by_key.setdefault(key, []).append(pooled)
+        self._by_port[pooled.port] = pooled
+        self.installs += 1
+        return pooled
+
+    def _reset(self, pooled: _Pooled):
+        url = f"{self._url}/{pooled.port}"
+        with profiler.timer('pool.reset'):
+            self._session.delete(f"{url}/savedRequests", timeout=self._timeout).raise_for_status()
+            self._session.put(f"{url}/stubs", data=streamed_payload(pooled.stubs), headers=JSON_HEADERS,
+                              timeout=self._timeout).raise_for_status()
+
+    def _delete(self, port: int):
+        pooled = self._by_port.pop(port)
+        self._by_key[pooled.key].remove(pooled)
+        if not self._by_key[pooled.key]:
+            del self._by_key[pooled.key]
+        self._session.delete(f"{self._url}/{port}", timeout=self._timeout).raise_for_status()
@@ -0,0 +1,213 @@
+from hashlib import blake2b
+from json import dumps
+from math import isinf, isnan, log
+from random import Random
+from time import monotonic
+from typing import Mapping, NamedTuple, Optional, Union
+
+from mbtest.imposters.base import JsonStructure
+
+_Z99 = 2.3263478740408408  # 99th percentile of the standard normal distribution
+
+
+def _number(value: float) -> str:
+    """JavaScript literal of a number, `Infinity` for an infinite one"""
+    value = float(value)
+    if isnan(value):
+        raise ValueError("A profile cannot use NaN")
+    if isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    return repr(value)
+
+
+class Fixed(NamedTuple):
+    """Latency of `ms` milliseconds"""
+    ms: float
+
+    @property
+    def javascript(self) -> str:
+        return _number(self.ms)
+
+    def sample(self, random: Random) -> float:
+        return self.ms
+
+
+class Uniform(NamedTuple):
+    """Latency uniformly distributed between `low` and `high` milliseconds"""
+    low: float
+    high: float
+
+    @property
+    def javascript(self) -> str:
+        return f"({_number(self.low)} + Math.random() * {_number(self.high - self.low)})"
+
+    def sample(self, random: Random) -> float:
+        return random.uniform(self.low, self.high)
+
+
+class LogNormal(NamedTuple):
+    """Log-normally distributed latency, the distribution of most service response times, with a median of
+    `median` and a 99th percentile of `p99` milliseconds"""
+    median: float
+    p99: float
+
+    @property
+    def mu(self) -> float:
+        return log(self.median)
+
+    @property
+    def sigma(self) -> float:
+        return max(0.0, log(self.p99) - log(self.median)) / _Z99
+
+    @property
+    def javascript(self) -> str:
+        # Box-Muller transform of two uniform samples into a standard normal sample.
+        return (f"Math.exp({_number(self.mu)} + {_number(self.sigma)} * Math.sqrt(-2 * Math.log(1 - Math.random()))"
+                f" * Math.cos(2 * Math.PI * Math.random()))")
+
+    def sample(self, random: Random) -> float:
+        return random.lognormvariate(self.mu, self.sigma)
+
+
+class Spikes(NamedTuple):
+    """Latency usually distributed as `base`, but distributed as `spike` for a fraction `rate` of responses,
+    e.g. to model garbage collection pauses"""
+    base: "Latency"
+    rate: float
+    spike: "Latency"
+
+    @property
+    def javascript(self) -> str:
+        return f"(Math.random() < {_number(self.rate)} ? {self.spike.javascript} : {self.base.javascript})"
+
+    def sample(self, random: Random) -> float:
+        return self.spike.sample(random) if random.random() < self.rate else self.base.sample(random)
+
+
+Latency = Union[Fixed, Uniform, LogNormal, Spikes]
+_DISTRIBUTIONS = {distribution.__name__: distribution for distribution in (Fixed, Uniform, LogNormal, Spikes)}
+
+
+def _latency_structure(latency: Latency) -> JsonStructure:
+    return dict({name: _latency_structure(value) if isinstance(value, tuple) else value
+                 for name, value in latency._asdict().items()}, distribution=type(latency).__name__)
+
+
+def _latency_from_structure(structure: JsonStructure) -> Latency:
+    fields = dict(structure)
+    distribution = _DISTRIBUTIONS[fields.pop('distribution')]
+    return distribution(**{name: _latency_from_structure(value) if isinstance(value, dict) else value
+                           for name, value in fields.items()})
+
+
+class ResponseProfile(NamedTuple):
+    """How a simulated downstream service performs: its latency, error rate and throughput. Passed to
+    :py:meth:`StubBuilder.with_response` as `profile`, it generates the JavaScript of the `wait` and `decorate`
+    behaviors of the response, so `mountebank` must be started with `--allowInjection`.
+
+    :param latency: distribution of the response times, e.g. `LogNormal(median=20, p99=250)`
+    :param error_rate: fraction of the responses replaced by errors
+    :param error_status: HTTP status code of the errors
+    :param error_body: body of the errors
+    :param max_rps: maximum number of requests answered per second, the others are rejected with
+        `throttle_status`. Requests are counted by a token bucket holding up to `burst` requests.
+    :param burst: number of requests which can be answered at once, defaults to `max_rps`
+    :param throttle_status: HTTP status code of rejected requests
+    """
+    latency: Optional[Latency] = None
+    error_rate: float = 0.0
+    error_status: int = 500
+    error_body: str = ''
+    max_rps: Optional[float] = None
+    burst: Optional[float] = None
+    throttle_status: int = 429
+
+    def as_structure(self) -> JsonStructure:
+        structure = self._asdict()
+        if self.latency is not None:
+            structure['latency'] = _latency_structure(self.latency)
+        return structure
+
+    @classmethod
+    def from_structure(cls, structure: JsonStructure) -> "ResponseProfile":
+        fields = dict(structure)
+        if fields.get('latency') is not None:
+            fields['latency'] = _latency_from_structure(fields['latency'])
+        return cls(**fields)
+
+    @property
+    def _state_key(self) -> str:
+        canonical = dumps(self.as_structure(), separators=(',', ':'), sort_keys=True)
+        return 'throttle ' + blake2b(canonical.encode('utf-8'), digest_size=8).hexdigest()
+
+    @property
+    def wait(self) -> Optional[str]:
+        """JavaScript function of the `wait` behavior, returning the latency of a response in milliseconds"""
+        if self.latency is None:
+            return None
+        return f"function () {{\n    return Math.max(0, Math.round({self.latency.javascript}));\n}}"
+
+    @property
+    def decorate(self) -> Optional[str]:
+        """JavaScript function of the `decorate` behavior, throttling requests and replacing responses by errors.
+        Throttling counts requests in the imposter state, which `mountebank` passes to the function since 2.0: the
+        function throws an error when there is no state, rather than never throttling."""
+        if not self.error_rate and self.max_rps is None:
+            return None
+        lines = ["function (config) {"]
+        if self.max_rps is not None:
+            burst = self.burst if self.burst is not None else max(1.0, self.max_rps)
+            lines += [
+                "    if (!config.state) {",
+                "        throw new Error('Throttling needs the imposter state of mountebank 2.0 or later');",
+                "    }",
+                "    var state = config.state;",
+                f"    var key = {dumps(self._state_key)};",
+                "    var now = Date.now();",
+                f"    var bucket = state[key] || (state[key] = {{tokens: {_number(burst)}, time: now}});",
+                f"    bucket.tokens = Math.min({_number(burst)}, "
+                f"bucket.tokens + (now - bucket.time) * {_number(self.max_rps)} / 1000);",
+                "    bucket.time = now;",
+                "    if (bucket.tokens < 1) {",
+                f"        config.response.statusCode = {int(self.throttle_status)};",
+                "        config.response.body = '';",
+                "        config.response.headers = {'Retry-After': '1'};",
+                "        return;",
+                "    }",
+                "    bucket.tokens -= 1;",
+            ]
+        if self.error_rate:
+            lines += [
+                f"    if (Math.random() < {_number(self.error_rate)}) {{",
+                f"        config.response.statusCode = {int(self.error_status)};",
+                f"        config.response.body = {dumps(self.error_body)};",
+                "    }",
+            ]
+        lines.append("}")
+        return '\n'.join(lines)
+
+    def sample_wait(self, random: Random) -> float:
+        """Latency of a response in milliseconds, as the `wait` function would return"""
+        return max(0, round(self.latency.sample(random))) if self.latency is not None else 0
+
+    def apply(self, response: Mapping, state: dict, random: Random, clock=monotonic) -> dict:
+        """The fields of an `is` response as the `decorate` function would change them
+
+        :param response: fields of the response
+        :param state: state shared by the responses of an imposter
+        :param random: source of random numbers
+        :param clock: source of the current time, in seconds
+        """
+        response = dict(response)
+        if self.max_rps is not None:
+            burst = self.burst if self.burst is not None else max(1.0, self.max_rps)
+            now = clock()
+            bucket = state.setdefault(self._state_key, {'tokens': burst, 'time': now})
+            bucket['tokens'] = min(burst, bucket['tokens'] + (now - bucket['time']) * self.max_rps)
+            bucket['time'] = now
+            if bucket['tokens'] < 1:
+                return dict(response, statusCode=self.throttle_status, body='', headers={'Retry-After': '1'})
+            bucket['tokens'] -= 1
+        if self.error_rate and random.random() < self.error_rate:
+            response.update(statusCode=self.error_status, body=self.error_body)
+        return response
@@ -0,0 +1,158 @@
+from contextlib import contextmanager
+from os import environ
+from threading import local, Lock
+from time import perf_counter
+from typing import Dict, Iterator, List, NamedTuple
+
+from mbtest.imposters.base import JsonStructure
+
+ENVIRONMENT_VARIABLE = 'IMPOSTER_BUILDER_PROFILE'
+
+
+class PhaseStats(NamedTuple):
+    """Time spent in a phase of building or installing imposters. `seconds` is the time spent in the phase
+    itself, excluding the phases timed within it, and `total_seconds` includes them."""
+    calls: int
+    seconds: float
+    bytes: int
+    count: int
+    total_seconds: float
+
+    @property
+    def mean_ms(self) -> float:
+        return 1000 * self.seconds / self.calls if self.calls else 0.0
+
+
+class _Timer:
+    __slots__ = ('_profiler', '_name', '_start', '_bytes', '_count', '_children')
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self._profiler = profiler
+        self._name = name
+        self._bytes = 0
+        self._count = 0
+        self._children = 0.0
+
+    def add_bytes(self, size: int):
+        self._bytes += size
+
+    def add_count(self, count: int):
+        self._count += count
+
+    def __enter__(self) -> "_Timer":
+        self._profiler._active().append(self)
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        seconds = perf_counter() - self._start
+        active = self._profiler._active()
+        active.remove(self)
+        if active:
+            active[-1]._children += seconds
+        self._profiler._record(self._name, seconds - self._children, seconds, self._bytes, self._count)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def add_bytes(self, size: int):
+        pass
+
+    def add_count(self, count: int):
+        pass
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Profiler:
+    """Aggregated timers of the phases of building and installing imposters: template rendering, JSON parsing
+    and encoding, building imposters and stubs and installing imposters. Each phase counts its calls, the time
+    spent, the bytes processed and the items, such as stubs, it produced. Phases timed within another phase, e.g.
+    `freeze` within `build`, are subtracted from its time, so the times of all the phases add up.
+
+    Disabled timers cost a single attribute check. The shared :py:data:`profiler` is enabled by setting the
+    environment variable `IMPOSTER_BUILDER_PROFILE=1` or within :py:func:`profiling`.
+
+    :param enabled: whether the timers record
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._phases: Dict[str, list] = {}
+        self._lock = Lock()
+        self._local = local()
+
+    def timer(self, name: str):
+        """Context manager timing a phase, whose `add_bytes` and `add_count` record its size
+
+        :param name: name of the phase
+        """
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def _active(self) -> List[_Timer]:
+        """Timers running in the current thread, the innermost last"""
+        active = getattr(self._local, 'active', None)
+        if active is None:
+            active = self._local.active = []
+        return active
+
+    def _record(self, name: str, seconds: float, total_seconds: float, size: int, count: int):
+        with self._lock:
+            phase = self._phases.get(name)
+            if phase is None:
+                phase = self._phases[name] = [0, 0.0, 0, 0, 0.0]
+            phase[0] += 1
+            phase[1] += seconds
+            phase[2] += size
+            phase[3] += count
+            phase[4] += total_seconds
+
+    def phases(self) -> Dict[str, PhaseStats]:
+        """Statistics of each phase timed, by name"""
+        with self._lock:
+            return {name: PhaseStats(*phase) for name, phase in self._phases.items()}
+
+    def reset(self):
+        """Forget the phases timed so far"""
+        with self._lock:
+            self._phases.clear()
+
+    def as_structure(self) -> JsonStructure:
+        return {name: dict(stats._asdict(), mean_ms=stats.mean_ms) for name, stats in self.phases().items()}
+
+    def report(self) -> str:
+        """Table of the phases timed, the slowest first, by the time spent in the phase itself"""
+        phases = sorted(self.phases().items(), key=lambda phase: phase[1].seconds, reverse=True)
+        lines = [f"{'phase':<24} {'calls':>8} {'self ms':>10} {'mean ms':>9} {'total ms':>10} {'bytes':>12} "
+                 f"{'items':>8}"]
+        for name, stats in phases:
+            lines.append(f"{name:<24} {stats.calls:>8} {1000 * stats.seconds:>10.1f} {stats.mean_ms:>9.3f} "
+                         f"{1000 * stats.total_seconds:>10.1f} {stats.bytes:>12} {stats.count:>8}")
+        return '\n'.join(lines)
+
+
+profiler = Profiler(enabled=environ.get(ENVIRONMENT_VARIABLE, '') not in ('', '0'))
+
+
+@contextmanager
+def profiling(reset: bool = True) -> Iterator[Profiler]:
+    """Context manager enabling the shared :py:data:`profiler`, e.g. around the setup of a fixture
+
+    :param reset: forget the phases timed before
+    """
+    was_enabled = profiler.enabled
+    if reset:
+        profiler.reset()
+    profiler.enabled = True
+    try:
+        yield profiler
+    finally:
+        profiler.enabled = was_enabled
@@ -0,0 +1,19 @@
+from json import dump
+from os import environ
+
+from .profiling import profiler
+
+JSON_ENVIRONMENT_VARIABLE = 'IMPOSTER_BUILDER_PROFILE_JSON'
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Print the phases timed by the shared profiler at the end of the test session, and write them as JSON to the
+    file named by the environment variable `IMPOSTER_BUILDER_PROFILE_JSON`"""
+    if not profiler.phases():
+        return
+    terminalreporter.write_sep('-', 'imposter_builder profile')
+    terminalreporter.write_line(profiler.report())
+    path = environ.get(JSON_ENVIRONMENT_VARIABLE)
+    if path:
+        with open(path, 'w') as file:
+            dump(profiler.as_structure(), file, indent=2)
@@ -0,0 +1,230 @@
+from json import dumps
+from os import PathLike
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from furl import furl
+from mbtest.imposters import Imposter
+from mbtest.imposters.base import JsonStructure
+from mbtest.imposters.responses import PredicateGenerator
+import requests
+from requests import Session
+
+from .encoding import decode, encode
+from .imposter_builder import ImposterBuilder
+from .install import install_imposter, ServerUrl, uninstall_imposter
+from .stub_builder import ProxyMode
+
+# Headers describing a connection or a moment rather than the response, which make identical responses differ
+DROPPED_HEADERS = ('Date', 'Connection', 'Keep-Alive', 'Transfer-Encoding')
+
+
+class CompactionStats(NamedTuple):
+    """Number of stubs and responses recorded and left by :py:func:`compact_stubs`"""
+    recorded_stubs: int
+    recorded_responses: int
+    stubs: int
+    responses: int
+
+    @property
+    def stub_reduction(self) -> float:
+        """Fraction of the recorded stubs removed"""
+        return 1 - self.stubs / self.recorded_stubs if self.recorded_stubs else 0.0
+
+    @property
+    def response_reduction(self) -> float:
+        """Fraction of the recorded responses removed"""
+        return 1 - self.responses / self.recorded_responses if self.recorded_responses else 0.0
+
+
+def _recorded_response(response: JsonStructure, dropped_headers: Sequence[str]) -> JsonStructure:
+    fields = dict(response['is'])
+    fields.pop('_proxyResponseTime', None)
+    if fields.get('headers'):
+        dropped = {name.lower() for name in dropped_headers}
+        fields['headers'] = {name: value for name, value in fields['headers'].items() if name.lower() not in dropped}
+    return dict(response, **{'is': fields})
+
+
+def _canonical(structure: JsonStructure) -> str:
+    return dumps(structure, sort_keys=True, separators=(',', ':'))
+
+
+def compact_stubs(stubs: Iterable[JsonStructure], distinct: bool = False,
+                  dropped_headers: Sequence[str] = DROPPED_HEADERS) -> Tuple[List[JsonStructure], CompactionStats]:
+    """Compact stubs recorded by a proxy for replaying them offline.
+
+    Proxy responses and the `_proxyResponseTime` of recorded responses are removed, as are the headers in
+    `dropped_headers`. Stubs with the same predicates are merged into the first of them, their responses
+    appended in order, and runs of identical responses are replaced by one response repeated as many times,
+    so the responses are still replayed in the order they were recorded. A stub left with one response returns
+    it every time.
+
+    :param stubs: stub definitions, e.g. downloaded by :py:meth:`ProxyRecording.download`
+    :param distinct: keep each distinct response of a stub once, in the order first recorded, for services whose
+        responses do not depend on the order of the requests
+    :param dropped_headers: response headers removed, compared ignoring case
+    :returns: the compacted stubs and the number of stubs and responses before and after compacting
+    """
+    recorded_stubs = recorded_responses = 0
+    merged = {}
+    for stub in stubs:
+        recorded_stubs += 1
+        responses = [response for response in stub.get('responses') or () if 'proxy' not in response]
+        recorded_responses += len(responses)
+        if not responses:
+            continue
+        key = _canonical(stub.get('predicates') or [])
+        if key not in merged:
+            merged[key] = dict(stub, responses=[])
+        merged[key]['responses'].extend(_recorded_response(response, dropped_headers)
+                                        if 'is' in response else response for response in responses)
+
+    compacted = [dict(stub, responses=_compact_responses(stub['responses'], distinct)) for stub in merged.values()]
+    return compacted, CompactionStats(recorded_stubs, recorded_responses, len(compacted),
+                                      sum(len(stub['responses']) for stub in compacted))
+
+
+def _compact_responses(responses: List[JsonStructure], distinct: bool) -> List[JsonStructure]:
+    runs: List[list] = []
+    seen = set()
+    for response in responses:
+        behaviors = dict(response.get('_behaviors') or {})
+        times = behaviors.pop('repeat', None) or 1
+        key = _canonical(dict(response, _behaviors=behaviors))
+        if distinct:
+            if key not in seen:
+                seen.add(key)
+                runs.append([key, response, 1])
+        elif runs and runs[-1][0] == key:
+            runs[-1][2] += times
+        else:
+            runs.append([key, response, times])
+
+    if len(runs) == 1:
+        runs[0][2] = 1
+    compacted = []
+    for _, response, times in runs:
+        behaviors = {name: value for name, value in (response.get('_behaviors') or {}).items() if name != 'repeat'}
+        if times > 1:
+            behaviors['repeat'] = times
+        response = {name: value for name, value in response.items() if name != '_behaviors'}
+        if behaviors:
+            response['_behaviors'] = behaviors
+        compacted.append(response)
+    return compacted
+
+
+class ProxyRecording:
+    """Records the responses of a service through a proxy imposter, then freezes them into an
+    :py:class:`ImposterBuilder` replaying them offline:
+
+    .. code-block:: python
+
+        with ProxyRecording(server, to='http://service:8080') as recording:
+            requests.get(f"{recording.imposter.url}/test")
+        builder = recording.freeze('recordings/service.json')
+
+    The proxy records the responses with `proxyAlways`, so every request is forwarded, and the recorded stubs are
+    downloaded when the recording stops, before the imposter is deleted.
+
+    :param server: a :py:class:`MountebankServer` or the URL of its imposters resource
+    :param to: URL of the service
+    :param port: port of the proxy imposter, any free port if not given
+    :param mode: proxy mode, :py:attr:`ProxyMode.ONCE` records only the first response to each request
+    :param predicate_generators: fields of the requests the recorded stubs match, the path and query by default
+    :param name: name of the proxy imposter and of the imposters frozen from it
+    :param session: session used to reuse connections to the server
+    :param timeout: request timeout, in seconds
+    """
+
+    def __init__(self, server: ServerUrl, to: Union[furl, str], port: Optional[int] = None,
+                 mode: ProxyMode = ProxyMode.ALWAYS,
+                 predicate_generators: Optional[Iterable[PredicateGenerator]] = None, name: Optional[str] = None,
+                 session: Optional[Session] = None, timeout: float = 10):
+        self._server = server
+        self._to = to
+        self._port = port
+        self._mode = mode
+        self._predicate_generators = list(predicate_generators or [PredicateGenerator(path=True, query=True)])
+        self._name = name
+        self._session = session
+        self._timeout = timeout
+        self._imposter: Optional[Imposter] = None
+        self._recorded: Optional[List[JsonStructure]] = None
+        self.stats: Optional[CompactionStats] = None
+
+    @property
+    def imposter(self) -> Optional[Imposter]:
+        """The proxy imposter, while recording"""
+        return self._imposter
+
+    def start(self) -> "ProxyRecording":
+        """Install the proxy imposter"""
+        imposter = ImposterBuilder(port=self._port, name=self._name).with_stub()\
+            .with_proxy(self._to, mode=self._mode, predicate_generators=self._predicate_generators).add_stub()\
+            .create()
+        self._imposter = install_imposter(self._server, imposter, self._session, self._timeout)
+        self._recorded = None
+        return self
+
+    def stop(self):
+        """Download the recorded stubs and delete the proxy imposter"""
+        if self._imposter is not None:
+            try:
+                self.download()
+            finally:
+                uninstall_imposter(self._imposter, self._session, self._timeout)
+                self._imposter = None
+
+    def __enter__(self) -> "ProxyRecording":
+        return self.start()
+
+    def __exit__(self, ex_type, ex_value, ex_traceback):
+        self.stop()
+
+    def download(self) -> List[JsonStructure]:
+        """The stubs recorded so far, without the proxy"""
+        if self._imposter is None:
+            if self._recorded is None:
+                raise ValueError("Nothing was recorded, start the recording first")
+            return self._recorded
+        response = (self._session or requests).get(str(self._imposter.configuration_url),
+                                                   params={'replayable': 'true', 'removeProxies': 'true'},
+                                                   timeout=self._timeout)
+        response.raise_for_status()
+        self._recorded = response.json().get('stubs') or []
+        return self._recorded
+
+    def freeze(self, path: Optional[Union[str, PathLike]] = None, distinct: bool = False,
+               dropped_headers: Sequence[str] = DROPPED_HEADERS) -> ImposterBuilder:
+        """An imposter builder replaying the recorded stubs, compacted by :py:func:`compact_stubs`, whose
+        statistics are kept in :py:attr:`stats`
+
+        :param path: also write the imposter definition to this JSON file, loaded by :py:func:`load_recording`
+        :param distinct: keep each distinct response of a stub once
+        :param dropped_headers: response headers removed
+        """
+        stubs, self.stats = compact_stubs(self.download(), distinct, dropped_headers)
+        if path is not None:
+            definition = {'protocol': 'http', 'stubs': stubs}
+            if self._name is not None:
+                definition['name'] = self._name
+            with open(path, 'wb') as file:
+                file.write(encode(definition))
+        builder = ImposterBuilder(name=self._name)
+        builder.with_stub().from_structures(stubs)
+        return builder
+
+
+def load_recording(path: Union[str, PathLike], port: Optional[int] = None) -> ImposterBuilder:
+    """An imposter builder replaying the stubs written by :py:meth:`ProxyRecording.freeze`. The file is read as
+    JSON, rather than as a template, so recorded bodies are used as they are.
+
+    :param path: JSON file of the imposter definition
+    :param port: port of the imposter
+    """
+    with open(path, 'rb') as file:
+        definition = decode(file.read())
+    builder = ImposterBuilder(port=port, name=definition.get('name'))
+    builder.with_stub().from_structures(definition.get('stubs') or [])
+    return builder
@@ -0,0 +1,131 @@
+from hashlib import blake2b
+from json import dumps, loads
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from mbtest.imposters import Imposter, Predicate
+from mbtest.imposters.base import JsonStructure
+
+from .bulk import build_stubs, gc_paused
+from .imposter_builder import ImposterBuilder
+
+Exchange = Tuple[JsonStructure, JsonStructure]
+
+
+def read_capture(capture: Union[str, Path, Iterable[str]]) -> Iterator[Exchange]:
+    """Stream the request/response pairs of a JSON lines capture, one line at a time.
+
+    Each line is a JSON object with a `request` in the format `mountebank` records requests (`method`, `path`,
+    `query`, `headers` and `body`) and the `response` sent (`statusCode`, `headers` and `body`).
+
+    :param capture: path of the capture file, or an iterable of its lines
+    """
+    if isinstance(capture, (str, Path)):
+        with open(capture, encoding='utf-8') as lines:
+            yield from read_capture(lines)
+        return
+    for line in capture:
+        if line.strip():
+            exchange = loads(line)
+            yield exchange.get('request', {}), exchange.get('response', {})
+
+
+def request_signature(request: JsonStructure, match_headers: Sequence[str] = (), match_body: bool = True) -> bytes:
+    """Digest of the parts of a request that are matched by the replayed stubs, used to drop duplicates
+
+    :param request: recorded request
+    :param match_headers: names of the headers matched
+    :param match_body: whether the body is matched
+    """
+    headers = {name.lower(): value for name, value in (request.get('headers') or {}).items()}
+    canonical = [request.get('method'), request.get('path'), sorted((request.get('query') or {}).items()),
+                 [headers.get(name.lower()) for name in match_headers],
+                 request.get('body') if match_body else None]
+    return blake2b(dumps(canonical, separators=(',', ':')).encode('utf-8'), digest_size=16).digest()
+
+
+class _RecordedPredicate(Predicate):
+    """Predicate matching the method, path, query and body of a recorded request with `deepEquals`, even when the
+    query or body is empty, which :py:class:`Predicate` leaves out, so that a stub does not also match requests
+    with more query parameters or a body. Headers are matched with `equals`, as requests have other headers.
+    A request recorded without a method is matched whatever its method."""
+
+    def as_structure(self) -> JsonStructure:
+        fields = {'path': self.path, 'query': self.query or {}}
+        if self.method is not None:
+            fields = {'method': self.method.value, **fields}
+        if self.body is not None:
+            fields['body'] = self.body
+        exact = {'deepEquals': fields, 'caseSensitive': self.case_sensitive}
+        if not self.headers:
+            return exact
+        return {'and': [exact, {'equals': {'headers': self.headers}, 'caseSensitive': self.case_sensitive}]}
+
+
+def _predicate(match_headers: Sequence[str], match_body: bool):
+    def headers(exchange):
+        recorded = {name.lower(): value for name, value in (exchange[0].get('headers') or {}).items()}
+        return {name: recorded[name.lower()] for name in match_headers if name.lower() in recorded} or None
+
+    spec = {'method': lambda exchange: exchange[0].get('method'),
+            'path': lambda exchange: exchange[0].get('path'),
+            'query': lambda exchange: exchange[0].get('query') or {}}
+    if match_headers:
+        spec['headers'] = headers
+    if match_body:
+        spec['body'] = lambda exchange: exchange[0].get('body') or ''
+    return spec
+
+
+_RESPONSE = {'body': lambda exchange: exchange[1].get('body', ''),
+             'status_code': lambda exchange: exchange[1].get('statusCode', 200),
+             'headers': lambda exchange: exchange[1].get('headers') or None}
+
+
+def compile_capture(capture: Union[str, Path, Iterable[str]], port: Optional[int] = None,
+                    protocol: Imposter.Protocol = Imposter.Protocol.HTTP, name: Optional[str] = None,
+                    max_stubs: int = 10000, match_headers: Sequence[str] = (),
+                    match_body: bool = True) -> Iterator[ImposterBuilder]:
+    """Compile a JSON lines capture of requests and responses (see :py:func:`read_capture`) into imposters
+    replaying it, with one stub per distinct request. Stubs match the method, path, query and body of their
+    request exactly, so a request is not answered by the stub of a request with fewer query parameters or no body.
+
+    The capture is read one line at a time and, besides the stubs of one imposter, only a 16 byte digest of each
+    distinct request is kept, around a hundred bytes each, so the memory used grows slowly with the number of
+    distinct requests. When a request is repeated the first response is used.
+    Once an imposter has `max_stubs` stubs its builder is yielded and the following stubs go to a new imposter
+    on the next port, so large captures are sharded across several imposters.
+
+    :param capture: path of the capture file, or an iterable of its lines
+    :param port: port of the first imposter, following imposters use the following ports
+    :param protocol: protocol of the imposters
+    :param name: name of the imposters, numbered when the capture is sharded
+    :param max_stubs: maximum number of stubs in each imposter
+    :param match_headers: names of request headers matched by the stubs, as well as method, path and query
+    :param match_body: whether stubs match the request body
+    """
+    seen = set()
+    predicate = _predicate(match_headers, match_body)
+    batch = []
+    shard = 0
+
+    def builder():
+        shard_port = port + shard if port is not None else None
+        shard_name = f"{name} #{shard + 1}" if name and shard else name
+        shard_builder = ImposterBuilder(port=shard_port, protocol=protocol, name=shard_name)
+        with gc_paused():
+            shard_builder.stubs.extend(build_stubs(batch, predicate, _RESPONSE, predicate_factory=_RecordedPredicate))
+        return shard_builder
+
+    for exchange in read_capture(capture):
+        signature = request_signature(exchange[0], match_headers, match_body)
+        if signature in seen:
+            continue
+        seen.add(signature)
+        batch.append(exchange)
+        if len(batch) == max_stubs:
+            yield builder()
+            batch = []
+            shard += 1
+    if batch or not shard:
+        yield builder()
@@ -0,0 +1,105 @@
+from json import JSONDecodeError, JSONDecoder
+from typing import Iterable, Iterator, MutableMapping, Optional
+
+from mbtest.imposters.base import JsonStructure
+
+_WHITESPACE = ' \t\n\r'
+_MINIMUM_READ = 8192
+
+
+class _ChunkReader:
+    """Buffer over an iterable of text chunks which only keeps the text that has not been parsed yet"""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+        self._pos = 0
+        self._exhausted = False
+        self._decoder = JSONDecoder()
+
+    def _fill(self, size: int = 1) -> bool:
+        """Read chunks until at least `size` more characters are buffered, returns `False` at end of input"""
+        if self._exhausted:
+            return False
+        pending = [self._buffer[self._pos:]]
+        read = 0
+        for chunk in self._chunks:
+            pending.append(chunk)
+            read += len(chunk)
+            if read >= size:
+                break
+        else:
+            self._exhausted = True
+        self._buffer = ''.join(pending)
+        self._pos = 0
+        return read > 0 or not self._exhausted
+
+    def peek(self) -> Optional[str]:
+        """Next character which is not whitespace, or `None` at end of input"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise JSONDecodeError(f"Expecting '{char}'", self._buffer, self._pos)
+        self._pos += 1
+
+    def decode(self) -> JsonStructure:
+        """Decode the next complete JSON value, reading more chunks until the value is complete"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except JSONDecodeError:
+                if not self._fill(max(_MINIMUM_READ, len(self._buffer) - self._pos)):
+                    raise
+                continue
+            # A number or literal ending the buffer may continue in the next chunk.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_array(chunks: Iterable[str], key: str,
+               members: Optional[MutableMapping[str, JsonStructure]] = None) -> Iterator[JsonStructure]:
+    """Incrementally parse a JSON object from text chunks, yielding the elements of the array held
+    by one of its members as soon as each element is complete.
+
+    Only the text of the element being parsed is held in memory, so arbitrarily large arrays can be
+    processed in bounded memory.
+
+    :param chunks: JSON text of an object, e.g. as generated by :py:meth:`jinja2.Template.generate`
+    :param key: name of the member containing the array to stream
+    :param members: if given, the other members of the object are added to this mapping
+    """
+    reader = _ChunkReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.decode()
+        reader.expect(':')
+        if name == key:
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield reader.decode()
+                    if reader.peek() == ']':
+                        reader.expect(']')
+                        break
+                    reader.expect(',')
+        else:
+            value = reader.decode()
+            if members is not None:
+                members[name] = value
+        if reader.peek() == '}':
+            break
+        reader.expect(',')
@@ -1,3 +1,4 @@
+from os import PathLike
 from typing import Iterable, Mapping, Optional, Union
 
 from mbtest.imposters.base import JsonStructure
@@ -6,9 +7,12 @@ from mbtest.imposters.behaviors import Copy, Lookup, UsingRegex
 from mbtest.imposters.responses import PredicateGenerator
 
 from furl import furl
-from jinja2 import Environment, FileSystemLoader
-from json import loads
-from pathlib import Path
+
+from .bodies import file_body
+from .profiles import ResponseProfile
+from .profiling import profiler
+from .streaming import iter_array
+from .template_registry import render_cache, template_registry
 
 Method = Predicate.Method
 Operator = Predicate.Operator
@@ -16,17 +20,48 @@ ResponseMode = Response.Mode
 ProxyMode = Proxy.Mode
 
 
+def build_response(body: Union[str, JsonStructure] = "",
+                   status_code: Union[int, str] = 200,
+                   wait: Optional[Union[int, str]] = None,
+                   repeat: Optional[int] = None,
+                   headers: Optional[Mapping[str, str]] = None,
+                   mode: Optional[Response.Mode] = None,
+                   copy: Optional[Copy] = None,
+                   decorate: Optional[str] = None,
+                   lookup: Optional[Lookup] = None,
+                   shell_transform: Optional[Union[str, Iterable[str]]] = None,
+                   profile: Optional[ResponseProfile] = None,
+                   body_file: Optional[Union[str, PathLike]] = None) -> Response:
+    """Create a :py:class:`Response` from the keyword arguments of :py:meth:`StubBuilder.with_response`"""
+    if body_file is not None:
+        if body:
+            raise ValueError("A response has either a body or a body file")
+        if mode not in (None, Response.Mode.BINARY):
+            raise ValueError("A body file is sent in binary mode")
+        body, mode = file_body(body_file), Response.Mode.BINARY
+    if profile is not None:
+        if wait is not None or decorate is not None:
+            raise ValueError("A profile generates the wait and decorate behaviors, they cannot also be given")
+        wait, decorate = profile.wait, profile.decorate
+    return Response(body=body, status_code=status_code, headers=headers, mode=mode, wait=wait, repeat=repeat,
+                    copy=copy, decorate=decorate, lookup=lookup, shell_transform=shell_transform)
+
+
 class StubBuilder:
     """Represents a builder of `Mountebank stub <http://www.mbtest.org/docs/api/stubs>`_.
     The builder creates an instance of :py:class:`Stub`. StubBuilders are created
     by :py:meth:`ImposterBuilder.with_stub`
 
+    Predicates and responses are kept in tuples, which the :py:class:`Stub` created by :py:meth:`add_stub`
+    shares rather than copies, so a stub can be added to several imposters.
+
     :param imposter: parent imposter to which the stub will be added
     """
+    __slots__ = ('_predicates', '_responses', '_imposter')
 
     def __init__(self, imposter):
-        self._predicates = []
-        self._responses = []
+        self._predicates = ()
+        self._responses = ()
         self._imposter = imposter
 
     @property
@@ -34,7 +69,7 @@ class StubBuilder:
         """Predicates used to match to incoming request. If matched
         the next response will be returned to caller.
         If there are multiple predicates all must match to send a response,
-        i.e. they are logically ANDed."""
+        i.e. they are logically ANDed. A tuple, added to with :py:meth:`with_predicate`."""
         return self._predicates
 
     @property
@@ -42,7 +77,8 @@ class StubBuilder:
         """Response returned to caller if :py:attr:`predicates` match.
         When multiple responses are defined they are stored in a 'circular'
         buffer, i.e. they are returned in order until the last response is
-        returned after which the first response is returned on the next match."""
+        returned after which the first response is returned on the next match.
+        A tuple, added to with :py:meth:`with_response`."""
         return self._responses
 
     def with_predicate(self, path: Optional[Union[str, furl]] = None,
@@ -64,9 +100,9 @@ class StubBuilder:
         :param operator:
         :param case_sensitive:
         """
-        self._predicates.append(
-            Predicate(path=path, method=method, query=query, body=body, headers=headers, xpath=xpath, operator=operator,
-                      case_sensitive=case_sensitive))
+        self._predicates += (
+            Predicate(path=path, method=method, query=query, body=body, headers=headers, xpath=xpath,
+                      operator=operator, case_sensitive=case_sensitive),)
         return self
 
     def with_response(self,
@@ -79,7 +115,9 @@ class StubBuilder:
                       copy: Optional[Copy] = None,
                       decorate: Optional[str] = None,
                       lookup: Optional[Lookup] = None,
-                      shell_transform: Optional[Union[str, Iterable[str]]] = None
+                      shell_transform: Optional[Union[str, Iterable[str]]] = None,
+                      profile: Optional[ResponseProfile] = None,
+                      body_file: Optional[Union[str, PathLike]] = None
                       ):
         """Adds a response to :py:attr:responses
         See `Mountebank 'is' response behavior <http://www.mbtest.org/docs/api/stubs>`_.
@@ -95,10 +133,16 @@ class StubBuilder:
         :param decorate: `Decorate behavior <http://www.mbtest.org/docs/api/behaviors#behavior-decorate>`_.
         :param lookup: Lookup behavior
         :param shell_transform: shellTransform behavior
+        :param profile: latency, error rate and throughput of a simulated service, generating the `wait` and
+            `decorate` behaviors, see :py:class:`ResponseProfile`
+        :param body_file: file whose content is sent as a binary body. It is hashed when the response is added and
+            read again when the imposter is installed, so it must not change in between. Files with the same
+            content are read from one file.
         """
-        self._responses.append(
-            Response(body=body, status_code=status_code, headers=headers, mode=mode, wait=wait, repeat=repeat,
-                     copy=copy, decorate=decorate, lookup=lookup, shell_transform=shell_transform))
+        self._responses += (
+            build_response(body=body, status_code=status_code, wait=wait, repeat=repeat, headers=headers, mode=mode,
+                           copy=copy, decorate=decorate, lookup=lookup, shell_transform=shell_transform,
+                           profile=profile, body_file=body_file),)
         return self
 
     def with_injection(self, inject):
@@ -107,7 +151,7 @@ class StubBuilder:
 
         :param inject: JavaScript function to inject .
         """
-        self._responses.append(InjectionResponse(inject))
+        self._responses += (InjectionResponse(inject),)
 
     def with_proxy(self,
                    to: Union[furl, str],
@@ -122,30 +166,40 @@ class StubBuilder:
 
         :param to: The origin server, to which the request should proxy.
         """
-        self._responses.append(
+        self._responses += (
             Proxy(to=to, wait=wait, inject_headers=inject_headers, mode=mode, predicate_generators=predicate_generators,
-                  decorate=decorate))
+                  decorate=decorate),)
         return self
 
     def add_stub(self):
-        self._imposter.stubs.append(Stub(predicates=self.predicates, responses=self.responses))
+        self._imposter.stubs.append(Stub(predicates=self._predicates, responses=self._responses))
         return self._imposter
 
-    def from_template(self, template, values):
+    def from_structures(self, stubs: Iterable[JsonStructure]):
+        """Add stubs from JSON structures, e.g. yielded by a generator, one at a time as they arrive.
+
+        :param stubs: iterable of stub definitions in `mountebank` JSON format
+        """
+        with profiler.timer('stubs.from_structure') as timer:
+            for stub in stubs:
+                self._imposter.stubs.append(Stub.from_structure(stub))
+                timer.add_count(1)
+        return self._imposter
+
+    def from_template(self, template, values, stream: bool = False, memoize: Optional[bool] = None):
         """Create stubs using a Jinja2 template.
 
         :param template: template as string or a path to a template file, relative to :py:property:`templates`
         :param values: dictionary containing values used in template
+        :param stream: parse and add the stubs one at a time while the template is rendered, so that only
+            one stub is held as text and parsed JSON at any time
+        :param memoize: reuse the definition rendered for the same template and values, see :py:class:`RenderCache`.
+            Defaults to whether :py:data:`render_cache` is enabled. Ignored with `stream`.
 """
-        template_path = Path(template)
-        if Path(self._imposter.templates).joinpath(template_path).is_file():
-            environment = Environment(loader=FileSystemLoader(self._imposter.templates))
-            j2_template = environment.get_template(template)
-        else:
-            environment = Environment()
-            j2_template = environment.from_string(template)
-
-        json = j2_template.render(values)
-        stubs = loads(json)
-        for stub in stubs['stubs']:
-            self._imposter.stubs.append(Stub.from_structure(stub))
+        if stream:
+            j2_template = template_registry.get_template(self._imposter.templates, template)
+            with profiler.timer('template.stream'):
+                self.from_structures(iter_array(j2_template.generate(values), 'stubs'))
+            return
+
+        self.from_structures(render_cache.definition(self._imposter.templates, template, values, memoize)['stubs'])
@@ -0,0 +1,272 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from json import dumps
+from os import stat
+from pathlib import Path
+from stat import S_ISREG
+from threading import RLock
+from typing import Callable, NamedTuple, Optional, Union
+
+from jinja2 import BaseLoader, Environment, FileSystemLoader, Template
+from mbtest.imposters.base import JsonStructure
+
+from .encoding import decode
+from .profiling import profiler
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a :py:class:`TemplateRegistry`"""
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class TemplateRegistry:
+    """Cache of compiled Jinja2 templates shared by :py:class:`ImposterBuilder` and :py:class:`StubBuilder`.
+
+    Templates are keyed by the templates root folder and the template path, or by the template source for
+    templates given as a string. Template files are recompiled when their modification time changes and the
+    least recently used templates are evicted once `maxsize` templates are cached.
+
+    :param maxsize: Maximum number of compiled templates kept in the cache
+    :param loader: Factory creating the Jinja2 loader of a templates root folder
+    """
+
+    def __init__(self, maxsize: int = 256, loader: Callable[[str], BaseLoader] = FileSystemLoader):
+        self._maxsize = maxsize
+        self._loader = loader
+        self._templates = OrderedDict()
+        self._environments = OrderedDict()
+        self._string_environment = Environment()
+        self._lock = RLock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def maxsize(self):
+        """Maximum number of compiled templates kept in the cache"""
+        return self._maxsize
+
+    @property
+    def hits(self):
+        """Number of lookups answered from the cache"""
+        return self._hits
+
+    @property
+    def misses(self):
+        """Number of lookups which compiled a template"""
+        return self._misses
+
+    def info(self) -> CacheInfo:
+        """Return the hit/miss counters and size of the cache"""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._templates))
+
+    def clear(self):
+        """Remove all compiled templates and reset the counters"""
+        with self._lock:
+            self._templates.clear()
+            self._environments.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def get_template(self, templates: Optional[Union[str, Path]], template: str) -> Template:
+        """Return the compiled template, compiling it only if it is not cached or the file has changed.
+
+        :param templates: Path to root folder of templates
+        :param template: template as string or a path to a template file, relative to `templates`
+        """
+        with profiler.timer('template.lookup'):
+            return self._get_template(templates, template)
+
+    def _get_template(self, templates: Optional[Union[str, Path]], template: str) -> Template:
+        mtime = self._file_mtime(templates, template)
+        if mtime is None:
+            key = (None, template)
+        else:
+            key = (str(templates), template)
+
+        with self._lock:
+            entry = self._templates.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._templates.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+
+        if mtime is None:
+            j2_template = self._string_environment.from_string(template)
+        else:
+            j2_template = self._environment(str(templates)).get_template(template)
+
+        with self._lock:
+            self._templates[key] = (mtime, j2_template)
+            self._templates.move_to_end(key)
+            while len(self._templates) > self._maxsize:
+                self._templates.popitem(last=False)
+        return j2_template
+
+    def _environment(self, templates: str) -> Environment:
+        with self._lock:
+            environment = self._environments.get(templates)
+            if environment is None:
+                environment = Environment(loader=self._loader(templates))
+                self._environments[templates] = environment
+                while len(self._environments) > self._maxsize:
+                    self._environments.popitem(last=False)
+            else:
+                self._environments.move_to_end(templates)
+            return environment
+
+    @staticmethod
+    def _file_mtime(templates, template) -> Optional[int]:
+        """Modification time of the template file, or `None` if the template is not a file"""
+        if templates is None:
+            return None
+        try:
+            status = stat(Path(templates).joinpath(template))
+        except (OSError, ValueError):
+            return None
+        return status.st_mtime_ns if S_ISREG(status.st_mode) else None
+
+
+template_registry = TemplateRegistry()
+
+
+class RenderCache:
+    """Cache of rendered templates, used by :py:meth:`ImposterBuilder.from_template` and
+    :py:meth:`StubBuilder.from_template` when it is enabled.
+
+    Rendered templates are keyed by the template, as in :py:class:`TemplateRegistry`, and a digest of the values
+    in canonical JSON form. Only values of plain JSON types (`dict` with `str` keys, `list`, `str`, `int`, `float`,
+    `bool` and `None`) are cached, as a template renders e.g. a tuple differently from a list with the same JSON
+    form. The rendered text is kept, and the definition parsed from it the first time :py:meth:`definition` is
+    called, so a hit neither renders nor parses the template. The least recently used templates are evicted once
+    `maxsize` are cached or their total length exceeds `max_length` characters.
+
+    Only enable the cache for templates whose output depends on nothing but the values, e.g. not on
+    random or time dependent globals, or disable it for these templates with `memoize=False`.
+
+    :param maxsize: Maximum number of rendered templates kept in the cache
+    :param max_length: Maximum total length of the rendered templates kept in the cache, in characters
+    :param enabled: Whether templates are cached unless `memoize` is given
+    """
+
+    def __init__(self, maxsize: int = 128, max_length: int = 64 * 2 ** 20, enabled: bool = False):
+        self._maxsize = maxsize
+        self._max_length = max_length
+        self.enabled = enabled
+        self._rendered = OrderedDict()
+        self._length = 0
+        self._lock = RLock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self):
+        """Number of renders answered from the cache"""
+        return self._hits
+
+    @property
+    def misses(self):
+        """Number of cached renders which rendered the template"""
+        return self._misses
+
+    def info(self) -> CacheInfo:
+        """Return the hit/miss counters and size of the cache"""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._rendered))
+
+    def clear(self):
+        """Remove all rendered templates and reset the counters"""
+        with self._lock:
+            self._rendered.clear()
+            self._length = 0
+            self._hits = 0
+            self._misses = 0
+
+    def render(self, templates: Optional[Union[str, Path]], template: str, values: Optional[dict],
+               memoize: Optional[bool] = None, registry: Optional[TemplateRegistry] = None) -> str:
+        """Render a template, returning the cached text if it was rendered with the same values before
+
+        :param templates: Path to root folder of templates
+        :param template: template as string or a path to a template file, relative to `templates`
+        :param values: dictionary containing values used in template
+        :param memoize: whether to use the cache, defaults to :py:attr:`enabled`
+        :param registry: registry of the compiled templates, defaults to the shared registry
+        """
+        registry = registry or template_registry
+        key = self._key(templates, template, values) if (self.enabled if memoize is None else memoize) else None
+        if key is None:
+            return self._render(registry, templates, template, values)
+        return self._entry(registry, templates, template, values, key)[0]
+
+    def definition(self, templates: Optional[Union[str, Path]], template: str, values: Optional[dict],
+                   memoize: Optional[bool] = None, registry: Optional[TemplateRegistry] = None) -> JsonStructure:
+        """Render a template and parse the JSON definition, returning the cached definition if the template was
+        parsed with the same values before. A cached definition is shared, so must not be modified.
+
+        Parameters as :py:meth:`render`.
+        """
+        registry = registry or template_registry
+        key = self._key(templates, template, values) if (self.enabled if memoize is None else memoize) else None
+        if key is None:
+            return decode(self._render(registry, templates, template, values))
+        entry = self._entry(registry, templates, template, values, key)
+        if entry[1] is None:
+            entry[1] = decode(entry[0])
+        return entry[1]
+
+    def _entry(self, registry: TemplateRegistry, templates, template, values, key) -> list:
+        """The cached `[text, definition]` of a template, rendering it on a miss"""
+        with self._lock:
+            entry = self._rendered.get(key)
+            if entry is not None:
+                self._rendered.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        entry = [self._render(registry, templates, template, values), None]
+        with self._lock:
+            if key in self._rendered:
+                return self._rendered[key]
+            self._rendered[key] = entry
+            self._length += len(entry[0])
+            while self._rendered and (len(self._rendered) > self._maxsize or self._length > self._max_length):
+                self._length -= len(self._rendered.popitem(last=False)[1][0])
+        return entry
+
+    @staticmethod
+    def _render(registry: TemplateRegistry, templates, template, values) -> str:
+        j2_template = registry.get_template(templates, template)
+        with profiler.timer('template.render') as timer:
+            rendered = j2_template.render(values or {})
+            timer.add_bytes(len(rendered))
+        return rendered
+
+    @staticmethod
+    def _key(templates, template, values):
+        if not _plain(values):
+            return None
+        try:
+            canonical = dumps(values, sort_keys=True, separators=(',', ':'))
+        except ValueError:
+            return None
+        mtime = TemplateRegistry._file_mtime(templates, template)
+        digest = blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+        return (None if mtime is None else str(templates), template, mtime, digest)
+
+
+def _plain(value) -> bool:
+    """Whether a value is made of plain JSON types only, which JSON represents without losing their type"""
+    kind = type(value)
+    if kind is dict:
+        return all(type(key) is str and _plain(inner) for key, inner in value.items())
+    if kind is list:
+        return all(_plain(inner) for inner in value)
+    return kind in (str, int, float, bool) or value is None
+
+
+render_cache = RenderCache()
@@ -0,0 +1,72 @@
+from benchmarks.suite import Benchmark, main, regressions, report, saved_baseline, timed
+
+from hamcrest import assert_that, contains_string, equal_to, greater_than, has_entries, has_length
+from json import dump, load
+
+
+def results(**throughputs):
+    return {'benchmarks': {name: {'seconds': 1 / throughput, 'items': 1, 'throughput': throughput}
+                           for name, throughput in throughputs.items()}}
+
+
+def test_benchmark_is_called_until_each_round_took_the_minimum_time():
+    calls = []
+
+    result = timed(Benchmark('calls', 10, lambda: calls.append(1)), rounds=2, min_time=0.001)
+
+    assert_that(len(calls), greater_than(3))
+    assert_that(result.items, equal_to(10))
+    assert_that(result.throughput, greater_than(0))
+
+
+def test_setup_and_cleanup_run_around_each_call():
+    events = []
+
+    timed(Benchmark('events', 1, lambda: events.append('call'), setup=lambda: events.append('setup'),
+                    cleanup=lambda: events.append('cleanup')), rounds=1, min_time=0)
+
+    assert_that(events, equal_to(['setup', 'call', 'cleanup'] * 2))
+
+
+def test_throughput_drops_beyond_the_threshold_are_regressions():
+    baseline = results(fast=100, slow=100, new=100)
+
+    dropped = regressions(results(fast=110, slow=70, added=1), baseline, threshold=0.2)
+
+    assert_that(dropped, has_length(1))
+    assert_that(dropped['slow'], equal_to(70 / 100 - 1))
+
+
+def test_report_shows_change_from_baseline():
+    assert_that(report(results(fast=110), results(fast=100)), contains_string('+10.0%'))
+
+
+def test_run_fails_on_regression(tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    with open(baseline, 'w') as file:
+        dump(results(**{'from_structure[10]': 1e12}), file)
+
+    status = main(['-k', 'from_structure[10]', '--rounds', '1', '--min-time', '0', '--compare', str(baseline),
+                   '--results', str(tmp_path / 'results')])
+
+    assert_that(status, equal_to(1))
+    saved, = (tmp_path / 'results').glob('*.json')
+    with open(saved) as file:
+        assert_that(load(file)['benchmarks'], has_entries({'from_structure[10]': has_entries({'items': 10})}))
+
+
+def test_baseline_is_the_median_of_the_last_saved_results(tmp_path):
+    for run, throughput in enumerate((1, 100, 90, 200, 80, 95)):
+        with open(tmp_path / f'{run}.json', 'w') as file:
+            dump(results(install=throughput), file)
+
+    assert_that(saved_baseline(tmp_path, runs=5)['benchmarks']['install']['throughput'], equal_to(95))
+
+
+def test_runs_saved_within_a_second_are_kept_apart(tmp_path):
+    arguments = ['-k', 'from_structure[10]', '--rounds', '1', '--min-time', '0', '--results', str(tmp_path)]
+
+    main(arguments)
+    main(arguments)
+
+    assert_that(list(tmp_path.glob('*.json')), has_length(2))
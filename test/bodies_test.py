@@ -0,0 +1,122 @@
+from imposter_builder import ImposterBuilder, Method, body_store, file_body, installed
+from imposter_builder.bodies import BodyStore, FileBody, StreamedPayload, streamed_payload
+from imposter_builder.encoding import encode
+from imposter_builder.optimizer import optimize_stubs
+
+from hamcrest import assert_that, contains_string, equal_to, instance_of, same_instance
+from mbtest.imposters import Predicate, Response, Stub
+from base64 import b64decode
+from json import dumps
+import pytest
+import requests
+
+
+@pytest.fixture
+def download(tmp_path):
+    path = tmp_path / 'download.bin'
+    path.write_bytes(bytes(range(256)) * 4099 + b'end')
+    return path
+
+
+def test_file_body_is_sent_from_the_file(any_server, download):
+    imposter = ImposterBuilder().with_stub().with_predicate(method=Method.GET, path='/download')\
+        .with_response(body_file=download, headers={'Content-Type': 'application/octet-stream'}).add_stub()\
+        .with_default(body_file=download, status_code=404).create()
+
+    with installed(any_server, [imposter]):
+        response = requests.get(f"{imposter.url}/download")
+        missing = requests.get(f"{imposter.url}/missing")
+
+    assert_that(response.content, equal_to(download.read_bytes()))
+    assert_that(missing.status_code, equal_to(404))
+    assert_that(missing.content, equal_to(download.read_bytes()))
+
+
+def test_payload_is_streamed_with_its_length(download):
+    imposter = ImposterBuilder(port=4545).with_stub().with_response(body_file=download).add_stub()\
+        .create(frozen=True)
+
+    streamed = streamed_payload(imposter.payload)
+
+    assert_that(streamed, instance_of(StreamedPayload))
+    assert_that(len(streamed), equal_to(len(bytes(streamed))))
+    body = bytes(streamed).split(b'"body":"')[1].split(b'"')[0]
+    assert_that(b64decode(body), equal_to(download.read_bytes()))
+
+
+def test_payload_without_file_bodies_is_unchanged():
+    payload = b'{"stubs":[]}'
+
+    assert_that(streamed_payload(payload), same_instance(payload))
+
+
+def test_files_with_the_same_content_share_a_body(download, tmp_path):
+    copy = tmp_path / 'copy.bin'
+    copy.write_bytes(download.read_bytes())
+
+    assert_that(file_body(copy), equal_to(file_body(download)))
+    assert_that(body_store.add(copy), same_instance(body_store.add(download)))
+
+
+def test_changed_file_is_not_sent(download):
+    body = FileBody(str(download), 'digest')
+    download.write_bytes(b'changed')
+
+    with pytest.raises(ValueError):
+        list(body.chunks())
+
+
+def test_empty_file_body(tmp_path):
+    empty = tmp_path / 'empty.bin'
+    empty.write_bytes(b'')
+
+    body = file_body(empty)
+
+    assert_that(bytes(streamed_payload(b'["' + body.token.encode() + b'"]')), equal_to(b'[""]'))
+
+
+def test_response_has_either_a_body_or_a_body_file(download):
+    with pytest.raises(ValueError):
+        ImposterBuilder().with_stub().with_response(body='body', body_file=download)
+
+
+def test_body_file_is_sent_in_binary_mode(download):
+    response = ImposterBuilder().with_stub().with_response(body_file=download).responses[0]
+
+    assert_that(response.mode, equal_to(Response.Mode.BINARY))
+    with pytest.raises(ValueError):
+        ImposterBuilder().with_stub().with_response(body_file=download, mode=Response.Mode.TEXT)
+    with pytest.raises(ValueError):
+        ImposterBuilder().with_default(body_file=download, mode=Response.Mode.TEXT)
+
+
+def test_store_keeps_the_bodies_of_live_responses(download, tmp_path):
+    store = BodyStore(maxsize=1)
+    other = tmp_path / 'other.bin'
+    other.write_bytes(b'other')
+    kept, dropped = store.add(download), store.add(other)
+    digest = dropped.digest
+    del dropped
+
+    assert_that(store.get(kept.digest), same_instance(kept))
+    assert_that(store.add(download), same_instance(kept))
+    with pytest.raises(ValueError):
+        store.get(digest)
+
+
+def test_file_body_is_only_encoded_by_this_package(download):
+    imposter = ImposterBuilder(port=4545).with_stub().with_predicate(path='/download')\
+        .with_response(body_file=download).add_stub().create()
+
+    with pytest.raises(TypeError):
+        dumps(imposter.as_structure())
+    assert_that(encode(imposter.as_structure()).decode(), contains_string(file_body(download).token))
+
+
+def test_file_bodies_are_not_dispatched_from_a_table(download):
+    stubs = [Stub(Predicate(path=f'/{i}'), Response(body=file_body(download), mode=Response.Mode.BINARY))
+             for i in range(10)]
+
+    optimized, _ = optimize_stubs(stubs, min_run=2)
+
+    assert_that(optimized, equal_to(stubs))
@@ -0,0 +1,71 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, Copy, UsingRegex, Format, Fixed, ResponseProfile
+
+from hamcrest import assert_that, equal_to, has_length, same_instance
+from mbtest.imposters import Response
+import pytest
+
+users = [{'id': f'{i}', 'name': f'Tester_{i}', 'method': 'GET' if i % 2 else 'DELETE'} for i in range(1, 6)]
+
+
+def fluent_imposter():
+    builder = ImposterBuilder(port=3000, protocol=Protocol.HTTP, name="MyImposter")
+    for user in users:
+        builder.with_stub().with_predicate(method=user['method'], path=f"/user/{user['id']}")\
+            .with_response(body=f"{{\"name\": \"{user['name']}\"}}", status_code=200,
+                           copy=Copy(from_="path", into="$ID", using=UsingRegex("\\d+$"))).add_stub()
+    return builder.create()
+
+
+def test_bulk_stubs_match_fluent_stubs():
+    imposter = ImposterBuilder(port=3000, protocol=Protocol.HTTP, name="MyImposter")\
+        .with_stubs(users,
+                    {'method': lambda user: user['method'], 'path': Format('/user/{id}')},
+                    {'body': Format('{{"name": "{name}"}}'), 'status_code': 200,
+                     'copy': Copy(from_="path", into="$ID", using=UsingRegex("\\d+$"))})\
+        .create()
+
+    assert_that(imposter.as_structure(), equal_to(fluent_imposter().as_structure()))
+
+
+def test_bulk_stubs_from_columns():
+    columns = {'id': [user['id'] for user in users], 'name': [user['name'] for user in users]}
+
+    imposter = ImposterBuilder(port=3000).with_stubs(columns, {'method': Method.GET, 'path': Format('/user/{id}')},
+                                                     {'body': lambda row: row['name']}).create()
+
+    assert_that(imposter.stubs, has_length(len(users)))
+    assert_that(imposter.stubs[2].predicates[0].path, equal_to('/user/3'))
+    assert_that(imposter.stubs[2].responses[0].body, equal_to('Tester_3'))
+
+
+def test_static_responses_are_shared():
+    imposter = ImposterBuilder(port=3000).with_stubs(users, {'path': Format('/user/{id}')}, {'body': 'found'})\
+        .create()
+
+    assert_that(imposter.stubs[0].responses[0], same_instance(imposter.stubs[-1].responses[0]))
+
+
+def test_invalid_row_values_are_rejected_like_the_fluent_interface():
+    with pytest.raises(ValueError):
+        ImposterBuilder(port=3000).with_stubs(users, {'path': Format('/user/{id}'), 'operator': lambda user: ''},
+                                              {'body': 'found'})
+
+
+def test_plain_strings_are_not_formatted():
+    imposter = ImposterBuilder(port=3000).with_stubs(users, {'path': Format('/user/{id}')},
+                                                     {'body': '{"ok": true}'}).create()
+
+    assert_that(imposter.stubs[0].responses[0].body, equal_to('{"ok": true}'))
+
+
+def test_specs_accept_profiles_and_body_files(tmp_path):
+    download = tmp_path / 'download.bin'
+    download.write_bytes(b'content')
+    profile = ResponseProfile(latency=Fixed(20))
+
+    imposter = ImposterBuilder(port=3000).with_stubs(users, {'path': Format('/user/{id}')},
+                                                     {'body_file': download, 'profile': profile}).create()
+    fluent = ImposterBuilder(port=3000).with_stub().with_response(body_file=download, profile=profile)
+
+    assert_that(imposter.stubs[0].responses[0].as_structure(), equal_to(fluent.responses[0].as_structure()))
+    assert_that(imposter.stubs[0].responses[0].mode, equal_to(Response.Mode.BINARY))
@@ -0,0 +1,69 @@
+from imposter_builder import load_imposters, translate_ejs
+
+from hamcrest import assert_that, contains_exactly, equal_to, starts_with
+from pathlib import Path
+
+configfiles = str(Path(__file__).parent.parent.joinpath('ch03', 'configfiles'))
+
+
+def test_ejs_is_translated_to_jinja():
+    assert_that(translate_ejs('[<% include product.ejs %>, "<%- stringify(filename, \'ssl/key.pem\'); %>"]'),
+                equal_to('[{% include \'product.ejs\' %}, "{{ stringify(filename, \'ssl/key.pem\') }}"]'))
+
+
+def test_imposters_loaded_from_ejs_config():
+    imposters = load_imposters('imposters.ejs', templates=configfiles)
+
+    assert_that([imposter.port for imposter in imposters], contains_exactly(3000, 3001, 3002))
+    assert_that(imposters[1].stubs[0].predicates[0].path, equal_to('/products'))
+    assert_that(imposters[2].cert, starts_with('-----BEGIN CERTIFICATE-----\n'))
+
+
+def test_included_imposters_rendered_in_processes(tmp_path):
+    tmp_path.joinpath('service.json').write_text(
+        '{"protocol": "http", "port": {{ port }}, "stubs": [{"responses": [{"is": {"body": "{{ name }}"}}]}]}')
+    tmp_path.joinpath('services.json').write_text(
+        '{"imposters": [' + ', '.join(["{% include 'service.json' %}"] * 3) + ', {"protocol": "http", "stubs": []}]}')
+
+    imposters = load_imposters('services.json', {'port': 4000, 'name': 'service'}, templates=str(tmp_path),
+                               processes=2, parallel_threshold=2)
+
+    assert_that([imposter.port for imposter in imposters], contains_exactly(4000, 4000, 4000, None))
+    assert_that(imposters[0].stubs[0].responses[0].body, equal_to('service'))
+
+
+def test_includes_within_imposters_are_rendered_with_the_file(tmp_path):
+    tmp_path.joinpath('stub.json').write_text('{"responses": [{"is": {"body": "{{ name }}"}}]}')
+    tmp_path.joinpath('service.json').write_text('{"protocol": "http", "stubs": [{% include "stub.json" %}]}')
+    tmp_path.joinpath('services.json').write_text(
+        '{"imposters": [{% include "service.json" %}, {"protocol": "http", "port": 4001, '
+        '"stubs": [{% include "stub.json" %}]}]}')
+
+    imposters = load_imposters('services.json', {'name': 'stubbed'}, templates=str(tmp_path), processes=1)
+    single = load_imposters('service.json', {'name': 'single'}, templates=str(tmp_path))
+
+    assert_that([imposter.stubs[0].responses[0].body for imposter in imposters],
+                contains_exactly('stubbed', 'stubbed'))
+    assert_that(single[0].stubs[0].responses[0].body, equal_to('single'))
+
+
+def test_includes_within_loops_are_rendered_with_the_loop_variables(tmp_path):
+    tmp_path.joinpath('service.json').write_text('{"protocol": "http", "port": {{ s.port }}, "stubs": []}')
+    tmp_path.joinpath('services.json').write_text(
+        '{"imposters": [{% for s in services %}{% include "service.json" %}{% if not loop.last %},{% endif %}'
+        '{% endfor %}, {% include "service.json" %}]}')
+
+    imposters = load_imposters('services.json', {'services': [{'port': 4001}, {'port': 4002}], 's': {'port': 4003}},
+                               templates=str(tmp_path), processes=1)
+
+    assert_that([imposter.port for imposter in imposters], contains_exactly(4001, 4002, 4003))
+
+
+def test_ejs_includes_are_relative_to_the_including_file(tmp_path):
+    tmp_path.joinpath('services').mkdir()
+    tmp_path.joinpath('services', 'service.ejs').write_text('{"protocol": "http", "port": 4001, "stubs": []}')
+    tmp_path.joinpath('services', 'imposters.ejs').write_text('{"imposters": [<% include service.ejs %>]}')
+
+    imposters = load_imposters('services/imposters.ejs', templates=str(tmp_path), processes=1)
+
+    assert_that([imposter.port for imposter in imposters], contains_exactly(4001))
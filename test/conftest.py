@@ -1,7 +1,47 @@
+from pathlib import Path
+from shutil import which
+
 import pytest
+import requests
 from mbtest import server
+from mbtest.server import DEFAULT_MB_EXECUTABLE
+
+from benchmarks.standin import StandInMountebank
+from imposter_builder import ImposterPool
+
+MB_EXECUTABLE = DEFAULT_MB_EXECUTABLE if Path(DEFAULT_MB_EXECUTABLE).exists() else which('mb')
 
 
 @pytest.fixture(scope="session")
 def mock_server(request):
-    return server.mock_server(request)
\ No newline at end of file
+    return server.mock_server(request, executable=MB_EXECUTABLE or DEFAULT_MB_EXECUTABLE)
+
+
+@pytest.fixture(scope="session")
+def imposter_pool(mock_server):
+    pool = ImposterPool(mock_server)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def standin():
+    with StandInMountebank() as standin_server:
+        yield standin_server
+
+
+@pytest.fixture
+def mountebank(request):
+    """The `mountebank` server of `mock_server`, skipping the test when `mb` is not installed.
+    The imposters left by the test are deleted."""
+    if MB_EXECUTABLE is None:
+        pytest.skip("mountebank is not installed")
+    mountebank_server = request.getfixturevalue('mock_server')
+    yield mountebank_server
+    requests.delete(str(mountebank_server.server_url), timeout=10).raise_for_status()
+
+
+@pytest.fixture(params=['standin', 'mountebank'])
+def any_server(request):
+    """Runs the test on a :py:class:`StandInMountebank` and on `mountebank`, when `mb` is installed"""
+    return request.getfixturevalue(request.param)
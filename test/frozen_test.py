@@ -0,0 +1,31 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, FrozenImposter
+
+from hamcrest import assert_that, equal_to, instance_of, has_length
+from json import loads
+
+
+def builder():
+    builder = ImposterBuilder(port=3000, protocol=Protocol.HTTP, name="MyImposter")
+    builder.with_stub().with_predicate(method=Method.GET, path='/test').with_response(body='sausages').add_stub()
+    return builder
+
+
+def test_frozen_imposter_has_same_definition():
+    imposter = builder().create(frozen=True)
+
+    assert_that(imposter, instance_of(FrozenImposter))
+    assert_that(imposter.as_structure(), equal_to(builder().create().as_structure()))
+    assert_that(loads(imposter.payload), equal_to(imposter.as_structure()))
+
+
+def test_frozen_definition_is_built_once():
+    imposter_builder = builder()
+    imposter = imposter_builder.create(frozen=True)
+    payload = imposter.payload
+
+    imposter_builder.with_stub().with_predicate(path='/other').with_response(body='chips').add_stub()
+
+    assert_that(imposter.as_structure()['stubs'], has_length(1))
+    assert_that(imposter.stubs, has_length(1))
+    assert_that(imposter.stubs, instance_of(tuple))
+    assert_that(imposter.payload is payload, equal_to(True))
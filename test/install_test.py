@@ -0,0 +1,52 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, install_imposters, installed, uninstall_imposters
+
+from hamcrest import assert_that, contains_exactly, equal_to, has_length, empty
+from brunns.matchers.response import is_response
+from mbtest.matchers import had_request
+
+import pytest
+import requests
+
+
+def service_imposters(count, frozen=False):
+    return [ImposterBuilder(protocol=Protocol.HTTP, name=f"Service {i}")
+            .with_stub().with_predicate(method=Method.GET, path='/test').with_response(body=f'service {i}').add_stub()
+            .create(frozen=frozen) for i in range(count)]
+
+
+def test_imposters_installed_concurrently(any_server):
+    imposters = service_imposters(6, frozen=True)
+
+    with installed(any_server, imposters, workers=3) as timings:
+        assert_that([timing.imposter for timing in timings], contains_exactly(*imposters))
+        for i, imposter in enumerate(imposters):
+            response = requests.get(f"{imposter.url}/test")
+
+            assert_that(response, is_response().with_status_code(200).and_body(f'service {i}'))
+            assert_that(imposter, had_request(path='/test', method='GET'))
+
+    assert_that(requests.get(str(any_server.server_url)).json()['imposters'], empty())
+
+
+def test_imposters_installed_in_bulk(standin):
+    imposters = service_imposters(3)
+
+    timings = install_imposters(standin, imposters, bulk=True)
+
+    assert_that(timings, has_length(3))
+    assert_that(requests.get(f"{imposters[2].url}/test").text, equal_to('service 2'))
+
+
+def test_installed_imposters_are_deleted_when_installing_fails(standin):
+    first, second = service_imposters(2)
+    install_imposters(standin, [first])
+    clashing = ImposterBuilder(port=first.port, protocol=Protocol.HTTP, name="Clashing").with_stub()\
+        .with_response(body='clash').add_stub().create()
+    uninstall_imposters([first])
+
+    with pytest.raises(requests.HTTPError):
+        with installed(standin, [first, second, clashing], workers=1):
+            pass
+
+    assert_that(clashing.host, equal_to(None))
+    assert_that(requests.get(str(standin.server_url)).json()['imposters'], empty())
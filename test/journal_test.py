@@ -0,0 +1,110 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, RequestJournal, had_indexed_request
+
+from hamcrest import assert_that, calling, equal_to, not_, raises, starts_with
+from mbtest.matchers import had_request
+
+import pytest
+import requests
+
+
+@pytest.fixture
+def imposter(any_server):
+    imposter = ImposterBuilder(protocol=Protocol.HTTP, name="Journal")\
+        .with_stub().with_predicate(method=Method.GET).with_response(body='sausages').add_stub()\
+        .with_stub().with_response(status_code=201).add_stub().create()
+    with any_server([imposter]):
+        yield imposter
+
+
+def test_requests_are_indexed_by_method_path_and_query(imposter):
+    for i in range(30):
+        requests.get(f"{imposter.url}/user/{i % 3}", params={'page': str(i % 2)})
+    requests.post(f"{imposter.url}/user/1", data='new user')
+    journal = RequestJournal(imposter, chunk_size=64)
+
+    assert_that(journal, had_indexed_request().with_path('/user/1').and_times(11))
+    assert_that(journal, had_indexed_request().with_method('GET').and_path('/user/1').and_times(10))
+    assert_that(journal, had_indexed_request().with_path('/user/2').and_query({'page': '1'}).and_times(5))
+    assert_that(journal, had_indexed_request().with_method('DELETE').and_times(0))
+    assert_that(journal.count(), equal_to(31))
+
+
+def test_other_matchers_scan_the_looked_up_requests(imposter):
+    requests.post(f"{imposter.url}/user", data='first')
+    requests.post(f"{imposter.url}/user", data='second')
+    requests.post(f"{imposter.url}/product", data='third')
+    journal = RequestJournal(imposter)
+
+    assert_that(journal, had_indexed_request().with_method('POST').and_path('/user').and_body('second')
+                .and_times(1))
+    assert_that(journal, had_indexed_request().with_path(starts_with('/u')).and_times(2))
+    assert_that(journal, had_request().with_path('/product').and_body('third'))
+
+
+def test_only_new_requests_are_checked_since_last_check(imposter):
+    journal = RequestJournal(imposter)
+    requests.get(f"{imposter.url}/test")
+
+    assert_that(journal, had_indexed_request().with_path('/test').and_times(1).since_last_check())
+    assert_that(journal, not_(had_indexed_request().with_path('/test').since_last_check()))
+
+    requests.get(f"{imposter.url}/test")
+    requests.get(f"{imposter.url}/test")
+
+    assert_that(journal, had_indexed_request().with_path('/test').and_times(2).since_last_check())
+    assert_that(journal, had_indexed_request().with_path('/test').and_times(3))
+
+
+def test_journal_without_requests_counts_only(imposter):
+    requests.get(f"{imposter.url}/test")
+    journal = RequestJournal(imposter, keep_requests=False)
+
+    assert_that(journal, had_indexed_request().with_path('/test'))
+    assert_that(calling(journal.requests), raises(ValueError))
+
+
+def test_clear_deletes_recorded_requests(imposter):
+    journal = RequestJournal(imposter)
+    requests.get(f"{imposter.url}/test")
+    journal.refresh()
+
+    journal.clear()
+    requests.get(f"{imposter.url}/other")
+
+    assert_that(journal.refresh(), equal_to(1))
+    assert_that(journal, had_indexed_request().with_path('/other'))
+    assert_that(journal, not_(had_indexed_request().with_path('/test')))
+
+
+def test_mismatch_reports_counts(imposter):
+    requests.get(f"{imposter.url}/test")
+    journal = RequestJournal(imposter)
+
+    assert_that(calling(assert_that).with_args(journal, had_indexed_request().with_path('/test').and_times(2)),
+                raises(AssertionError, "found <1> matching requests of <1> recorded requests"))
+
+
+def test_requests_cleared_between_refreshes_are_indexed_again(imposter):
+    journal = RequestJournal(imposter)
+    requests.get(f"{imposter.url}/before")
+    journal.refresh()
+
+    requests.delete(f"{imposter.configuration_url}/savedRequests").raise_for_status()
+    for _ in range(2):
+        requests.get(f"{imposter.url}/after")
+
+    assert_that(journal.refresh(), equal_to(2))
+    assert_that(journal, had_indexed_request().with_path('/after').and_times(2))
+    assert_that(journal, not_(had_indexed_request().with_path('/before')))
+
+
+def test_drained_requests_are_read_once(imposter):
+    journal = RequestJournal(imposter, drain=True)
+    requests.get(f"{imposter.url}/test")
+
+    assert_that(journal.refresh(), equal_to(1))
+    requests.get(f"{imposter.url}/test")
+
+    assert_that(journal.refresh(), equal_to(1))
+    assert_that(journal, had_indexed_request().with_path('/test').and_times(2))
+    assert_that(requests.get(str(imposter.configuration_url)).json()['requests'], equal_to([]))
@@ -0,0 +1,56 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, LazyImposter
+
+from hamcrest import assert_that, equal_to, has_length, instance_of, is_
+from brunns.matchers.response import is_response
+from mbtest.matchers import had_request
+
+import requests
+
+template = """{
+  "protocol": "http",
+  "port": 3000,
+  "stubs": [{
+    "predicates": [{"equals": {"method": "GET", "path": "/test"}}],
+    "responses": [{"is": {"statusCode": 200, "body": "Hello, {{ name }}!"}}]
+  }]
+}"""
+
+
+def test_imposter_is_created_when_used():
+    recipes = []
+
+    def recipe():
+        recipes.append(1)
+        return ImposterBuilder(port=3000).with_stub().with_predicate(path='/test').with_response(body='sausages')\
+            .add_stub().create()
+
+    imposter = LazyImposter(recipe, port=3000, protocol=Protocol.HTTP)
+
+    assert_that(imposter.port, equal_to(3000))
+    assert_that(recipes, has_length(0))
+    assert_that(imposter.stubs, has_length(1))
+    assert_that(imposter.stubs, has_length(1))
+    assert_that(recipes, has_length(1))
+
+
+def test_builder_creates_lazy_imposter():
+    builder = ImposterBuilder(port=3000, protocol=Protocol.HTTP, name="MyImposter")
+    builder.with_stub().with_predicate(method=Method.GET, path='/test').with_response(body='sausages').add_stub()
+
+    imposter = builder.create(lazy=True)
+
+    assert_that(imposter, instance_of(LazyImposter))
+    assert_that(imposter.materialized, is_(False))
+    assert_that(imposter.as_structure(), equal_to(builder.create().as_structure()))
+
+
+def test_template_imposter_is_installed_without_building_stubs(any_server):
+    imposter = ImposterBuilder(name="MyImposter").from_template(template, {'name': 'world'}, lazy=True)
+
+    with any_server([imposter]):
+        response = requests.get(f"{imposter.url}/test")
+
+        assert_that(response, is_response().with_status_code(200).and_body('Hello, world!'))
+        assert_that(imposter, had_request().with_path('/test').and_method('GET'))
+    assert_that(imposter.materialized, is_(False))
+    assert_that(imposter.stubs[0].responses[0].body, equal_to('Hello, world!'))
@@ -0,0 +1,61 @@
+from imposter_builder import ImposterBuilder, Method, Format, optimize_stubs
+
+from hamcrest import assert_that, contains_string, equal_to, has_length, instance_of, is_not
+from mbtest.imposters import InjectionPredicate, Predicate
+import requests
+
+users = [{'id': f'{i}'} for i in range(1, 21)]
+
+
+def test_equals_stubs_are_collapsed_into_dispatch_stub():
+    builder = ImposterBuilder(port=3000)
+    builder.with_stubs(users, {'method': Method.GET, 'path': Format('/user/{id}')},
+                       {'body': Format('user {id}')})
+    builder.with_stub().with_predicate(operator='matches', path='/user/.*').with_response(status_code=404).add_stub()
+
+    imposter = builder.create(optimize=True)
+
+    assert_that(imposter.stubs, has_length(2))
+    assert_that(imposter.stubs[0].predicates[0], instance_of(InjectionPredicate))
+    assert_that(imposter.stubs[0].responses[0].inject, contains_string('"GET /user/20": 19'))
+    assert_that(imposter.stubs[1].predicates[0], instance_of(Predicate))
+    assert_that(builder.optimization_report.stubs_before, equal_to(21))
+    assert_that(builder.optimization_report.cost_before, equal_to(11.0))
+    assert_that(builder.optimization_report.cost_after, equal_to(22 / 21))
+
+
+def test_stubs_keep_their_order_around_other_stubs():
+    builder = ImposterBuilder(port=3000)
+    builder.with_stubs(users[:10], {'path': Format('/user/{id}')}, {'body': Format('user {id}')})
+    builder.with_stub().with_predicate(path='/user/1', body='update').with_response(status_code=400).add_stub()
+    builder.with_stubs(users[:3], {'path': Format('/user/{id}')}, {'body': Format('later user {id}')})
+
+    stubs, report = optimize_stubs(builder.stubs)
+
+    assert_that(stubs, has_length(5))
+    assert_that(stubs[1].predicates[0].body, equal_to('update'))
+    assert_that(stubs[2].predicates[0], is_not(instance_of(InjectionPredicate)))
+    assert_that(report.cost_after, equal_to((10 * 1 + 2 + 3 + 4 + 5) / 14))
+
+
+def test_duplicate_keys_keep_first_response():
+    builder = ImposterBuilder(port=3000)
+    builder.with_stubs(users[:8] + users[:1], {'path': Format('/user/{id}')}, {'body': Format('user {id}')})
+
+    stubs, _ = optimize_stubs(builder.stubs)
+
+    assert_that(stubs, has_length(1))
+    assert_that(stubs[0].responses[0].inject, contains_string('"* /user/1": 0'))
+    assert_that(stubs[0].responses[0].inject.count('"body": "user 1"'), equal_to(1))
+
+
+def test_dispatch_stub_answers_like_the_collapsed_stubs(mountebank):
+    builder = ImposterBuilder(name="Users")
+    builder.with_stubs(users, {'method': Method.GET, 'path': Format('/user/{id}')}, {'body': Format('user {id}')})
+    builder.with_stub().with_response(status_code=404).add_stub()
+    imposter = builder.create(optimize=True)
+
+    with mountebank([imposter]):
+        assert_that(requests.get(f"{imposter.url}/user/7").text, equal_to('user 7'))
+        assert_that(requests.delete(f"{imposter.url}/user/7").status_code, equal_to(404))
+        assert_that(requests.get(f"{imposter.url}/user/21").status_code, equal_to(404))
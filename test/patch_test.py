@@ -0,0 +1,131 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, diff_stubs, StubChange
+from imposter_builder.patch import stub_digest
+
+from hamcrest import assert_that, contains_exactly, equal_to, has_length, none
+from mbtest.imposters import Stub, Predicate, Response
+from mbtest.matchers import had_request
+
+from random import Random
+import pytest
+import requests
+
+
+def apply(installed, changes):
+    stubs = list(installed)
+    for change in changes:
+        if change.operation == 'add':
+            stubs.insert(change.index, change.stub)
+        elif change.operation == 'replace':
+            stubs[change.index] = change.stub
+        else:
+            del stubs[change.index]
+    return stubs
+
+
+def test_one_changed_stub_is_replaced():
+    installed = [b'{"stub":%d}' % i for i in range(10000)]
+    payloads = list(installed)
+    payloads[5000] = b'{"stub":"changed"}'
+
+    changes, digests = diff_stubs([stub_digest(payload) for payload in installed], payloads)
+
+    assert_that(changes, contains_exactly(StubChange('replace', 5000, b'{"stub":"changed"}')))
+    assert_that(digests, equal_to([stub_digest(payload) for payload in payloads]))
+
+
+def test_changes_turn_installed_stubs_into_new_stubs():
+    random = Random(42)
+    for _ in range(50):
+        installed = [b'%d' % random.randrange(20) for _ in range(random.randrange(30))]
+        payloads = list(installed)
+        for _ in range(random.randrange(5)):
+            edit, index = random.randrange(3), random.randrange(len(payloads) + 1)
+            if edit == 0 or not payloads or index == len(payloads):
+                payloads.insert(index, b'new %d' % index)
+            elif edit == 1:
+                payloads[index] = b'changed %d' % index
+            else:
+                del payloads[index]
+
+        changes, _ = diff_stubs([stub_digest(payload) for payload in installed], payloads)
+
+        assert_that(apply(installed, changes), equal_to(payloads))
+
+
+def user_stub(i, name):
+    return Stub(Predicate(method=Method.GET, path=f'/user/{i}'), Response(body=name))
+
+
+def test_update_changes_only_modified_stubs(standin):
+    builder = ImposterBuilder(protocol=Protocol.HTTP, name="Users")
+    builder.stubs.extend(user_stub(i, f'user {i}') for i in range(1000))
+    imposter = builder.install(standin)
+    requests.get(f"{imposter.url}/user/10")
+
+    builder.stubs[10] = user_stub(10, 'renamed')
+    del builder.stubs[500]
+    builder.stubs.append(user_stub(1000, 'user 1000'))
+    changes = builder.update(imposter)
+
+    assert_that(changes, has_length(3))
+    assert_that(requests.get(f"{imposter.url}/user/10").text, equal_to('renamed'))
+    assert_that(requests.get(f"{imposter.url}/user/1000").text, equal_to('user 1000'))
+    assert_that(imposter, had_request().with_path('/user/10').and_times(2))
+    installed = requests.get(str(imposter.configuration_url)).json()['stubs']
+    assert_that(installed, equal_to(builder.create().as_structure()['stubs']))
+
+
+def test_update_replaces_all_stubs_when_many_change(any_server):
+    builder = ImposterBuilder(protocol=Protocol.HTTP, name="Users")
+    builder.stubs.extend(user_stub(i, f'user {i}') for i in range(10))
+    imposter = builder.install(any_server)
+
+    builder.stubs[:] = [user_stub(i, f'renamed {i}') for i in range(10)]
+    changes = builder.update(imposter, max_changes=5)
+
+    assert_that(changes, none())
+    assert_that(requests.get(f"{imposter.url}/user/3").text, equal_to('renamed 3'))
+    assert_that(builder.update(imposter), has_length(0))
+
+
+class FailingSession(requests.Session):
+    def __init__(self, fail_at):
+        super().__init__()
+        self.calls = 0
+        self.fail_at = fail_at
+
+    def request(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise requests.ConnectionError("connection lost")
+        return super().request(*args, **kwargs)
+
+
+def test_update_after_a_failed_update_replaces_all_stubs(standin):
+    builder = ImposterBuilder(protocol=Protocol.HTTP, name="Users")
+    builder.stubs.extend(user_stub(i, f'user {i}') for i in range(10))
+    imposter = builder.install(standin)
+
+    builder.stubs.insert(0, user_stub(100, 'user 100'))
+    builder.stubs.append(user_stub(101, 'user 101'))
+    with pytest.raises(requests.ConnectionError):
+        builder.update(imposter, session=FailingSession(fail_at=2))
+    changes = builder.update(imposter)
+
+    assert_that(changes, none())
+    installed = requests.get(str(imposter.configuration_url)).json()['stubs']
+    assert_that(installed, equal_to(builder.create().as_structure()['stubs']))
+
+
+def test_install_posts_the_encoded_stubs(standin):
+    builder = ImposterBuilder(port=4545, protocol=Protocol.HTTP, name="Users")
+    builder.stubs.extend(user_stub(i, f'user {i}') for i in range(3))
+    builder.with_default(status_code=404)
+
+    imposter = builder.install(standin)
+
+    installed = requests.get(str(imposter.configuration_url)).json()
+    assert_that(installed['stubs'], equal_to(builder.create().as_structure()['stubs']))
+    assert_that(requests.get(f"{imposter.url}/user/1").text, equal_to('user 1'))
+    assert_that(requests.get(f"{imposter.url}/missing").status_code, equal_to(404))
+    assert_that(builder.update(imposter), has_length(0))
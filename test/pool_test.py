@@ -0,0 +1,101 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, ImposterPool
+
+from hamcrest import assert_that, calling, contains_inanyorder, equal_to, has_length, is_not, raises
+from mbtest.matchers import had_request
+
+from socket import socket
+import requests
+
+
+def free_ports(count):
+    sockets = [socket() for _ in range(count)]
+    for sock in sockets:
+        sock.bind(('localhost', 0))
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+
+def service_imposter(body, *bodies):
+    stub = ImposterBuilder(protocol=Protocol.HTTP, name="Service").with_stub()\
+        .with_predicate(method=Method.GET, path='/test').with_response(body=body)
+    for other in bodies:
+        stub.with_response(body=other)
+    return stub.add_stub().create()
+
+
+def test_identical_imposters_are_reused_with_requests_reset(any_server):
+    pool = ImposterPool(any_server, ports=free_ports(4))
+    ports = []
+    for _ in range(3):
+        imposter = service_imposter('sausages')
+        with pool([imposter]):
+            assert_that(requests.get(f"{imposter.url}/test").text, equal_to('sausages'))
+            assert_that(imposter, had_request().with_path('/test').and_times(1))
+            ports.append(imposter.port)
+
+    assert_that(set(ports), equal_to({ports[0]}))
+    assert_that((pool.installs, pool.reuses), equal_to((1, 2)))
+    pool.close()
+    assert_that(requests.get(str(any_server.server_url)).json()['imposters'], equal_to([]))
+
+
+def test_cycling_responses_are_reset(standin):
+    pool = ImposterPool(standin, ports=free_ports(2))
+    for _ in range(2):
+        imposter = service_imposter('first', 'second')
+        with pool([imposter]):
+            assert_that(requests.get(f"{imposter.url}/test").text, equal_to('first'))
+    pool.close()
+
+
+def test_ports_of_least_recently_used_imposters_are_recycled(standin):
+    ports = free_ports(2)
+    pool = ImposterPool(standin, ports=ports)
+
+    for body in ['one', 'two', 'one', 'three']:
+        imposter = service_imposter(body)
+        with pool([imposter]):
+            assert_that(requests.get(f"{imposter.url}/test").text, equal_to(body))
+
+    assert_that(pool.installs, equal_to(3))
+    assert_that([imposter.port for imposter in standin.all()], contains_inanyorder(*ports))
+    pool.close()
+
+
+def test_identical_imposters_used_together_run_separately(standin):
+    pool = ImposterPool(standin, ports=free_ports(2))
+    imposters = [service_imposter('same'), service_imposter('same')]
+
+    with pool(imposters):
+        assert_that(imposters[0].port, is_not(equal_to(imposters[1].port)))
+        assert_that(calling(pool.acquire).with_args(service_imposter('other')), raises(RuntimeError))
+    pool.close()
+
+
+def test_stubs_added_while_running_are_removed_when_reused(standin):
+    pool = ImposterPool(standin, ports=free_ports(2))
+    for _ in range(2):
+        imposter = service_imposter('sausages')
+        with pool([imposter]):
+            assert_that(requests.get(f"{imposter.url}/test").text, equal_to('sausages'))
+            requests.post(f"{imposter.configuration_url}/stubs", json={
+                'index': 0, 'stub': {'responses': [{'is': {'body': 'added'}}]}}).raise_for_status()
+
+    assert_that(pool.reuses, equal_to(1))
+    pool.close()
+
+
+def test_imposters_keeping_state_are_installed_again(standin):
+    pool = ImposterPool(standin, ports=free_ports(2))
+    for _ in range(2):
+        imposter = ImposterBuilder(protocol=Protocol.HTTP).with_stub()\
+            .with_response(body='decorated', decorate='function (config) { config.state.calls = 1; }').add_stub()\
+            .create()
+        with pool([imposter]):
+            assert_that(requests.get(f"{imposter.url}/test").text, equal_to('decorated'))
+
+    assert_that((pool.installs, pool.reuses), equal_to((2, 0)))
+    assert_that(standin.all(), has_length(1))
+    pool.close()
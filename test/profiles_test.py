@@ -0,0 +1,113 @@
+from imposter_builder import ImposterBuilder, Protocol, Method, ResponseProfile, Fixed, Uniform, LogNormal, Spikes
+from benchmarks.standin import StandInMountebank
+
+from hamcrest import assert_that, calling, close_to, contains_string, equal_to, greater_than, not_, raises
+from json import dumps
+from random import Random
+from shutil import which
+from subprocess import run
+from time import perf_counter
+import pytest
+import requests
+
+node = pytest.mark.skipif(which('node') is None, reason="node is not installed")
+
+
+def run_javascript(function, config=None, calls=1):
+    script = f"var f = {function};\nvar config = {dumps(config)};\nvar results = [];\n" \
+             f"for (var i = 0; i < {calls}; i++) {{\n" \
+             f"    var c = JSON.parse(JSON.stringify(config));\n    c && (c.state = state);\n" \
+             f"    results.push(f(c));\n    results.push(c);\n}}\nconsole.log(JSON.stringify(results));"
+    return run(['node', '-e', 'var state = {};\n' + script], capture_output=True, text=True, check=True).stdout
+
+
+def test_log_normal_latency_has_given_median_and_p99():
+    random = Random(1)
+    samples = sorted(LogNormal(median=20, p99=250).sample(random) for _ in range(20000))
+
+    assert_that(samples[10000], close_to(20, 1.5))
+    assert_that(samples[19800], close_to(250, 30))
+
+
+def test_profile_is_recovered_from_its_structure():
+    profile = ResponseProfile(Spikes(LogNormal(20, 250), 0.01, Uniform(1000, 2000)), error_rate=0.1, max_rps=50)
+
+    assert_that(ResponseProfile.from_structure(profile.as_structure()), equal_to(profile))
+    assert_that(profile.wait, not_(contains_string('//')))
+    assert_that(profile.decorate, not_(contains_string('//')))
+
+
+def test_throughput_is_capped_by_token_bucket():
+    profile = ResponseProfile(max_rps=10, burst=2)
+    state, now = {}, [0.0]
+
+    statuses = [profile.apply({'statusCode': 200}, state, Random(), lambda: now[0])['statusCode'] for _ in range(3)]
+    now[0] = 0.1
+    statuses.append(profile.apply({'statusCode': 200}, state, Random(), lambda: now[0])['statusCode'])
+
+    assert_that(statuses, equal_to([200, 200, 429, 200]))
+
+
+def test_profile_generates_behaviors_of_response():
+    profile = ResponseProfile(Fixed(5), error_rate=0.5)
+    builder = ImposterBuilder(protocol=Protocol.HTTP)
+    builder.with_stub().with_predicate(method=Method.GET).with_response(body='ok', profile=profile).add_stub()
+
+    behaviors = builder.create().as_structure()['stubs'][0]['responses'][0]['_behaviors']
+
+    assert_that(behaviors['wait'], equal_to(profile.wait))
+    assert_that(behaviors['decorate'], equal_to(profile.decorate))
+    assert_that(calling(builder.with_stub().with_response).with_args(wait=10, profile=profile), raises(ValueError))
+
+
+@node
+def test_generated_javascript_runs():
+    profile = ResponseProfile(Spikes(LogNormal(20, 250), 0.5, Fixed(1000)), error_rate=1.0, error_body='oops',
+                              max_rps=1, burst=1)
+
+    waits = run_javascript(profile.wait, calls=200)
+    responses = run_javascript(profile.decorate, {'response': {'statusCode': 200, 'body': 'ok'}}, calls=2)
+
+    assert_that(waits, contains_string('1000'))
+    assert_that(responses, contains_string('"statusCode":500,"body":"oops"'))
+    assert_that(responses, contains_string('"statusCode":429'))
+
+
+@node
+def test_throttling_fails_without_imposter_state():
+    profile = ResponseProfile(max_rps=1)
+    script = f"var f = {profile.decorate};\nf({{response: {{statusCode: 200}}}});"
+
+    result = run(['node', '-e', script], capture_output=True, text=True)
+
+    assert_that(result.returncode, not_(equal_to(0)))
+    assert_that(result.stderr, contains_string('Throttling needs the imposter state'))
+
+
+@node
+def test_infinite_values_generate_valid_javascript():
+    profile = ResponseProfile(Uniform(10, float('inf')), max_rps=1, burst=float('inf'))
+
+    responses = run_javascript(profile.decorate, {'response': {'statusCode': 200}}, calls=3)
+
+    assert_that(profile.wait, contains_string('Infinity'))
+    assert_that(responses, not_(contains_string('429')))
+    assert_that(calling(lambda: ResponseProfile(Fixed(float('nan'))).wait), raises(ValueError))
+
+
+def test_server_runs_profiles(any_server):
+    profile = ResponseProfile(Fixed(50), max_rps=1, burst=1)
+    imposter = ImposterBuilder(protocol=Protocol.HTTP).with_stub().with_response(body='ok', profile=profile)\
+        .add_stub().create()
+    if isinstance(any_server, StandInMountebank):
+        any_server.add_profile(profile)
+
+    with any_server([imposter]):
+        start = perf_counter()
+        first = requests.get(f"{imposter.url}/test")
+        elapsed = perf_counter() - start
+        second = requests.get(f"{imposter.url}/test")
+
+    assert_that(first.status_code, equal_to(200))
+    assert_that(elapsed, greater_than(0.045))
+    assert_that(second.status_code, equal_to(429))
@@ -0,0 +1,73 @@
+from imposter_builder import ImposterBuilder, Profiler, profiler, profiling
+
+from hamcrest import assert_that, close_to, contains_string, equal_to, empty, has_entries, has_key, is_not
+from time import sleep
+
+template = '{"protocol": "http", "port": 3000, "stubs": [{"responses": [{"is": {"body": "Hello, {{ name }}!"}}]}]}'
+
+
+def test_phases_of_building_an_imposter_are_timed_within_profiling():
+    with profiling() as timings:
+        ImposterBuilder().from_template(template, {'name': 'world'})
+
+    phases = timings.phases()
+    assert_that(phases, has_entries({'template.render': is_not(None), 'template.lookup': is_not(None)}))
+    assert_that(phases['json.decode'].bytes, equal_to(len(template) - len('{{ name }}') + len('world')))
+    assert_that(phases['stubs.from_structure'].count, equal_to(1))
+    assert_that(phases['template.render'].calls, equal_to(1))
+
+
+def test_building_is_timed_when_the_imposter_is_created():
+    with profiling() as timings:
+        builder = ImposterBuilder(port=3000).with_stub().with_predicate(path='/test').with_response(body='hi')\
+            .add_stub()
+        assert_that(timings.phases(), empty())
+        builder.create()
+
+    phases = timings.phases()
+    assert_that(phases['build'].calls, equal_to(1))
+    assert_that(phases['build'].count, equal_to(1))
+
+
+def test_nothing_is_timed_when_disabled():
+    profiler.reset()
+
+    ImposterBuilder().from_template(template, {'name': 'world'})
+
+    assert_that(profiler.phases(), empty())
+
+
+def test_profiling_restores_the_profiler_state():
+    was_enabled = profiler.enabled
+    with profiling():
+        assert_that(profiler.enabled, equal_to(True))
+    assert_that(profiler.enabled, equal_to(was_enabled))
+
+
+def test_report_lists_phases_slowest_first():
+    timings = Profiler(enabled=True)
+    with timings.timer('fast'):
+        pass
+    with timings.timer('slow') as timer:
+        timer.add_bytes(10)
+        sum(range(100000))
+
+    report = timings.report()
+
+    assert_that(report, contains_string('slow'))
+    assert_that(report.splitlines()[1].split()[0], equal_to('slow'))
+    assert_that(timings.as_structure(), has_key('fast'))
+    assert_that(timings.as_structure()['slow']['bytes'], equal_to(10))
+
+
+def test_nested_phases_are_subtracted_from_the_enclosing_phase():
+    timings = Profiler(enabled=True)
+    with timings.timer('outer'):
+        sleep(0.02)
+        with timings.timer('inner'):
+            sleep(0.05)
+
+    phases = timings.phases()
+    assert_that(phases['outer'].seconds, close_to(0.02, 0.015))
+    assert_that(phases['outer'].total_seconds, close_to(phases['outer'].seconds + phases['inner'].seconds, 0.001))
+    assert_that(phases['inner'].seconds, equal_to(phases['inner'].total_seconds))
@@ -0,0 +1,112 @@
+from imposter_builder import (ImposterBuilder, Method, ProxyRecording, ProxyMode, compact_stubs, installed,
+                              load_recording)
+
+from hamcrest import assert_that, close_to, contains_exactly, equal_to, has_entries, has_length, not_
+from brunns.matchers.response import is_response
+from json import load
+from pathlib import Path
+import requests
+
+
+def recorded(body, status=200, **headers):
+    return {'is': {'statusCode': status, 'headers': dict({'Date': 'now'}, **headers), 'body': body, '_mode': 'text',
+                   '_proxyResponseTime': 3}}
+
+
+def path_predicates(path):
+    return [{'deepEquals': {'path': path, 'query': {}}}]
+
+
+def test_duplicate_predicates_are_merged_and_repeated_responses_collapsed():
+    stubs = [
+        {'predicates': path_predicates('/a'), 'responses': [recorded('a'), recorded('a'), recorded('b')]},
+        {'predicates': path_predicates('/b'), 'responses': [recorded('c')]},
+        {'predicates': path_predicates('/a'), 'responses': [recorded('b'), recorded('a')]},
+        {'responses': [{'proxy': {'to': 'http://service', 'mode': 'proxyAlways'}}]},
+    ]
+
+    compacted, stats = compact_stubs(stubs)
+
+    assert_that(compacted, has_length(2))
+    assert_that(compacted[0]['responses'], contains_exactly(
+        has_entries({'is': has_entries({'body': 'a'}), '_behaviors': {'repeat': 2}}),
+        has_entries({'is': has_entries({'body': 'b'}), '_behaviors': {'repeat': 2}}),
+        has_entries({'is': has_entries({'body': 'a'})})))
+    assert_that(compacted[0]['responses'][0]['is'], not_(has_entries({'_proxyResponseTime': 3})))
+    assert_that(compacted[0]['responses'][0]['is']['headers'], equal_to({}))
+    assert_that((stats.recorded_stubs, stats.recorded_responses, stats.stubs, stats.responses),
+                equal_to((4, 6, 2, 4)))
+    assert_that(stats.stub_reduction, equal_to(0.5))
+
+
+def test_distinct_keeps_each_response_once():
+    stubs = [{'predicates': path_predicates('/a'), 'responses': [recorded('a'), recorded('b'), recorded('a')]}]
+
+    compacted, stats = compact_stubs(stubs, distinct=True)
+
+    assert_that([response['is']['body'] for response in compacted[0]['responses']], contains_exactly('a', 'b'))
+    assert_that(stats.response_reduction, close_to(1 / 3, 1e-9))
+
+
+def test_identical_responses_are_replaced_by_one():
+    stubs = [{'predicates': path_predicates('/a'), 'responses': [recorded('a')] * 5}]
+
+    compacted, _ = compact_stubs(stubs)
+
+    assert_that(compacted[0]['responses'], equal_to([{'is': {'statusCode': 200, 'headers': {}, 'body': 'a',
+                                                             '_mode': 'text'}}]))
+
+
+def test_recorded_responses_are_replayed_offline(standin, tmp_path):
+    service = ImposterBuilder(name='service')\
+        .with_stub().with_predicate(method=Method.GET, path='/hello').with_response(body='hello')\
+        .with_response(body='hello').with_response(body='bye').add_stub()\
+        .with_stub().with_predicate(path='/other').with_response(body='other', status_code=201).add_stub().create()
+
+    with installed(standin, [service]):
+        with ProxyRecording(standin, to=service.url) as recording:
+            for path in ('/hello', '/hello', '/other', '/hello', '/other'):
+                requests.get(f"{recording.imposter.url}{path}")
+        builder = recording.freeze(tmp_path / 'service.json')
+
+    assert_that((recording.stats.recorded_stubs, recording.stats.stubs), equal_to((2, 2)))
+    assert_that((recording.stats.recorded_responses, recording.stats.responses), equal_to((5, 3)))
+    for replay in (builder, load_recording(tmp_path / 'service.json')):
+        with installed(standin, [replay.create()]) as timings:
+            url = timings[0].imposter.url
+            bodies = [requests.get(f"{url}/hello").text for _ in range(4)]
+            assert_that(bodies, contains_exactly('hello', 'hello', 'bye', 'hello'))
+            assert_that(requests.get(f"{url}/other"), is_response().with_status_code(201).and_body('other'))
+
+
+def test_proxy_once_records_first_response(any_server):
+    service = ImposterBuilder().with_stub().with_response(body='first').with_response(body='second').add_stub()\
+        .create()
+
+    with installed(any_server, [service]):
+        with ProxyRecording(any_server, to=service.url, mode=ProxyMode.ONCE) as recording:
+            bodies = [requests.get(f"{recording.imposter.url}/test").text for _ in range(2)]
+
+    assert_that(bodies, contains_exactly('first', 'first'))
+    assert_that(recording.download(), has_length(1))
+
+
+def test_recording_downloaded_from_mountebank_is_replayed(standin):
+    # Downloaded from mountebank with ?replayable=true&removeProxies=true after recording with proxyAlways.
+    with open(Path(__file__).parent / 'recordings' / 'proxy_always.json') as file:
+        definition = load(file)
+
+    stubs, stats = compact_stubs(definition['stubs'])
+    replay = ImposterBuilder(name=definition['name'])
+    replay.with_stub().from_structures(stubs)
+
+    assert_that((stats.stubs, stats.responses), equal_to((2, 3)))
+    assert_that(stubs[0]['responses'][0], has_entries({'_behaviors': {'repeat': 2}}))
+    assert_that(stubs[1]['responses'][0]['is']['headers'], equal_to({'Content-Type': 'application/json'}))
+    with installed(standin, [replay.create()]) as timings:
+        url = timings[0].imposter.url
+        statuses = [requests.get(f"{url}/users", params={'page': '1'}).status_code for _ in range(3)]
+        user = requests.get(f"{url}/users/1")
+
+    assert_that(statuses, equal_to([200, 200, 503]))
+    assert_that(user, is_response().with_status_code(200).and_body('{"id":1,"name":"Tester"}'))
@@ -0,0 +1,103 @@
+from imposter_builder import ImposterBuilder, RenderCache, render_cache
+
+from hamcrest import assert_that, equal_to, is_not, same_instance
+from datetime import datetime
+import pytest
+
+template = '{"protocol": "http", "port": 3000, "stubs": [{"responses": [{"is": {"body": "Hello, {{ name }}!"}}]}]}'
+
+
+@pytest.fixture
+def enabled_render_cache():
+    render_cache.clear()
+    render_cache.enabled = True
+    yield render_cache
+    render_cache.enabled = False
+    render_cache.clear()
+
+
+def test_template_rendered_with_same_values_is_rendered_once():
+    cache = RenderCache(enabled=True)
+
+    first = cache.render(None, template, {'name': 'world', 'ids': [1, 2]})
+    second = cache.render(None, template, {'ids': [1, 2], 'name': 'world'})
+    cache.render(None, template, {'name': 'moon', 'ids': [1, 2]})
+
+    assert_that(second, equal_to(first))
+    assert_that(cache.info().hits, equal_to(1))
+    assert_that(cache.info().misses, equal_to(2))
+
+
+def test_cache_is_opt_in():
+    cache = RenderCache()
+
+    cache.render(None, template, {'name': 'world'})
+    cache.render(None, template, {'name': 'world'}, memoize=True)
+    cache.render(None, template, {'name': 'world'}, memoize=True)
+
+    assert_that(cache.info().currsize, equal_to(1))
+    assert_that(cache.hits, equal_to(1))
+
+
+def test_non_deterministic_templates_can_be_excluded():
+    cache = RenderCache(enabled=True)
+
+    cache.render(None, template, {'name': 'world'}, memoize=False)
+    cache.render(None, template, {'when': datetime.now()})
+
+    assert_that(cache.info().currsize, equal_to(0))
+
+
+def test_cache_is_bounded_by_size_and_length():
+    cache = RenderCache(maxsize=2, max_length=100, enabled=True)
+
+    for name in ['one', 'two', 'three']:
+        cache.render(None, template, {'name': name})
+    assert_that(cache.info().currsize, equal_to(1))
+
+    cache = RenderCache(maxsize=2, enabled=True)
+    for name in ['one', 'two', 'one', 'three', 'one']:
+        cache.render(None, template, {'name': name})
+    assert_that(cache.info().currsize, equal_to(2))
+    assert_that(cache.hits, equal_to(2))
+
+
+def test_builders_parse_their_own_copy_of_cached_definitions(tmp_path, enabled_render_cache):
+    tmp_path.joinpath('hello.json').write_text(template)
+
+    first = ImposterBuilder(templates=str(tmp_path)).from_template('hello.json', {'name': 'world'})
+    first.stubs[0].responses[0].http_response._body = 'changed'
+    second = ImposterBuilder(templates=str(tmp_path)).from_template('hello.json', {'name': 'world'})
+    builder = ImposterBuilder(templates=str(tmp_path))
+    builder.with_stub().from_template('hello.json', {'name': 'world'})
+
+    assert_that(second, is_not(same_instance(first)))
+    assert_that(second.stubs[0].responses[0].body, equal_to('Hello, world!'))
+    assert_that(builder.stubs[0].responses[0].body, equal_to('Hello, world!'))
+    assert_that(enabled_render_cache.info().hits, equal_to(2))
+
+
+def test_values_which_are_not_plain_json_types_are_not_cached():
+    cache = RenderCache(enabled=True)
+    listed = '{{ ids }}'
+
+    as_list = cache.render(None, listed, {'ids': [1, 2]})
+    as_tuple = cache.render(None, listed, {'ids': (1, 2)})
+
+    assert_that(as_list, equal_to('[1, 2]'))
+    assert_that(as_tuple, equal_to('(1, 2)'))
+    assert_that(cache.info().currsize, equal_to(1))
+    assert_that(cache.hits, equal_to(0))
+
+
+def test_cached_definition_is_parsed_once():
+    cache = RenderCache(enabled=True)
+
+    first = cache.definition(None, template, {'name': 'world'})
+    second = cache.definition(None, template, {'name': 'world'})
+    uncached = cache.definition(None, template, {'name': 'world'}, memoize=False)
+
+    assert_that(second, same_instance(first))
+    assert_that(uncached, is_not(same_instance(first)))
+    assert_that(first['stubs'][0]['responses'][0]['is']['body'], equal_to('Hello, world!'))
+    assert_that(cache.hits, equal_to(1))
@@ -0,0 +1,72 @@
+from imposter_builder import compile_capture
+from benchmarks.standin import StandInMountebank
+
+from hamcrest import assert_that, contains_exactly, equal_to, has_length
+from brunns.matchers.response import is_response
+from json import dumps
+
+import requests
+
+
+def exchange(path, body, method='GET', query=None):
+    return dumps({'request': {'method': method, 'path': path, 'query': query or {}, 'headers': {}, 'body': ''},
+                  'response': {'statusCode': 200, 'headers': {'Content-Type': 'text/plain'}, 'body': body}})
+
+
+def write_capture(tmp_path):
+    capture = tmp_path.joinpath('capture.jsonl')
+    capture.write_text('\n'.join([exchange('/users/1', 'one'), exchange('/users/2', 'two'),
+                                  exchange('/users/1', 'one again'), '',
+                                  exchange('/users', 'found', query={'name': 'two'}),
+                                  exchange('/users/3', 'deleted', method='DELETE')]) + '\n')
+    return capture
+
+
+def test_duplicate_requests_are_dropped(tmp_path):
+    builders = list(compile_capture(write_capture(tmp_path), port=3000, name='Users'))
+
+    assert_that(builders, has_length(1))
+    assert_that([stub.responses[0].body for stub in builders[0].stubs],
+                contains_exactly('one', 'two', 'found', 'deleted'))
+
+
+def test_capture_is_sharded(tmp_path):
+    builders = list(compile_capture(write_capture(tmp_path), port=3000, name='Users', max_stubs=3))
+
+    assert_that([builder.port for builder in builders], contains_exactly(3000, 3001))
+    assert_that([builder.name for builder in builders], contains_exactly('Users', 'Users #2'))
+    assert_that(builders[1].stubs, has_length(1))
+
+
+def test_compiled_imposter_replays_capture(any_server, tmp_path):
+    imposter = next(compile_capture(write_capture(tmp_path))).create()
+
+    with any_server([imposter]):
+        assert_that(requests.get(f"{imposter.url}/users/1"), is_response().with_body('one'))
+        assert_that(requests.get(f"{imposter.url}/users", params={'name': 'two'}).text, equal_to('found'))
+        assert_that(requests.delete(f"{imposter.url}/users/3").text, equal_to('deleted'))
+
+
+def test_each_recorded_request_replays_its_own_response(tmp_path):
+    capture = tmp_path.joinpath('capture.jsonl')
+    search = dumps({'request': {'method': 'POST', 'path': '/search', 'query': {}, 'headers': {}, 'body': 'x'},
+                    'response': {'statusCode': 200, 'headers': {}, 'body': 'x found'}})
+    capture.write_text('\n'.join([exchange('/users', 'all'), exchange('/users', 'found', query={'name': 'two'}),
+                                  exchange('/search', 'empty', method='POST'), search]) + '\n')
+    imposter = next(compile_capture(capture)).create()
+
+    with StandInMountebank()([imposter]):
+        assert_that(requests.get(f"{imposter.url}/users", params={'name': 'two'}).text, equal_to('found'))
+        assert_that(requests.get(f"{imposter.url}/users").text, equal_to('all'))
+        assert_that(requests.post(f"{imposter.url}/search", data='x').text, equal_to('x found'))
+        assert_that(requests.post(f"{imposter.url}/search").text, equal_to('empty'))
+
+
+def test_request_without_a_method_is_replayed_for_any_method(tmp_path):
+    capture = tmp_path.joinpath('capture.jsonl')
+    capture.write_text(dumps({'request': {'path': '/health'}, 'response': {'body': 'ok'}}) + '\n')
+    imposter = next(compile_capture(capture)).create()
+
+    with StandInMountebank()([imposter]):
+        assert_that(requests.get(f"{imposter.url}/health").text, equal_to('ok'))
+        assert_that(requests.post(f"{imposter.url}/health").text, equal_to('ok'))
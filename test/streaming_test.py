@@ -0,0 +1,52 @@
+from imposter_builder import ImposterBuilder, Protocol, iter_array
+
+from hamcrest import assert_that, contains_exactly, equal_to, has_length, calling, raises
+from json import dumps, JSONDecodeError
+from pathlib import Path
+
+users = [{'id': f'{i}', 'name': f'Tester_{i}', 'email': f'tester{i}@testing.com'} for i in range(1, 6)]
+
+
+def chunked(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def test_array_elements_are_yielded_from_small_chunks():
+    members = {}
+    text = dumps({'port': 3000, 'stubs': [{'id': 1}, {'id': 12.5}, [1, 2]], 'name': 'test'})
+
+    elements = list(iter_array(chunked(text, 3), 'stubs', members))
+
+    assert_that(elements, contains_exactly({'id': 1}, {'id': 12.5}, [1, 2]))
+    assert_that(members, equal_to({'port': 3000, 'name': 'test'}))
+
+
+def test_invalid_json_is_reported():
+    assert_that(calling(list).with_args(iter_array(chunked('{"stubs": [{"id": 1} {"id": 2}]}', 4), 'stubs')),
+                raises(JSONDecodeError))
+
+
+def test_stubs_streamed_from_template_file():
+    builder = ImposterBuilder(port=3000, protocol=Protocol.HTTP, name="MyImposter",
+                              templates=str(Path(__file__).parent.parent.joinpath('examples')))
+    builder.with_stub().from_template('templates/users.json', {'users': users}, stream=True)
+    imposter = builder.create()
+
+    assert_that(imposter.stubs, has_length(len(users) + 2))
+    assert_that(imposter.stubs[0].predicates[0].path, equal_to('/user/1'))
+
+
+def test_imposter_streamed_from_template_string():
+    imposter = ImposterBuilder(name="MyImposter").from_template("""{
+      "protocol": "http",
+      "port": 3000,
+      "stubs": [{% for user in users %}{
+        "predicates": [{"equals": {"method": "GET", "path": "/user/{{ user.id }}"}}],
+        "responses": [{"is": {"body": "{{ user.name }}"}}]
+      }{% if not loop.last %},{% endif %}{% endfor %}]
+    }
+    """, {'users': users}, stream=True)
+
+    assert_that(imposter.port, equal_to(3000))
+    assert_that(imposter.stubs, has_length(len(users)))
+    assert_that(imposter.stubs[-1].responses[0].body, equal_to('Tester_5'))
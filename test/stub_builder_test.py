@@ -0,0 +1,31 @@
+from imposter_builder import ImposterBuilder, Protocol, Method
+
+from hamcrest import assert_that, equal_to, has_length, instance_of, is_, same_instance
+
+
+def test_stub_shares_frozen_predicates_and_responses():
+    builder = ImposterBuilder(port=3000, protocol=Protocol.HTTP)
+    stub_builder = builder.with_stub().with_predicate(method=Method.GET, path='/test').with_response(body='sausages')
+    stub_builder.add_stub()
+
+    stub = builder.stubs[0]
+    assert_that(stub.predicates, instance_of(tuple))
+    assert_that(stub.predicates, is_(same_instance(stub_builder.predicates)))
+    assert_that(stub.responses, is_(same_instance(stub_builder.responses)))
+
+
+def test_stub_can_be_added_to_several_imposters():
+    builder = ImposterBuilder(port=3000).with_stub().with_predicate(path='/test').with_response(body='sausages')\
+        .with_response(body='eggs').add_stub()
+    other = ImposterBuilder(port=3001)
+    other.stubs.extend(builder.stubs)
+
+    assert_that(other.stubs, has_length(1))
+    assert_that(other.create().as_structure()['stubs'], equal_to(builder.create().as_structure()['stubs']))
+
+
+def test_builders_have_no_instance_dictionary():
+    builder = ImposterBuilder()
+
+    assert_that(hasattr(builder, '__dict__'), is_(False))
+    assert_that(hasattr(builder.with_stub(), '__dict__'), is_(False))
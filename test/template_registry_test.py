@@ -0,0 +1,60 @@
+from imposter_builder import ImposterBuilder, TemplateRegistry
+
+from hamcrest import assert_that, equal_to, is_, same_instance, is_not
+from os import utime
+
+template = '{"stubs": [{"responses": [{"is": {"body": "Hello, {{ name }}!"}}]}]}'
+
+
+def test_string_template_is_compiled_once():
+    registry = TemplateRegistry()
+
+    first = registry.get_template(None, template)
+    second = registry.get_template(None, template)
+
+    assert_that(second, same_instance(first))
+    assert_that(registry.info().hits, equal_to(1))
+    assert_that(registry.info().misses, equal_to(1))
+
+
+def test_file_template_is_recompiled_when_modified(tmp_path):
+    registry = TemplateRegistry()
+    template_file = tmp_path.joinpath('hello.json')
+    template_file.write_text(template)
+
+    first = registry.get_template(tmp_path, 'hello.json')
+    template_file.write_text(template.replace('Hello', 'Goodbye'))
+    utime(template_file, ns=(0, template_file.stat().st_mtime_ns + 1_000_000_000))
+    second = registry.get_template(tmp_path, 'hello.json')
+
+    assert_that(second, is_not(same_instance(first)))
+    assert_that(second.render(name='world'), equal_to(template.replace('Hello', 'Goodbye')
+                                                      .replace('{{ name }}', 'world')))
+    assert_that(registry.misses, equal_to(2))
+
+
+def test_least_recently_used_template_is_evicted():
+    registry = TemplateRegistry(maxsize=2)
+
+    registry.get_template(None, 'one')
+    registry.get_template(None, 'two')
+    registry.get_template(None, 'one')
+    registry.get_template(None, 'three')
+    registry.get_template(None, 'one')
+    registry.get_template(None, 'two')
+
+    assert_that(registry.info().currsize, equal_to(2))
+    assert_that(registry.hits, equal_to(2))
+    assert_that(registry.misses, equal_to(4))
+
+
+def test_builders_share_compiled_templates(tmp_path):
+    tmp_path.joinpath('hello_stubs.json').write_text(template)
+    builder = ImposterBuilder(port=3000, name="MyImposter", templates=str(tmp_path))
+
+    builder.with_stub().from_template('hello_stubs.json', {'name': 'world'})
+    builder.with_stub().from_template('hello_stubs.json', {'name': 'moon'})
+    imposter = builder.create()
+
+    assert_that(len(imposter.stubs), is_(2))
+    assert_that(imposter.stubs[1].responses[0].body, equal_to('Hello, moon!'))